@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Bring every asset a slide deck references up to date.
+
+The ``![alt](path)`` image references in the deck (by default
+``vision_transformers_slides.md``) are resolved to the producer that writes
+each file: a variant's ``render`` (see ``render_all.VARIANTS``), the Mermaid
+job for a ``.mmd`` source next to the image, or nothing for a checked-in
+file.  A producer also depends on the producer of its own inputs (the
+``.mmd`` that ``generate_vlm_diagram`` writes, for example), which gives a
+dependency graph.
+
+Every reference is resolved before anything renders, so a missing file that
+nothing produces fails the build at once.  ``build`` then runs only the
+stale producers, in topological order, with independent producers in
+parallel on a process pool; the Mermaid jobs that are ready together are
+rendered as one batch per directory.  After the first failure nothing new
+starts; producers already running are still reported.
+"""
+
+import argparse
+import importlib
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from graphlib import CycleError, TopologicalSorter
+from pathlib import Path
+
+from card_engine import add_export_arguments, apply_export_arguments
+from mermaid_render import MermaidJob, render_incremental
+from render_all import VARIANTS, init_worker, render_variant
+
+REPO_DIR = Path(__file__).resolve().parent
+DECK_PATH = REPO_DIR / 'vision_transformers_slides.md'
+
+# ![alt](path "optional title")
+IMAGE_REFERENCE = re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)>?(?:\s+"[^"]*")?\s*\)')
+
+# Image formats a .mmd source can be rendered to
+MERMAID_FORMATS = ('.png', '.svg', '.pdf')
+
+
+@dataclass(frozen=True)
+class Producer:
+    """One unit of work that writes ``outputs`` from ``inputs``."""
+
+    name: str
+    kind: str  # 'variant' or 'mermaid'
+    outputs: tuple
+    inputs: tuple = ()
+    job: MermaidJob = None
+
+
+class DeckError(Exception):
+    """References that cannot be resolved, or a cyclic dependency graph."""
+
+
+def image_references(deck=DECK_PATH):
+    """``(line number, path)`` of every local image the deck references."""
+    deck = Path(deck)
+    references = []
+    for number, line in enumerate(deck.read_text(encoding='utf-8').splitlines(), 1):
+        for target in IMAGE_REFERENCE.findall(line):
+            if '://' in target or target.startswith('data:'):
+                continue
+            references.append((number, (deck.parent / target).resolve()))
+    return references
+
+
+def variant_outputs():
+    """Map every file a variant writes (default formats) to the variant's name."""
+    outputs = {}
+    for name, module in VARIANTS.items():
+        render = importlib.import_module(module).render
+        for path in render(None, force=True, dry_run=True):
+            outputs[Path(path).resolve()] = name
+    return outputs
+
+
+def resolve(references, deck=DECK_PATH):
+    """Build the graph behind ``references``.
+
+    Returns ``(producers, graph)``: producers by name and, for each, the
+    names of the producers it depends on.  Raises ``DeckError`` listing
+    every reference that neither exists nor has a producer.
+    """
+    by_variant = variant_outputs()
+    producers, graph, errors = {}, {}, []
+
+    def producer_for(path):
+        """Name of the producer writing ``path``, or None for a source file."""
+        if path in by_variant:
+            name = f'variant:{by_variant[path]}'
+            if name not in producers:
+                outputs = tuple(sorted(p for p, v in by_variant.items() if v == by_variant[path]))
+                producers[name] = Producer(name, 'variant', outputs)
+                graph[name] = set()
+            return name
+        source = path.with_suffix('.mmd')
+        if path.suffix in MERMAID_FORMATS and (source.exists() or source in by_variant):
+            name = f'mermaid:{path.relative_to(REPO_DIR) if path.is_relative_to(REPO_DIR) else path}'
+            if name not in producers:
+                producers[name] = Producer(name, 'mermaid', (path,), (source,),
+                                           MermaidJob(source, path))
+                upstream = producer_for(source)
+                graph[name] = {upstream} if upstream else set()
+            return name
+        return None
+
+    for number, path in references:
+        if producer_for(path) is None and not path.exists():
+            errors.append(f'{Path(deck).name}:{number}: {path.relative_to(REPO_DIR)} '
+                          'does not exist and nothing produces it')
+    if errors:
+        raise DeckError('\n'.join(errors))
+    try:
+        tuple(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        raise DeckError(f'dependency cycle: {" -> ".join(e.args[1])}') from None
+    return producers, graph
+
+
+def is_stale(producer, force=False):
+    """Whether ``producer`` has to run to bring its outputs up to date."""
+    if force or not all(path.exists() for path in producer.outputs):
+        return True
+    if producer.kind == 'mermaid':
+        result, = render_incremental([producer.job], dry_run=True)
+        return result.method == 'dry_run'
+    module = importlib.import_module(VARIANTS[producer.name.partition(':')[2]])
+    return bool(module.render(None, dry_run=True))
+
+
+def render_mermaid(jobs, force=False):
+    """Render Mermaid ``jobs`` (one directory) as one batch; returns their results."""
+    return render_incremental(jobs, force=force)
+
+
+def plan(producers, graph, force=False):
+    """Producer names in topological order with whether each will run.
+
+    A producer downstream of one that runs is assumed to run too.
+    """
+    running = set()
+    order = []
+    for name in TopologicalSorter(graph).static_order():
+        runs = bool(graph[name] & running) or is_stale(producers[name], force)
+        if runs:
+            running.add(name)
+        order.append((name, runs))
+    return order
+
+
+def build(producers, graph, jobs=None, force=False):
+    """Run the stale producers in parallel topological order.
+
+    Yields one result dict per producer (``skipped`` for up to date ones).
+    After the first failure no new producer starts.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    sorter = TopologicalSorter(graph)
+    sorter.prepare()
+    ran = set()
+    pool = None
+    futures = {}      # future -> producer names
+    waiting = {}      # mermaid directory -> names held until its batch finishes
+    busy = set()      # mermaid directories with a batch in flight
+    failed = False
+
+    def submit_mermaid(directory):
+        names = waiting.pop(directory)
+        busy.add(directory)
+        future = pool.submit(render_mermaid, [producers[name].job for name in names], force)
+        futures[future] = names
+
+    try:
+        # After a failure nothing new starts, but running producers are reported
+        while futures or (sorter.is_active() and not failed):
+            for name in () if failed else sorter.get_ready():
+                if not (graph[name] & ran) and not is_stale(producers[name], force):
+                    sorter.done(name)
+                    yield {'name': name, 'seconds': 0.0, 'paths': [], 'error': None,
+                           'skipped': True}
+                    continue
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker)
+                producer = producers[name]
+                if producer.kind == 'mermaid':
+                    waiting.setdefault(producer.outputs[0].parent, []).append(name)
+                else:
+                    variant = name.partition(':')[2]
+                    futures[pool.submit(render_variant, variant, None, force)] = [name]
+            for directory in [d for d in waiting if d not in busy and not failed]:
+                submit_mermaid(directory)
+            if not futures:
+                continue
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                names = futures.pop(future)
+                result = future.result()
+                if producers[names[0]].kind == 'mermaid':
+                    busy.discard(producers[names[0]].outputs[0].parent)
+                    results = result
+                else:
+                    results = [result]
+                for name, result in zip(names, results, strict=True):
+                    if producers[name].kind == 'mermaid':
+                        result = {'name': name, 'seconds': result.seconds,
+                                  'paths': [str(result.job.output)],
+                                  'error': None if result.ok else result.error or 'failed'}
+                    ran.add(name)
+                    failed = failed or bool(result['error'])
+                    if not result['error']:
+                        sorter.done(name)
+                    yield {**result, 'name': name, 'skipped': False}
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the assets a slide deck references.')
+    parser.add_argument('--deck', type=Path, default=DECK_PATH,
+                        help=f'markdown deck (default: {DECK_PATH.name})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='render the stale assets')
+    build_parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                              help='worker processes (default: one per core)')
+    build_parser.add_argument('--force', action='store_true',
+                              help='re-render every producer the deck needs')
+    build_parser.add_argument('-n', '--dry-run', action='store_true',
+                              help='list the producers that would run without rendering')
+    add_export_arguments(build_parser)
+    commands.add_parser('graph', help='print each reference and the producer behind it')
+    args = parser.parse_args()
+
+    references = image_references(args.deck)
+    try:
+        producers, graph = resolve(references, args.deck)
+    except DeckError as e:
+        parser.exit(1, f'{e}\n')
+
+    if args.command == 'graph':
+        owners = {path: name for name, producer in producers.items()
+                  for path in producer.outputs}
+        for number, path in references:
+            name = owners.get(path, 'source file')
+            upstream = ', '.join(sorted(graph.get(name, ())))
+            print(f"{number:>4}  {path.relative_to(REPO_DIR)}  <- {name}"
+                  + (f'  <- {upstream}' if upstream else ''))
+        return
+
+    apply_export_arguments(args)
+    if args.dry_run:
+        for name, runs in plan(producers, graph, args.force):
+            print(f"{'render' if runs else 'up to date':<10}  {name}")
+        return
+
+    start = time.perf_counter()
+    rendered = failures = 0
+    for result in build(producers, graph, args.jobs, args.force):
+        if result['skipped']:
+            print(f"⏭️  {result['name']} (up to date)")
+        elif result['error']:
+            failures += 1
+            print(f"❌ {result['name']:<40} {result['seconds']:7.2f}s  {result['error']}")
+        else:
+            rendered += 1
+            outputs = ', '.join(os.path.basename(path) for path in result['paths'])
+            print(f"✅ {result['name']:<40} {result['seconds']:7.2f}s  {outputs}")
+
+    print(f'Built {len(references)} references: {rendered} producers rendered, '
+          f'{failures} failed in {time.perf_counter() - start:.2f}s')
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Build a PDF handout from the slide deck, its speaker notes and its figures.
+
+Every ``### Slide N: Title`` section of the deck becomes one page (more if
+its notes overflow): the title, the figures the slide references and the
+speaker notes.  Notes come from ``speaker_notes.txt``, matched by slide
+title, or else from the slide's ``<!-- Speaker Notes: ... -->`` comment.
+
+Pages are streamed into the PDF one at a time (see ``pdf_writer``).  Each
+figure is opened only when its page is written and released afterwards, so
+memory stays flat however long the deck is.  A figure with an up-to-date
+``.pdf`` next to it (``--formats pdf`` of a variant) is embedded as vector
+artwork instead of re-rasterised; PNGs are downsampled to ``--image-dpi``
+at their printed size.
+"""
+
+import argparse
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from build_deck import DECK_PATH, IMAGE_REFERENCE, REPO_DIR
+from pdf_writer import PDFStreamWriter, UnsupportedPDF, encode_text, literal
+
+NOTES_PATH = REPO_DIR / 'speaker_notes.txt'
+HANDOUT_PATH = REPO_DIR / 'vision_transformers_handout.pdf'
+
+# A4 portrait, in points
+PAGE_SIZE = (595.0, 842.0)
+MARGIN = 54.0
+# Share of the text area given to a slide's figures
+FIGURE_SHARE = 0.5
+FIGURE_GAP = 12.0
+
+TITLE_FONT, TITLE_SIZE, TITLE_LEADING = 'Helvetica-Bold', 15.0, 19.0
+HEADING_FONT, HEADING_SIZE = 'Helvetica-Bold', 11.0
+NOTES_FONT, NOTES_SIZE, NOTES_LEADING = 'Helvetica', 10.5, 14.0
+FOOTER_FONT, FOOTER_SIZE = 'Helvetica', 9.0
+
+IMAGE_DPI = 200
+
+SLIDE_HEADING = re.compile(r'^###\s+Slide\s+(\d+):\s*(.+?)\s*$')
+NOTES_HEADING = re.compile(r'^##\s+Slide\s+\d+:\s*(.+?)\s*$')
+
+
+@dataclass
+class Slide:
+    """One slide: its number, title, referenced figures and speaker notes."""
+
+    number: int
+    title: str
+    figures: list
+    notes: list  # paragraphs
+
+
+def _title_key(title):
+    return re.sub(r'[^a-z0-9]+', ' ', title.lower()).strip()
+
+
+def _paragraphs(lines):
+    """Join wrapped ``lines`` into paragraphs separated by blank lines."""
+    paragraphs, current = [], []
+    for line in lines:
+        if line.strip():
+            current.append(line.strip())
+        elif current:
+            paragraphs.append(' '.join(current))
+            current = []
+    if current:
+        paragraphs.append(' '.join(current))
+    return paragraphs
+
+
+def read_notes(path=NOTES_PATH):
+    """Speaker notes by normalised slide title: ``{title key: [paragraph, ...]}``."""
+    notes, title, lines = {}, None, []
+    path = Path(path)
+    if not path.exists():
+        return notes
+    for line in path.read_text(encoding='utf-8').splitlines():
+        heading = NOTES_HEADING.match(line)
+        if heading or line.startswith('## '):
+            if title:
+                notes[_title_key(title)] = _paragraphs(lines)
+            title, lines = heading.group(1) if heading else None, []
+        elif title:
+            lines.append(line)
+    if title:
+        notes[_title_key(title)] = _paragraphs(lines)
+    return notes
+
+
+def iter_slides(deck=DECK_PATH, notes_path=NOTES_PATH):
+    """Yield the deck's slides in order, reading the deck line by line."""
+    deck = Path(deck)
+    notes = read_notes(notes_path)
+    slide, comment = None, None
+
+    def finish(slide):
+        slide.notes = notes.get(_title_key(slide.title)) or slide.notes
+        return slide
+
+    with deck.open(encoding='utf-8') as lines:
+        for line in lines:
+            heading = SLIDE_HEADING.match(line)
+            if heading:
+                if slide:
+                    yield finish(slide)
+                slide, comment = Slide(int(heading.group(1)), heading.group(2), [], []), None
+                continue
+            if slide is None:
+                continue
+            if comment is not None:
+                if '-->' in line:
+                    comment.append(line.split('-->')[0])
+                    text = ' '.join(part.strip() for part in comment).strip()
+                    if text.startswith('Speaker Notes:'):
+                        slide.notes = [text[len('Speaker Notes:'):].strip()]
+                    comment = None
+                else:
+                    comment.append(line)
+            elif line.lstrip().startswith('<!--') and '-->' not in line:
+                comment = [line.lstrip()[4:]]
+            for target in IMAGE_REFERENCE.findall(line):
+                if '://' not in target and not target.startswith('data:'):
+                    slide.figures.append((deck.parent / target).resolve())
+    if slide:
+        yield finish(slide)
+
+
+def vector_source(path):
+    """The up-to-date ``.pdf`` rendering of figure ``path``, if there is one."""
+    if path.suffix == '.pdf':
+        return path if path.exists() else None
+    vector = path.with_suffix('.pdf')
+    if vector.exists() and (not path.exists()
+                            or vector.stat().st_mtime >= path.stat().st_mtime):
+        return vector
+    return None
+
+
+def load_pixels(path, width, height, dpi=IMAGE_DPI):
+    """RGB(A) pixels of ``path``, downsampled to ``dpi`` at ``width`` x ``height`` points."""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(path) as image:
+        limit = (max(1, round(width / 72 * dpi)), max(1, round(height / 72 * dpi)))
+        if image.width > limit[0] or image.height > limit[1]:
+            image.thumbnail(limit, Image.LANCZOS)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        return np.asarray(image.convert('RGBA' if has_alpha else 'RGB'))
+
+
+def figure_size(path, vector):
+    """Natural (width, height) of a figure, read without decoding its pixels."""
+    if vector is not None:
+        from pdf_writer import PDFReader
+
+        x0, y0, x1, y1 = (float(value) for value in PDFReader(vector).first_page()['MediaBox'])
+        return x1 - x0, y1 - y0
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return image.size
+
+
+class Handout:
+    """Lays slides out as pages of a ``PDFStreamWriter``."""
+
+    def __init__(self, pdf, image_dpi=IMAGE_DPI, vector=True):
+        self.pdf = pdf
+        self.image_dpi = image_dpi
+        self.vector = vector
+        self.page_number = 0
+        self.figure_count = {'vector': 0, 'raster': 0, 'missing': 0}
+
+    def wrap(self, text, font, size, width):
+        """Greedy word wrap of ``text`` to ``width`` points."""
+        lines, line = [], ''
+        for word in text.split():
+            candidate = f'{line} {word}' if line else word
+            if line and self.pdf.text_width(candidate, font, size) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        return lines + [line] if line else lines
+
+    def _text(self, content, text, font, size, x, y):
+        content.append(b'BT /%s %g Tf %.2f %.2f Td %s Tj ET'
+                       % (font.replace('-', '').encode(), size, x, y,
+                          literal(encode_text(text))))
+
+    def _figure(self, content, xobjects, path, x, y, width, height):
+        """Draw ``path`` fitted into the box at (x, y); returns the height used."""
+        vector = vector_source(path) if self.vector else None
+        if vector is None and not path.exists():
+            self.figure_count['missing'] += 1
+            self._text(content, f'[missing figure: {path.name}]', NOTES_FONT, NOTES_SIZE,
+                       x, y + height - NOTES_SIZE)
+            return NOTES_LEADING
+        try:
+            natural = figure_size(path, vector)
+        except UnsupportedPDF:
+            vector = None
+            natural = figure_size(path, None)
+        scale = min(width / natural[0], height / natural[1])
+        drawn_width, drawn_height = natural[0] * scale, natural[1] * scale
+        left, bottom = x + (width - drawn_width) / 2, y + height - drawn_height
+        name = f'Fig{len(xobjects)}'
+        if vector is not None:
+            try:
+                xobjects[name], (x0, y0, x1, y1) = self.pdf.import_page(vector)
+            except UnsupportedPDF:
+                vector = None
+            else:
+                content.append(b'q %.4f 0 0 %.4f %.2f %.2f cm /%s Do Q'
+                               % (scale, scale, left - x0 * scale, bottom - y0 * scale,
+                                  name.encode()))
+        if vector is None:
+            pixels = load_pixels(path, drawn_width, drawn_height, self.image_dpi)
+            xobjects[name] = self.pdf.add_image(pixels)
+            del pixels
+            content.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /%s Do Q'
+                           % (drawn_width, drawn_height, left, bottom, name.encode()))
+        self.figure_count['vector' if vector is not None else 'raster'] += 1
+        return drawn_height
+
+    def _finish_page(self, content, xobjects):
+        self.page_number += 1
+        width, _ = PAGE_SIZE
+        footer = str(self.page_number)
+        content.append(b'0.4 g')
+        self._text(content, footer, FOOTER_FONT, FOOTER_SIZE,
+                   (width - self.pdf.text_width(footer, FOOTER_FONT, FOOTER_SIZE)) / 2,
+                   MARGIN / 2)
+        self.pdf.add_page(*PAGE_SIZE, b'\n'.join(content), xobjects,
+                          fonts={TITLE_FONT, HEADING_FONT, NOTES_FONT, FOOTER_FONT})
+
+    def add_slide(self, slide):
+        """Write the page(s) for one slide; returns the number of pages written."""
+        width, height = PAGE_SIZE
+        text_width = width - 2 * MARGIN
+        pages = 0
+        content, xobjects = [], {}
+        y = height - MARGIN
+
+        def heading(suffix=''):
+            nonlocal y
+            for line in self.wrap(f'Slide {slide.number}: {slide.title}{suffix}',
+                                  TITLE_FONT, TITLE_SIZE, text_width):
+                y -= TITLE_LEADING
+                self._text(content, line, TITLE_FONT, TITLE_SIZE, MARGIN, y)
+            y -= TITLE_LEADING / 2
+
+        heading()
+        if slide.figures:
+            area = (y - MARGIN) * FIGURE_SHARE
+            each = (area - FIGURE_GAP * (len(slide.figures) - 1)) / len(slide.figures)
+            for path in slide.figures:
+                used = self._figure(content, xobjects, path, MARGIN, y - each, text_width, each)
+                y -= used + FIGURE_GAP
+
+        if slide.notes:
+            y -= HEADING_SIZE
+            self._text(content, 'Speaker notes', HEADING_FONT, HEADING_SIZE, MARGIN, y)
+            y -= NOTES_LEADING / 2
+            for paragraph in slide.notes:
+                for line in self.wrap(paragraph, NOTES_FONT, NOTES_SIZE, text_width):
+                    if y - NOTES_LEADING < MARGIN:
+                        self._finish_page(content, xobjects)
+                        pages += 1
+                        content, xobjects, y = [], {}, height - MARGIN
+                        heading(' (continued)')
+                    y -= NOTES_LEADING
+                    self._text(content, line, NOTES_FONT, NOTES_SIZE, MARGIN, y)
+                y -= NOTES_LEADING / 2
+        self._finish_page(content, xobjects)
+        return pages + 1
+
+
+def build_handout(output=HANDOUT_PATH, deck=DECK_PATH, notes=NOTES_PATH,
+                  image_dpi=IMAGE_DPI, vector=True):
+    """Write the handout PDF; returns the ``Handout`` with its page and figure counts."""
+    deck = Path(deck)
+    title = next((line[2:].strip() for line in deck.open(encoding='utf-8')
+                  if line.startswith('# ')), deck.stem)
+    with open(output, 'wb') as fileobj:
+        pdf = PDFStreamWriter(fileobj)
+        handout = Handout(pdf, image_dpi, vector)
+        for slide in iter_slides(deck, notes):
+            handout.add_slide(slide)
+        pdf.close(info={'Title': f'{title} - Handout', 'Producer': Path(__file__).name})
+    return handout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a PDF handout: one page per slide '
+                                                 'with its figures and speaker notes.')
+    parser.add_argument('--deck', type=Path, default=DECK_PATH,
+                        help=f'markdown deck (default: {DECK_PATH.name})')
+    parser.add_argument('--notes', type=Path, default=NOTES_PATH,
+                        help=f'speaker notes (default: {NOTES_PATH.name})')
+    parser.add_argument('-o', '--output', type=Path, default=HANDOUT_PATH,
+                        help=f'handout PDF (default: {HANDOUT_PATH.name})')
+    parser.add_argument('--image-dpi', type=int, default=IMAGE_DPI,
+                        help=f'resolution of raster figures at their printed size '
+                             f'(default: {IMAGE_DPI})')
+    parser.add_argument('--raster-only', action='store_true',
+                        help='embed the PNG of every figure, even where a .pdf exists')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    handout = build_handout(args.output, args.deck, args.notes, args.image_dpi,
+                            not args.raster_only)
+    counts = handout.figure_count
+    print(f"Handout saved as '{args.output}': {handout.page_number} pages, "
+          f"{counts['vector']} vector and {counts['raster']} raster figures"
+          + (f", {counts['missing']} missing" if counts['missing'] else '')
+          + f' in {time.perf_counter() - start:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
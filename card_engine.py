@@ -0,0 +1,662 @@
+"""
+Shared rendering engine for the 17-field card infographics.
+
+The clean-cards and SVG variants describe their layout as a spec dictionary;
+``build_figure`` turns a spec into a matplotlib figure once.  Every variant
+uses ``export_figure`` to write all requested formats from that same figure.
+Spec scripts only define the spec: ``render_card``, ``render_themes`` and
+``card_main`` provide their cached render, theme sweep and command line.
+Scripts that draw their own figure get the same through ``render_built``
+and ``figure_main``.
+
+matplotlib and NumPy are imported by the functions that draw, not at module
+level, so command line parsing (``--help``) and cache lookups stay fast.
+"""
+
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+
+from render_cache import cached_render
+from render_profile import phase, profile_render
+
+OUTPUT_DIR = Path(__file__).resolve().parent
+
+DEFAULT_FORMATS = ('png', 'svg', 'pdf')
+
+
+def pyplot():
+    """Import pyplot, selecting the non-interactive Agg backend first.
+
+    The renderers only write files, so no GUI backend is ever needed; a
+    backend chosen through ``MPLBACKEND`` or an earlier import is kept.  The
+    persistent text-extent cache is installed here (see ``text_metrics``).
+    """
+    import text_metrics
+
+    if 'matplotlib.pyplot' not in sys.modules and not os.environ.get('MPLBACKEND'):
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    text_metrics.install()
+    return plt
+
+
+def init_worker():
+    """Force the Agg backend and warm pyplot and the font cache (pool initializer)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+    from matplotlib import font_manager
+    font_manager.findfont('DejaVu Sans')
+
+
+def create_clean_card(ax, x, y, width, height, title, count, fields, color,
+                      icon, text_color, style, themed=None, role=None):
+    """Draw one card (shadow, border, header, badges and field list).
+
+    With a ``themed`` list, every artist drawn in ``color`` is recorded as
+    ``(artist, property, role)`` and every one drawn in ``text_color`` under
+    the ``'text'`` role (see ``recolor``).
+    """
+    import numpy as np
+    from matplotlib.collections import PatchCollection
+    from matplotlib.patches import Circle, FancyBboxPatch
+
+    # Card shadow (subtle)
+    shadow = FancyBboxPatch((x+0.02, y-0.02), width, height,
+                            boxstyle="round,pad=0.015",
+                            facecolor='#E0E0E0', alpha=0.5,
+                            edgecolor='none')
+    ax.add_patch(shadow)
+
+    # Main card with colored border
+    card = FancyBboxPatch((x, y), width, height,
+                          boxstyle="round,pad=0.015",
+                          facecolor='white',
+                          edgecolor=color, linewidth=3)
+    ax.add_patch(card)
+    if themed is not None:
+        themed.append((card, 'edgecolor', role))
+
+    # Colored header bar
+    header = FancyBboxPatch((x, y + height - 0.5), width, 0.5,
+                            boxstyle="round,pad=0.01",
+                            facecolor=color,
+                            edgecolor='none')
+    ax.add_patch(header)
+    if themed is not None:
+        themed.append((header, 'facecolor', role))
+
+    # Icon (left) and count (right) badge backgrounds, drawn as one collection
+    badge_y = y + height - 0.25
+    badge_x = np.array([x + 0.35, x + width - 0.35])
+    ax.add_collection(PatchCollection(
+        [Circle((bx, badge_y), 0.15, facecolor='white', edgecolor='none')
+         for bx in badge_x],
+        match_original=True, zorder=10))
+    icon_text = ax.text(badge_x[0], badge_y, icon, fontsize=style['icon_size'],
+                        fontweight='bold', ha='center', va='center', color=color, zorder=11)
+
+    # Title text
+    ax.text(x + 0.7, badge_y, title, fontsize=style['title_size'],
+            fontweight='bold', color='white', va='center')
+
+    count_text = ax.text(badge_x[1], badge_y, str(count),
+                         fontsize=style['count_size'], fontweight='bold', ha='center',
+                         va='center', color=color, zorder=11)
+
+    # Field list with bullets - proper spacing from header
+    y_positions = y + height - 0.85 - np.arange(len(fields)) * 0.35
+    bullets = ax.add_collection(PatchCollection(
+        [Circle((x + style['bullet_dx'], y_pos), style['bullet_radius'],
+                facecolor=color, alpha=style['bullet_alpha'])
+         for y_pos in y_positions],
+        match_original=True))
+    if themed is not None:
+        themed.extend([(icon_text, 'color', role), (count_text, 'color', role),
+                       (bullets, 'facecolor', role)])
+    texts = []
+    text_x = x + style['text_dx']
+    for y_pos, field in zip(y_positions, fields):
+        # Split field into name and description if colon present
+        if ':' in field:
+            field_name, field_desc = field.split(':', 1)
+            # Field name in bold
+            texts.append(ax.text(text_x, y_pos + 0.08, field_name + style['name_suffix'],
+                                 fontsize=style['name_size'], color=text_color,
+                                 va='top', ha='left', fontweight='bold'))
+            # Short description on the next line
+            texts.append(ax.text(text_x, y_pos - 0.08, field_desc.strip(),
+                                 fontsize=style['desc_size'], color=text_color, va='top',
+                                 ha='left', alpha=style['desc_alpha'],
+                                 wrap=style['desc_wrap']))
+        else:
+            # Field text without description
+            texts.append(ax.text(text_x, y_pos, field, fontsize=style['plain_size'],
+                                 color=text_color, va='center', ha='left'))
+    if themed is not None:
+        themed.extend((text, 'color', 'text') for text in texts)
+
+
+def build_figure(spec, handles=None):
+    """Build the complete card infographic described by ``spec``.
+
+    When a ``handles`` dict is passed, ``handles['cards']`` receives the list
+    of artists drawn for each card and ``handles['themed']`` every artist
+    coloured from ``spec['colors']`` (see ``recolor``).
+    """
+    from matplotlib.patches import FancyBboxPatch
+
+    plt = pyplot()
+    colors = spec['colors']
+    width, height = spec['figsize']
+
+    fig, ax = plt.subplots(figsize=spec['figsize'], facecolor=spec['facecolor'])
+    ax.set_xlim(0, width)
+    ax.set_ylim(0, height)
+    ax.axis('off')
+
+    # Title section
+    title = spec['title']
+    title_rect = FancyBboxPatch(title['box'][:2], *title['box'][2:],
+                                boxstyle="round,pad=0.02",
+                                facecolor=colors['dark'],
+                                edgecolor='none')
+    ax.add_patch(title_rect)
+    ax.text(*title['xy'], title['text'], fontsize=title['fontsize'],
+            fontweight='bold', color='white', ha='center', va='center')
+    themed = [(title_rect, 'facecolor', 'dark')]
+
+    subtitle = spec['subtitle']
+    subtitle_text = ax.text(*subtitle['xy'], subtitle['text'], fontsize=subtitle['fontsize'],
+                            color=colors.get(subtitle['color'], subtitle['color']),
+                            ha='center', va='center', style=subtitle['style'])
+    if subtitle['color'] in colors:
+        themed.append((subtitle_text, 'color', subtitle['color']))
+
+    # Cards
+    card_artists = []
+    for card in spec['cards']:
+        existing = set(ax.get_children())
+        create_clean_card(ax, card['x'], spec['card_y'], card['width'],
+                          spec['card_height'], card['title'], len(card['fields']),
+                          card['fields'], colors[card['color']], card['icon'],
+                          colors['text'], spec['card_style'], themed, card['color'])
+        card_artists.append([artist for artist in ax.get_children()
+                             if artist not in existing])
+
+    # Bottom summary bar
+    summary = spec['summary']
+    summary_rect = FancyBboxPatch(summary['box'][:2], *summary['box'][2:],
+                                  boxstyle="round,pad=0.02",
+                                  facecolor='#F8F9FA',
+                                  edgecolor=colors['dark'],
+                                  linewidth=1, linestyle='--', alpha=0.7)
+    ax.add_patch(summary_rect)
+    benefits = ax.text(summary['x'], 0.9, summary['benefits'], fontsize=summary['benefits_size'],
+                       ha='center', va='center', color=colors['dark'], fontweight='bold')
+    footer = ax.text(summary['x'], 0.4, summary['footer'], fontsize=summary['footer_size'],
+                     ha='center', va='center', color=colors['text'], style='italic')
+    themed += [(summary_rect, 'edgecolor', 'dark'), (benefits, 'color', 'dark'),
+               (footer, 'color', 'text')]
+    if handles is not None:
+        handles['cards'] = card_artists
+        handles['themed'] = themed
+
+    plt.tight_layout()
+    return fig
+
+
+def recolor(handles, colors):
+    """Re-colour a built figure in place from the palette ``colors``.
+
+    ``handles`` is the dict filled by ``build_figure``.  Each artist keeps
+    its alpha, so translucent bullets and borders stay translucent.
+    """
+    from matplotlib.colors import to_rgba
+
+    for artist, prop, role in handles['themed']:
+        if prop == 'color':
+            artist.set_color(colors[role])
+            continue
+        current = getattr(artist, f'get_{prop}')()
+        if hasattr(current, 'ndim') and current.ndim == 2:
+            # Collections hold one colour per member
+            getattr(artist, f'set_{prop}')([to_rgba(colors[role], alpha)
+                                             for alpha in current[:, 3]])
+        else:
+            getattr(artist, f'set_{prop}')(to_rgba(colors[role], current[3]))
+
+
+class ThemeSweep:
+    """Export one card spec in several palettes from a single built figure.
+
+    The figure is built on the first export; every theme after that only
+    re-colours the themed artists (see ``recolor``) and draws again; see
+    ``render_themes``.
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.fig = None
+        self.handles = {}
+
+    def themed_spec(self, name, palette):
+        """The spec for one theme: merged colours, output named ``<stem>_<name>``."""
+        unknown = set(palette) - set(self.spec['colors'])
+        if unknown:
+            raise ValueError(f"Theme {name!r} sets unknown colours: {', '.join(sorted(unknown))}")
+        spec = {key: value for key, value in self.spec.items() if key != 'stems'}
+        return {**spec, 'name': f"{self.spec['name']}_{name}",
+                'colors': {**self.spec['colors'], **palette}}
+
+    def export(self, spec, formats, output_dir=None):
+        """Re-colour the shared figure for ``spec`` and export it; returns the paths."""
+        if self.fig is None:
+            with phase('build'):
+                self.fig = build_figure(self.spec, self.handles)
+        with phase('recolor'):
+            recolor(self.handles, spec['colors'])
+        return export_figure(self.fig, spec['name'], formats, output_dir, spec=spec,
+                             **spec['savefig'])
+
+    def close(self):
+        if self.fig is not None:
+            pyplot().close(self.fig)
+            self.fig = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Palettes for --themes, keyed by the colour roles of the card specs;
+# roles a theme leaves out keep the spec's own colour
+THEMES = {
+    'default': {},
+    'ocean': {'primary': '#0077B6', 'secondary': '#00B4D8', 'accent1': '#48CAE4',
+              'accent2': '#023E8A', 'dark': '#03045E', 'text': '#1B263B'},
+    'sunset': {'primary': '#E63946', 'secondary': '#F4A261', 'accent1': '#E76F51',
+               'accent2': '#2A9D8F', 'dark': '#264653', 'text': '#2B2D42'},
+    'forest': {'primary': '#2D6A4F', 'secondary': '#40916C', 'accent1': '#74C69D',
+               'accent2': '#B7922F', 'dark': '#1B4332', 'text': '#081C15'},
+    'mono': {'primary': '#212529', 'secondary': '#495057', 'accent1': '#6C757D',
+             'accent2': '#ADB5BD', 'dark': '#343A40', 'text': '#212529'},
+}
+
+
+def parse_themes(value):
+    """Parse a ``--themes`` argument into ``{name: palette}``.
+
+    ``value`` is a comma separated list of ``THEMES`` names, or the path of a
+    JSON file mapping theme names to palettes.  Errors are raised as
+    ``argparse.ArgumentTypeError`` so argparse shows their message.
+    """
+    if value.endswith('.json'):
+        import json
+
+        try:
+            themes = json.loads(Path(value).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise argparse.ArgumentTypeError(f'Cannot read themes from {value}: {e}') from None
+        if not isinstance(themes, dict) or not all(isinstance(p, dict) for p in themes.values()):
+            raise argparse.ArgumentTypeError(f'{value} must map theme names to palettes')
+        return themes
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in THEMES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown theme(s): {', '.join(unknown)}; "
+                         f"expected {', '.join(THEMES)} or a .json file")
+    return {name: THEMES[name] for name in names}
+
+
+def export_card(spec, variant, formats, output_dir=None):
+    """Build ``spec``'s figure once and export ``formats``; returns the written paths.
+
+    ``variant`` names the render profile (see ``render_profile``).
+    """
+    with profile_render(variant) as profile:
+        with profile.phase('build'):
+            fig = build_figure(spec)
+        paths = export_figure(fig, spec_stem(spec), formats, output_dir, spec=spec,
+                              **spec['savefig'])
+        profile.count_artists(fig)
+    pyplot().close(fig)
+    return paths
+
+
+def render_card(spec, variant, output_dir=None, formats=None, force=False, dry_run=False):
+    """Export ``spec`` through the render cache, skipping unchanged outputs.
+
+    ``formats`` defaults to ``spec['formats']``.  With ``dry_run`` nothing is
+    rendered; returns the paths that would be.
+    """
+    return cached_render(spec, spec_stem(spec), formats or spec['formats'],
+                         partial(export_card, spec, variant), output_dir, force,
+                         dry_run=dry_run)
+
+
+def render_themes(spec, variant, themes, output_dir=None, formats=None, force=False):
+    """Export one copy of ``spec`` per theme (``{name: palette}``) from a single built figure.
+
+    Outputs are named ``<stem>_<theme>``; each theme goes through the render
+    cache on its own, and the figure is only built if one of them is stale.
+    """
+    paths = []
+    with profile_render(f'{variant}_themes'), ThemeSweep(spec) as sweep:
+        for name, palette in themes.items():
+            themed = sweep.themed_spec(name, palette)
+            paths += cached_render(themed, themed['name'], formats or spec['formats'],
+                                   partial(sweep.export, themed), output_dir, force)
+    return paths
+
+
+def card_main(spec, variant, description, saved):
+    """Command line of a card script: parse the shared flags and render ``spec``.
+
+    ``saved`` is printed for every written file, formatted with its ``name``.
+    """
+    parser = _render_parser(description, spec['formats'])
+    parser.add_argument('--themes', type=parse_themes, default=None,
+                        help='comma separated palettes (' + ', '.join(THEMES) + ') or a JSON '
+                             'file of them; writes one <name>_<theme> copy per palette')
+    args = parser.parse_args()
+    apply_export_arguments(args)
+
+    if args.themes:
+        paths = render_themes(spec, variant, args.themes, formats=args.formats,
+                              force=args.force)
+    else:
+        paths = render_card(spec, variant, formats=args.formats, force=args.force)
+    for path in paths:
+        print(saved.format(name=path.name))
+
+
+def export_built(build, variant, spec, formats, output_dir=None):
+    """Export the figure returned by ``build()``; returns the written paths.
+
+    For scripts that draw their own figure instead of describing cards.
+    ``spec`` supplies the output ``name``, the ``savefig`` arguments and an
+    optional matplotlib ``style`` applied while building and saving.
+    """
+    plt = pyplot()
+    style = plt.style.context(spec['style']) if spec.get('style') else nullcontext()
+    with profile_render(variant) as profile, style:
+        with profile.phase('build'):
+            fig = build()
+        paths = export_figure(fig, spec['name'], formats, output_dir, **spec['savefig'])
+        profile.count_artists(fig)
+    plt.close(fig)
+    return paths
+
+
+def render_built(build, variant, spec, output_dir=None, formats=None, force=False,
+                 dry_run=False, sources=()):
+    """``render_card`` for ``export_built`` figures.
+
+    ``spec`` has to cover everything the drawing depends on that ``sources``
+    (the drawing script) does not, since it is the cache key.
+    """
+    return cached_render(spec, spec['name'], formats or spec['formats'],
+                         partial(export_built, build, variant, spec), output_dir, force,
+                         sources=sources, dry_run=dry_run)
+
+
+def figure_main(render, formats, description, saved):
+    """Command line of a drawing script: parse the shared flags and call ``render``.
+
+    ``render`` takes ``formats`` and ``force`` keywords; ``saved`` is printed
+    for every written file, formatted with its ``name``.
+    """
+    parser = _render_parser(description, formats)
+    args = parser.parse_args()
+    apply_export_arguments(args)
+
+    for path in render(formats=args.formats, force=args.force):
+        print(saved.format(name=path.name))
+
+
+def _render_parser(description, formats):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--formats', type=parse_formats, default=formats,
+                        help='comma separated output formats (png,svg,pdf; png@<dpi> adds a resolution)')
+    parser.add_argument('--force', action='store_true',
+                        help='re-render even if the cached output is up to date')
+    add_export_arguments(parser)
+    return parser
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+def export_options():
+    """Export tuning taken from the environment.
+
+    Environment variables are inherited by ``render_all`` pool workers, so the
+    command line flags only have to set them once.  ``RENDER_TILE_ROWS``
+    enables strip-wise PNG rasterisation (see ``raster_export``) and
+    ``RENDER_CARD_TILES`` per-card parallel rendering (see ``card_tiles``).
+    ``RENDER_PNG_LEVEL``, ``RENDER_PNG_FILTER``, ``RENDER_PNG_PALETTE`` and
+    ``RENDER_PNG_JOBS`` tune the PNG encoder (see ``png_writer``); when none
+    is set PNGs are encoded by savefig as before.  ``RENDER_SVG_PRECISION``
+    passes SVGs through ``svg_optimize`` with that many decimals.
+    ``RENDER_STATIC_LAYERS`` composites PNGs from a cached static layer and
+    freshly drawn text (see ``static_layers``).
+    """
+    return {
+        'tile_rows': int(os.environ.get('RENDER_TILE_ROWS') or 0) or None,
+        'card_tiles': bool(os.environ.get('RENDER_CARD_TILES')),
+        'static_layers': bool(os.environ.get('RENDER_STATIC_LAYERS')),
+        'png': {
+            'level': _env_int('RENDER_PNG_LEVEL'),
+            'filter': os.environ.get('RENDER_PNG_FILTER') or None,
+            'palette': _env_int('RENDER_PNG_PALETTE'),
+            'jobs': _env_int('RENDER_PNG_JOBS'),
+        },
+        'svg_precision': _env_int('RENDER_SVG_PRECISION'),
+    }
+
+
+def split_format(fmt):
+    """Split ``'png@300'`` into ``('png', 300)``; plain formats have no dpi."""
+    ext, _, dpi = fmt.partition('@')
+    return ext, int(dpi) if dpi else None
+
+
+def spec_stem(spec):
+    """Output stem of ``spec`` as ``output_path`` takes it.
+
+    ``spec['stems']`` keeps historical file names for some extensions; the
+    stem is then a mapping with ``spec['name']`` under ``''`` for the rest.
+    """
+    if 'stems' not in spec:
+        return spec['name']
+    return {'': spec['name'], **spec['stems']}
+
+
+def output_path(stem, fmt, output_dir=None):
+    """File written for one format, e.g. ``<stem>_300dpi.png`` for ``png@300``.
+
+    ``stem`` may map extensions to stems (see ``spec_stem``).
+    """
+    output_dir = OUTPUT_DIR if output_dir is None else Path(output_dir)
+    ext, dpi = split_format(fmt)
+    if not isinstance(stem, str):
+        stem = stem.get(ext, stem[''])
+    return output_dir / (f'{stem}_{dpi}dpi.{ext}' if dpi else f'{stem}.{ext}')
+
+
+def export_figure(fig, stem, formats=DEFAULT_FORMATS, output_dir=None, spec=None,
+                  **savefig_kwargs):
+    """Save one already-built figure in every requested format.
+
+    The artist tree is shared between formats, so figure construction is paid
+    once no matter how many outputs are written.  PNG resolutions requested
+    as ``png@<dpi>`` are rasterised once at the highest dpi and downsampled
+    (see ``raster_export.export_png_pyramid``).  Tightly cropped PNGs are
+    measured up front instead of through savefig's full-size measuring pass
+    (see ``raster_export.save_png_measured``).  In card-tile mode, PNGs of a
+    ``spec``-built figure are composited from per-card tiles instead (see
+    ``card_tiles``); otherwise, in static-layer mode, from a cached
+    background and the figure's text (see ``static_layers``).  SVGs can be
+    post-processed by ``svg_optimize``.
+    Returns the written paths.
+    """
+    import text_metrics
+    from raster_export import layout_is_final, save_png_measured
+
+    savefig_kwargs.setdefault('bbox_inches', 'tight')
+    options = export_options()
+    tight = savefig_kwargs['bbox_inches'] == 'tight'
+    png = {name: value for name, value in options['png'].items() if value is not None}
+
+    paths = []
+    png_targets = []
+    for fmt in formats:
+        path = output_path(stem, fmt, output_dir)
+        paths.append(path)
+        ext, dpi = split_format(fmt)
+        if ext == 'png' and tight and spec is not None and options['card_tiles']:
+            from card_tiles import export_png_composited
+
+            kwargs = dict(savefig_kwargs)
+            base_dpi = kwargs.pop('dpi', fig.dpi)
+            with phase(f'savefig:{fmt}'):
+                export_png_composited(spec, path, dpi or base_dpi, png=png, **kwargs)
+            continue
+        if ext == 'png' and tight and options['static_layers']:
+            from static_layers import export_png_layered
+
+            kwargs = dict(savefig_kwargs)
+            base_dpi = kwargs.pop('dpi', fig.dpi)
+            with phase(f'savefig:{fmt}'):
+                export_png_layered(fig, path, dpi or base_dpi, png=png, **kwargs)
+            continue
+        if ext == 'svg' and options['svg_precision'] is not None:
+            from svg_optimize import save_svg_optimized
+
+            with phase(f'savefig:{fmt}'):
+                save_svg_optimized(fig, path, options['svg_precision'], **savefig_kwargs)
+            continue
+        if ext == 'png' and tight and (dpi or options['tile_rows']):
+            png_targets.append((path, dpi or savefig_kwargs.get('dpi', fig.dpi)))
+            continue
+        with phase(f'savefig:{fmt}'):
+            if ext == 'png' and tight and layout_is_final(fig):
+                save_png_measured(fig, path, png, **savefig_kwargs)
+            elif dpi:
+                fig.savefig(path, format=ext, **{**savefig_kwargs, 'dpi': dpi})
+            else:
+                fig.savefig(path, format=ext, **savefig_kwargs)
+
+    if png_targets:
+        import matplotlib as mpl
+
+        from raster_export import export_png_pyramid
+
+        kwargs = dict(savefig_kwargs)
+        kwargs.pop('dpi', None)
+        pad_inches = kwargs.pop('pad_inches', mpl.rcParams['savefig.pad_inches'])
+        with phase('savefig:png_strips'):
+            export_png_pyramid(fig, png_targets, options['tile_rows'] or 512, pad_inches, png,
+                               **kwargs)
+    # Pool workers exit without running atexit handlers
+    text_metrics.flush()
+    return paths
+
+
+def add_export_arguments(parser):
+    """Add the shared export flags to a script's argument parser."""
+    from png_writer import FILTERS
+
+    parser.add_argument('--tile-rows', type=int, default=None,
+                        help='rasterise PNGs in strips of this many rows to cap memory')
+    parser.add_argument('--card-tiles', action='store_true',
+                        help='render card PNGs as cached per-card tiles in parallel')
+    parser.add_argument('--static-layers', action='store_true',
+                        help='composite PNGs from a cached static background and their text')
+    parser.add_argument('--png-level', type=int, choices=range(10), default=None,
+                        metavar='0-9', help='zlib compression level for PNGs')
+    parser.add_argument('--png-filter', choices=FILTERS, default=None,
+                        help='PNG scanline filter (default: adaptive, which picks one per row; '
+                             'none for palette PNGs)')
+    parser.add_argument('--png-palette', type=parse_palette, default=None, metavar='COLORS',
+                        help='write indexed PNGs with at most COLORS colours (lossy above '
+                             'the image\'s own colour count)')
+    parser.add_argument('--png-jobs', type=int, default=None, metavar='N',
+                        help='deflate PNGs on N threads')
+    parser.add_argument('--svg-precision', type=parse_digits, default=None, metavar='DIGITS',
+                        help='optimise SVGs (shared shapes, fewer styles), rounding '
+                             'coordinates to DIGITS decimals')
+    parser.add_argument('--no-text-cache', action='store_true',
+                        help='measure text with matplotlib only, without the persistent extent cache')
+    parser.add_argument('--profile', metavar='DIR', default=None,
+                        help='write a per-phase timing report for each render to DIR')
+    parser.add_argument('--cprofile', action='store_true',
+                        help='with --profile, also dump cProfile statistics')
+
+
+def apply_export_arguments(args):
+    """Publish export flags through the environment.
+
+    See ``export_options``, ``text_metrics`` and ``render_profile``.
+    """
+    if args.tile_rows:
+        os.environ['RENDER_TILE_ROWS'] = str(args.tile_rows)
+    if args.card_tiles:
+        os.environ['RENDER_CARD_TILES'] = '1'
+    if args.static_layers:
+        os.environ['RENDER_STATIC_LAYERS'] = '1'
+    for name in ('level', 'filter', 'palette', 'jobs'):
+        value = getattr(args, f'png_{name}')
+        if value is not None:
+            os.environ[f'RENDER_PNG_{name.upper()}'] = str(value)
+    if args.svg_precision is not None:
+        os.environ['RENDER_SVG_PRECISION'] = str(args.svg_precision)
+    if args.no_text_cache:
+        os.environ['RENDER_TEXT_CACHE'] = '0'
+    if args.profile:
+        os.environ['RENDER_PROFILE'] = str(Path(args.profile).resolve())
+        if args.cprofile:
+            os.environ['RENDER_PROFILE_CPROFILE'] = '1'
+
+
+def parse_palette(value):
+    """Parse a ``--png-palette`` size; an indexed PNG holds 1 to 256 colours."""
+    from png_writer import MAX_PALETTE
+
+    colors = int(value)
+    if not 1 <= colors <= MAX_PALETTE:
+        raise argparse.ArgumentTypeError(f'palette size must be between 1 and {MAX_PALETTE}, '
+                                         f'got {value}')
+    return colors
+
+
+def parse_digits(value):
+    """Parse a number of decimal digits, which cannot be negative."""
+    digits = int(value)
+    if digits < 0:
+        raise argparse.ArgumentTypeError(f'negative number of digits: {value}')
+    return digits
+
+
+def parse_formats(value):
+    """Parse a comma separated ``--formats`` argument.
+
+    PNG entries may carry a resolution, e.g. ``png@150,png@300,png@600``.
+    """
+    formats = tuple(fmt.strip().lower() for fmt in value.split(',') if fmt.strip())
+    for fmt in formats:
+        ext, _, dpi = fmt.partition('@')
+        if ext not in DEFAULT_FORMATS or (dpi and (ext != 'png' or not dpi.isdigit()
+                                                   or int(dpi) == 0)):
+            raise ValueError(f"Unsupported format: {fmt}")
+    return formats
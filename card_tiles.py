@@ -0,0 +1,151 @@
+"""
+Per-card tile rendering for the spec-driven card infographics.
+
+``export_png_composited`` draws the background layer (title, subtitle and
+summary) once, renders every card as its own transparent tile in a process
+pool and alpha-composites the tiles into the final canvas.  Tiles are pixel
+aligned to that canvas, and cards do not overlap each other or the
+background artists, so the result matches a single-canvas render.
+
+Tiles are cached individually in the render cache, keyed by the card's own
+spec and the canvas geometry, so editing one category only re-renders its
+card.
+"""
+
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.transforms import Bbox
+
+from card_engine import build_figure, init_worker, pyplot
+from png_writer import write_png
+from raster_export import alpha_over, hide, measure_bbox, render_region, window_extent
+from render_cache import forced, lookup, spec_key, store
+from render_profile import phase
+
+# Spare pixels around each card's measured extent
+TILE_MARGIN = 2
+
+
+def _card_region(fig, artists, canvas, dpi):
+    """Pixel box (left, bottom, width, height) covering ``artists`` on the canvas."""
+    x0, y0, width, height = canvas
+    renderer = RendererAgg(1, 1, dpi)
+    saved_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        extent = Bbox.union([window_extent(artist, renderer, dpi)
+                             for artist in artists])
+    finally:
+        fig.dpi = saved_dpi
+    left = max(0, math.floor(extent.x0 - x0 * dpi) - TILE_MARGIN)
+    bottom = max(0, math.floor(extent.y0 - y0 * dpi) - TILE_MARGIN)
+    right = min(width, math.ceil(extent.x1 - x0 * dpi) + TILE_MARGIN)
+    top = min(height, math.ceil(extent.y1 - y0 * dpi) + TILE_MARGIN)
+    return left, bottom, right - left, top - bottom
+
+
+def render_card_tile(spec, index, canvas, dpi):
+    """Render card ``index`` as a transparent tile; returns (top, left, rgba)."""
+    plt = pyplot()
+    handles = {}
+    fig = build_figure(spec, handles)
+    try:
+        artists = handles['cards'][index]
+        keep = set(artists)
+        hide(artist for ax in fig.axes for artist in ax.get_children()
+              if artist not in keep)
+        left, bottom, width, height = _card_region(fig, artists, canvas, dpi)
+        rgba = render_region(fig, canvas, dpi, left, bottom, width, height,
+                              transparent=True)
+    finally:
+        plt.close(fig)
+    return canvas[3] - bottom - height, left, rgba
+
+
+def tile_key(spec, index, axes_bounds, canvas, dpi):
+    """Cache key of one card tile: its card, the shared card styling and the canvas."""
+    tile_spec = {
+        'card': spec['cards'][index],
+        'colors': spec['colors'],
+        'card_style': spec['card_style'],
+        'card_y': spec['card_y'],
+        'card_height': spec['card_height'],
+        'figsize': spec['figsize'],
+        'axes': axes_bounds,
+        'canvas': canvas,
+    }
+    return spec_key(tile_spec, f'npz@{dpi}', sources=(__file__,))
+
+
+def _store_tile(key, tile):
+    top, left, rgba = tile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'tile.npz'
+        np.savez(path, top=top, left=left, rgba=rgba)
+        store(key, path)
+
+
+def _load_tile(path):
+    with np.load(path) as data:
+        return int(data['top']), int(data['left']), data['rgba']
+
+
+def export_png_composited(spec, path, dpi, jobs=None, pad_inches=0.1, png=None,
+                          **savefig_kwargs):
+    """Write ``spec`` as a PNG assembled from cached or freshly rendered card tiles.
+
+    ``png`` holds ``png_writer`` encoder options for the final image.
+    """
+    savefig_kwargs.pop('bbox_inches', None)
+    savefig_kwargs.pop('format', None)
+    savefig_kwargs.pop('dpi', None)
+
+    plt = pyplot()
+    handles = {}
+    fig = build_figure(spec, handles)
+    try:
+        bbox = measure_bbox(fig, pad_inches, dpi)
+        canvas = (bbox.x0, bbox.y0, int(bbox.width * dpi), int(bbox.height * dpi))
+        axes_bounds = tuple(fig.axes[0].get_position().bounds)
+        cards = range(len(spec['cards']))
+        keys = [tile_key(spec, index, axes_bounds, canvas, dpi) for index in cards]
+        cached = [None if forced() else lookup(key, f'npz@{dpi}') for key in keys]
+        missing = [index for index in cards if cached[index] is None]
+
+        jobs = min(jobs or os.cpu_count() or 1, len(missing) or 1)
+        pool = (ProcessPoolExecutor(max_workers=jobs, initializer=init_worker)
+                if missing else nullcontext())
+        with pool:
+            futures = {index: pool.submit(render_card_tile, spec, index, canvas, dpi)
+                       for index in missing}
+
+            # The background layer is drawn here while the workers render cards
+            with phase('card_tiles:background'):
+                hide(artist for group in handles['cards'] for artist in group)
+                image = render_region(fig, canvas, dpi, 0, 0, canvas[2], canvas[3],
+                                       **savefig_kwargs)
+
+            with phase('card_tiles:tiles'):
+                tiles = []
+                for index in cards:
+                    if index in futures:
+                        tile = futures[index].result()
+                        _store_tile(keys[index], tile)
+                    else:
+                        tile = _load_tile(cached[index])
+                    tiles.append(tile)
+    finally:
+        plt.close(fig)
+
+    with phase('card_tiles:composite'):
+        for top, left, rgba in tiles:
+            alpha_over(image, rgba, top, left)
+        write_png(path, image, dpi, **(png or {}))
+    return path
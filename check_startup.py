@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Check that every command line script starts quickly.
+
+Runs ``--help`` of each script in ``render_bench.CLI_SCRIPTS`` in a fresh
+process and fails when one takes longer than the budget or imports
+matplotlib or NumPy.  Needs no arguments, so it can run as a plain
+``python check_startup.py`` before every commit or in CI; it is the same
+check as ``render_bench.py --startup-budget``.
+"""
+
+import argparse
+
+from render_bench import CLI_SCRIPTS, STARTUP_BUDGET, check_startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the --help startup of every script.')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, metavar='SECONDS',
+                        help=f'allowed --help wall time per script (default: {STARTUP_BUDGET})')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per script; the fastest is reported (default: 1)')
+    args = parser.parse_args()
+
+    failures = check_startup(args.budget, args.repeat)
+    print(f'{failures} of {len(CLI_SCRIPTS)} scripts over the {args.budget}s startup budget')
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,19 @@
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.patches import FancyBboxPatch, Rectangle
+from card_engine import figure_main, pyplot, render_built
+from field_schema import load_schema, total_fields
 
-# Set up the figure with modern gradient background
-fig, ax = plt.subplots(figsize=(14, 10), facecolor='white')
-ax.set_xlim(0, 14)
-ax.set_ylim(0, 10)
-ax.axis('off')
+NAME = '17_fields_modern'
+FORMATS = ('png',)
+SAVEFIG = {'dpi': 300, 'facecolor': 'white'}
 
-# Create gradient background
-gradient = np.linspace(0, 1, 256).reshape(1, -1)
-gradient = np.vstack((gradient, gradient))
-ax.imshow(gradient, aspect='auto', cmap='Blues_r', alpha=0.1, extent=[0, 14, 0, 10])
+CATEGORIES = load_schema()
+
+# Card position, width and palette key for each category, in schema order
+CARD_LAYOUT = [
+    (0.5, 3.2, 'primary'),
+    (4.0, 3.2, 'secondary'),
+    (7.5, 3.2, 'accent1'),
+    (11.0, 2.5, 'accent2'),
+]
 
 # Modern color palette
 colors = {
@@ -23,19 +25,13 @@ colors = {
     'light': '#F5F5F5'
 }
 
-# Title with modern styling
-title_rect = FancyBboxPatch((1, 8.5), 12, 1.2,
-                            boxstyle="round,pad=0.02",
-                            facecolor=colors['dark'],
-                            edgecolor='none')
-ax.add_patch(title_rect)
-ax.text(7, 9.1, '17 CRITICAL FIELDS', fontsize=22, fontweight='bold',
-        color='white', ha='center', va='center')
-ax.text(7, 8.2, 'Work-Related Expense Substantiation Requirements',
-        fontsize=11, color=colors['accent1'], ha='center', va='center')
-
-# Create card-style sections
-def create_card(x, y, width, height, title, count, fields, color, icon_text):
+
+def create_card(ax, x, y, width, height, title, count, fields, color, icon_text):
+    """Draw one card-style section."""
+    import numpy as np
+    from matplotlib.collections import PatchCollection
+    from matplotlib.patches import Circle, FancyBboxPatch, Rectangle
+
     # Card shadow
     shadow = FancyBboxPatch((x+0.05, y-0.05), width, height,
                             boxstyle="round,pad=0.02",
@@ -55,22 +51,22 @@ def create_card(x, y, width, height, title, count, fields, color, icon_text):
                       facecolor=color, edgecolor='none')
     ax.add_patch(header)
 
-    # Icon circle
-    icon_circle = plt.Circle((x + 0.4, y + height - 0.3), 0.15,
-                            facecolor='white', edgecolor='none')
-    ax.add_patch(icon_circle)
-    ax.text(x + 0.4, y + height - 0.3, icon_text, fontsize=14,
+    # Icon and count badge circles, drawn as one collection
+    badge_y = y + height - 0.3
+    badge_x = np.array([x + 0.4, x + width - 0.4])
+    ax.add_collection(PatchCollection(
+        [Circle((bx, badge_y), 0.15, facecolor='white', edgecolor='none')
+         for bx in badge_x],
+        match_original=True))
+    ax.text(badge_x[0], badge_y, icon_text, fontsize=14,
             ha='center', va='center', color=color)
 
     # Title
-    ax.text(x + 0.8, y + height - 0.3, title, fontsize=11,
+    ax.text(x + 0.8, badge_y, title, fontsize=11,
             fontweight='bold', color='white', va='center')
 
     # Count badge
-    badge = plt.Circle((x + width - 0.4, y + height - 0.3), 0.15,
-                      facecolor='white', edgecolor='none')
-    ax.add_patch(badge)
-    ax.text(x + width - 0.4, y + height - 0.3, str(count),
+    ax.text(badge_x[1], badge_y, str(count),
             fontsize=12, fontweight='bold', ha='center', va='center', color=color)
 
     # Field list
@@ -79,70 +75,102 @@ def create_card(x, y, width, height, title, count, fields, color, icon_text):
         ax.text(x + 0.3, y_pos, f'• {field}', fontsize=9,
                 color=colors['dark'], va='center')
 
-# Create the four cards
-create_card(0.5, 4.5, 3.2, 3.0,
-           'General Document', 6,
-           ['DOCUMENT_TYPE', 'BUSINESS_ABN', 'SUPPLIER_NAME',
-            'BUSINESS_ADDRESS', 'PAYER_NAME', 'PAYER_ADDRESS'],
-           colors['primary'], '📄')
-
-create_card(4.0, 4.5, 3.2, 3.0,
-           'Date & Amount', 5,
-           ['INVOICE_DATE', 'STATEMENT_DATE', 'IS_GST_INCLUDED',
-            'GST_AMOUNT', 'TOTAL_AMOUNT'],
-           colors['secondary'], '📅')
-
-create_card(7.5, 4.5, 3.2, 3.0,
-           'Line Items', 4,
-           ['ITEM_DESCRIPTIONS', 'ITEM_QUANTITIES',
-            'ITEM_PRICES', 'ITEM_TOTAL_PRICES'],
-           colors['accent1'], '📋')
-
-create_card(11.0, 4.5, 2.5, 3.0,
-           'Transactions', 2,
-           ['TRANSACTION_DATES',
-            'AMOUNTS_PAID'],
-           colors['accent2'], '💳')
-
-# Stats bar at bottom
-stats_rect = FancyBboxPatch((0.5, 1.5), 13, 2.5,
-                            boxstyle="round,pad=0.02",
-                            facecolor=colors['light'],
-                            edgecolor=colors['dark'], linewidth=1)
-ax.add_patch(stats_rect)
-
-# Add key benefits
-benefits = [
-    ('✅', 'Automated\nValidation'),
-    ('🔗', 'Cross\nReferencing'),
-    ('📊', 'Compliance\nChecking'),
-    ('📁', 'Audit Trail\nMaintenance')
-]
 
-for i, (icon, text) in enumerate(benefits):
-    x_pos = 2.5 + (i * 3)
-    # Icon
-    icon_bg = plt.Circle((x_pos, 3.2), 0.25,
-                         facecolor=colors['primary'], alpha=0.2)
-    ax.add_patch(icon_bg)
-    ax.text(x_pos, 3.2, icon, fontsize=16, ha='center', va='center')
-    # Text
-    ax.text(x_pos, 2.5, text, fontsize=9, ha='center', va='center',
-            color=colors['dark'])
-
-# Progress indicator
-ax.text(7, 0.8, 'Complete document capture ensures accurate expense substantiation',
-        fontsize=10, ha='center', style='italic', color=colors['dark'])
-
-# Add decorative elements
-for i in range(3):
-    circle = plt.Circle((1 + i*6, 0.3), 0.05,
-                       facecolor=colors['primary'], alpha=0.3 - i*0.1)
-    ax.add_patch(circle)
-
-plt.tight_layout()
-plt.savefig('/Users/tod/Desktop/ssd_du_presentation/17_fields_modern.png',
-            dpi=300, bbox_inches='tight', facecolor='white')
-plt.close()
-
-print("Modern card-style infographic saved as '17_fields_modern.png'")
\ No newline at end of file
+def build_figure():
+    """Build the modern card-style infographic."""
+    import numpy as np
+    from matplotlib.collections import PatchCollection
+    from matplotlib.patches import Circle, FancyBboxPatch
+
+    plt = pyplot()
+    # Set up the figure with modern gradient background
+    fig, ax = plt.subplots(figsize=(14, 10), facecolor='white')
+    ax.set_xlim(0, 14)
+    ax.set_ylim(0, 10)
+    ax.axis('off')
+
+    # Create gradient background
+    gradient = np.linspace(0, 1, 256).reshape(1, -1)
+    gradient = np.vstack((gradient, gradient))
+    ax.imshow(gradient, aspect='auto', cmap='Blues_r', alpha=0.1, extent=[0, 14, 0, 10])
+
+    # Title with modern styling
+    title_rect = FancyBboxPatch((1, 8.5), 12, 1.2,
+                                boxstyle="round,pad=0.02",
+                                facecolor=colors['dark'],
+                                edgecolor='none')
+    ax.add_patch(title_rect)
+    ax.text(7, 9.1, f'{total_fields(CATEGORIES)} CRITICAL FIELDS', fontsize=22, fontweight='bold',
+            color='white', ha='center', va='center')
+    ax.text(7, 8.2, 'Work-Related Expense Substantiation Requirements',
+            fontsize=11, color=colors['accent1'], ha='center', va='center')
+
+    # Create one card per schema category
+    for (x, width, color), category in zip(CARD_LAYOUT, CATEGORIES, strict=True):
+        create_card(ax, x, 4.5, width, 3.0,
+                    category.title, len(category.fields),
+                    [field.label for field in category.fields],
+                    colors[color], category.icon)
+
+    # Stats bar at bottom
+    stats_rect = FancyBboxPatch((0.5, 1.5), 13, 2.5,
+                                boxstyle="round,pad=0.02",
+                                facecolor=colors['light'],
+                                edgecolor=colors['dark'], linewidth=1)
+    ax.add_patch(stats_rect)
+
+    # Add key benefits
+    benefits = [
+        ('✅', 'Automated\nValidation'),
+        ('🔗', 'Cross\nReferencing'),
+        ('📊', 'Compliance\nChecking'),
+        ('📁', 'Audit Trail\nMaintenance')
+    ]
+
+    benefit_x = 2.5 + np.arange(len(benefits)) * 3
+    # Icon backgrounds
+    ax.add_collection(PatchCollection(
+        [Circle((x_pos, 3.2), 0.25, facecolor=colors['primary'], alpha=0.2)
+         for x_pos in benefit_x],
+        match_original=True))
+    for x_pos, (icon, text) in zip(benefit_x, benefits):
+        # Icon
+        ax.text(x_pos, 3.2, icon, fontsize=16, ha='center', va='center')
+        # Text
+        ax.text(x_pos, 2.5, text, fontsize=9, ha='center', va='center',
+                color=colors['dark'])
+
+    # Progress indicator
+    ax.text(7, 0.8, 'Complete document capture ensures accurate expense substantiation',
+            fontsize=10, ha='center', style='italic', color=colors['dark'])
+
+    # Add decorative elements
+    ax.add_collection(PatchCollection(
+        [Circle((1 + i*6, 0.3), 0.05, facecolor=colors['primary'], alpha=0.3 - i*0.1)
+         for i in range(3)],
+        match_original=True))
+
+    plt.tight_layout()
+    return fig
+
+
+def render(output_dir=None, formats=FORMATS, force=False, dry_run=False):
+    """Export through the render cache, skipping unchanged outputs.
+
+    With ``dry_run`` nothing is rendered; returns the paths that would be.
+    """
+    spec = {'name': NAME, 'formats': FORMATS, 'savefig': SAVEFIG, 'colors': colors,
+            'categories': [(category.title, category.icon,
+                            [field.label for field in category.fields])
+                           for category in CATEGORIES]}
+    return render_built(build_figure, 'modern', spec, output_dir, formats, force, dry_run,
+                        sources=(__file__,))
+
+
+def main():
+    figure_main(render, FORMATS, 'Render the modern card-style infographic.',
+                "Modern card-style infographic saved as '{name}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,183 +1,81 @@
-import matplotlib.pyplot as plt
-from matplotlib.patches import FancyBboxPatch
+from card_engine import card_main, render_card
+from field_schema import load_schema, total_fields
 
-# Copy the exact same code from create_17_fields_clean_cards.py
-# but change the save format to SVG
+CATEGORIES = load_schema()
 
-# Set up the figure with clean white background
-fig, ax = plt.subplots(figsize=(20, 7), facecolor='white')
-ax.set_xlim(0, 20)
-ax.set_ylim(0, 7)
-ax.axis('off')
-
-# Modern color palette
-colors = {
-    'primary': '#0066CC',      # Blue
-    'secondary': '#FF6B35',    # Orange
-    'accent1': '#00D9FF',      # Cyan
-    'accent2': '#FFD93D',      # Yellow
-    'dark': '#1A1A2E',         # Dark blue
-    'text': '#2C3E50',         # Dark gray
-    'white': '#FFFFFF'
-}
-
-# Title section
-title_rect = FancyBboxPatch((1, 5.8), 18, 1.0,
-                            boxstyle="round,pad=0.02",
-                            facecolor=colors['dark'],
-                            edgecolor='none')
-ax.add_patch(title_rect)
-ax.text(10, 6.3, '17 CRITICAL FIELDS', fontsize=24, fontweight='bold',
-        color='white', ha='center', va='center')
-
-# Subtitle
-ax.text(10, 5.5, 'Work-Related Expense Substantiation Requirements',
-        fontsize=12, color=colors['accent1'], ha='center', va='center', style='italic')
-
-# Create clean card-style sections
-def create_clean_card(x, y, width, height, title, count, fields, color, icon_num):
-    # Card shadow (subtle)
-    shadow = FancyBboxPatch((x+0.02, y-0.02), width, height,
-                            boxstyle="round,pad=0.015",
-                            facecolor='#E0E0E0', alpha=0.5,
-                            edgecolor='none')
-    ax.add_patch(shadow)
-
-    # Main card with colored border
-    card = FancyBboxPatch((x, y), width, height,
-                          boxstyle="round,pad=0.015",
-                          facecolor='white',
-                          edgecolor=color, linewidth=3)
-    ax.add_patch(card)
-
-    # Colored header bar
-    header = FancyBboxPatch((x, y + height - 0.5), width, 0.5,
-                           boxstyle="round,pad=0.01",
-                           facecolor=color,
-                           edgecolor='none')
-    ax.add_patch(header)
-
-    # Icon circle (left) - using text instead of emoji for SVG
-    icon_bg = plt.Circle((x + 0.35, y + height - 0.25), 0.15,
-                         facecolor='white', edgecolor='none', zorder=10)
-    ax.add_patch(icon_bg)
-    ax.text(x + 0.35, y + height - 0.25, icon_num, fontsize=10, fontweight='bold',
-            ha='center', va='center', color=color, zorder=11)
-
-    # Title text
-    ax.text(x + 0.7, y + height - 0.25, title, fontsize=12,
-            fontweight='bold', color='white', va='center')
-
-    # Count badge (right)
-    count_bg = plt.Circle((x + width - 0.35, y + height - 0.25), 0.15,
-                          facecolor='white', edgecolor='none', zorder=10)
-    ax.add_patch(count_bg)
-    ax.text(x + width - 0.35, y + height - 0.25, str(count),
-            fontsize=14, fontweight='bold', ha='center', va='center',
-            color=color, zorder=11)
-
-    # Field list with bullets
-    for i, field in enumerate(fields):
-        y_pos = y + height - 0.85 - (i * 0.35)  # Increased spacing
-        # Bullet point
-        bullet = plt.Circle((x + 0.25, y_pos), 0.03,
-                           facecolor=color, alpha=0.6)
-        ax.add_patch(bullet)
-        # Split field into name and description if colon present
-        if ':' in field:
-            field_name, field_desc = field.split(':', 1)
-            # Full text with field name in bold and description in regular
-            ax.text(x + 0.45, y_pos + 0.08, field_name, fontsize=7,
-                    color=colors['text'], va='top', ha='left', fontweight='bold')
-            # Description on next line
-            ax.text(x + 0.45, y_pos - 0.08, field_desc.strip(), fontsize=6,
-                    color=colors['text'], va='top', ha='left', alpha=0.8, wrap=True)
-        else:
-            # Field text without description
-            ax.text(x + 0.45, y_pos, field, fontsize=7,
-                    color=colors['text'], va='center', ha='left')
-
-# Create the four cards with proper spacing
-card_height = 3.5
-card_y = 1.8
-
-# Card 1: General Document with descriptions
-general_fields = [
-    'DOCUMENT_TYPE: Classify as invoice, receipt, or bank statement',
-    'BUSINESS_ABN: Verify legitimate Australian businesses via 11-digit ABN',
-    'SUPPLIER_NAME: Identify the business providing goods/services',
-    'BUSINESS_ADDRESS: Confirm business location for legitimacy checks',
-    'PAYER_NAME: Match against taxpayer records',
-    'PAYER_ADDRESS: Verify taxpayer identity and address consistency'
-]
-
-# Card 2: Date & Amount with descriptions
-date_amount_fields = [
-    'INVOICE_DATE: Confirm expense within tax year',
-    'STATEMENT_DATE_RANGE: Validate bank statement coverage period',
-    'IS_GST_INCLUDED: Determine GST credit eligibility',
-    'GST_AMOUNT: Calculate claimable GST credits',
-    'TOTAL_AMOUNT: Verify total expense claim amount'
-]
-
-# Card 3: Line Items with descriptions
-line_item_fields = [
-    'LINE_ITEM_DESCRIPTIONS: Assess work-related nature of each item',
-    'LINE_ITEM_QUANTITIES: Validate reasonableness of purchases',
-    'LINE_ITEM_PRICES: Check individual item costs',
-    'LINE_ITEM_TOTAL_PRICES: Verify line-item calculations'
+# Card position, width and palette key for each category, in schema order
+CARD_LAYOUT = [
+    (0.5, 4.8, 'primary'),
+    (5.5, 4.8, 'secondary'),
+    (10.5, 4.8, 'accent1'),
+    (15.5, 3.8, 'accent2'),
 ]
 
-# Card 4: Transaction fields with descriptions
-transaction_fields = [
-    'TRANSACTION_DATES: Match payments to invoice dates',
-    'TRANSACTION_AMOUNTS_PAID: Confirm actual payment amounts'
-]
-
-# Create wider cards to accommodate descriptions
-create_clean_card(0.5, card_y, 4.8, card_height,
-                 'General Document', 6,
-                 general_fields,
-                 colors['primary'], '1')
-
-create_clean_card(5.5, card_y, 4.8, card_height,
-                 'Date & Amount', 5,
-                 date_amount_fields,
-                 colors['secondary'], '2')
-
-create_clean_card(10.5, card_y, 4.8, card_height,
-                 'Line Items', 4,
-                 line_item_fields,
-                 colors['accent1'], '3')
+# Same card engine as create_17_fields_clean_cards.py, with a wider layout,
+# longer descriptions and SVG-friendly text (no emoji) on a white background
+SPEC = {
+    'name': '17_fields_svg',
+    # The SVG keeps its historical name; other formats must not overwrite
+    # the clean cards outputs of create_17_fields_clean_cards.py
+    'stems': {'svg': '17_fields_clean_cards'},
+    'figsize': (20, 7),
+    'facecolor': 'white',
+    # Modern color palette
+    'colors': {
+        'primary': '#0066CC',      # Blue
+        'secondary': '#FF6B35',    # Orange
+        'accent1': '#00D9FF',      # Cyan
+        'accent2': '#FFD93D',      # Yellow
+        'dark': '#1A1A2E',         # Dark blue
+        'text': '#2C3E50',         # Dark gray
+        'white': '#FFFFFF'
+    },
+    'title': {'box': (1, 5.8, 18, 1.0), 'xy': (10, 6.3),
+              'text': f'{total_fields(CATEGORIES)} CRITICAL FIELDS', 'fontsize': 24},
+    'subtitle': {'xy': (10, 5.5), 'text': 'Work-Related Expense Substantiation Requirements',
+                 'fontsize': 12, 'color': 'accent1', 'style': 'italic'},
+    'card_height': 3.5,
+    'card_y': 1.8,
+    'card_style': {
+        'icon_size': 10, 'title_size': 12, 'count_size': 14,
+        'bullet_dx': 0.25, 'bullet_radius': 0.03, 'bullet_alpha': 0.6,
+        'text_dx': 0.45, 'name_suffix': '', 'name_size': 7,
+        'desc_size': 6, 'desc_alpha': 0.8, 'desc_wrap': True,
+        'plain_size': 7,
+    },
+    # Wider cards to accommodate descriptions; numbers instead of emoji for SVG
+    'cards': [
+        {'x': x, 'width': width, 'title': category.title, 'color': color,
+         'icon': str(number),
+         'fields': [f'{field.name}: {field.description}' for field in category.fields]}
+        for number, ((x, width, color), category)
+        in enumerate(zip(CARD_LAYOUT, CATEGORIES, strict=True), start=1)
+    ],
+    # Bottom summary bar; bullets instead of check marks for SVG
+    'summary': {
+        'box': (0.5, 0.2, 18.8, 1.2), 'x': 10,
+        'benefits': '• Automated Validation   • Cross-Referencing   • Compliance Checking   • Audit Trail',
+        'benefits_size': 11,
+        'footer': 'Complete document capture ensures accurate expense substantiation',
+        'footer_size': 10,
+    },
+    'formats': ('svg',),
+    'savefig': {'facecolor': 'white', 'pad_inches': 0.1},
+}
 
-create_clean_card(15.5, card_y, 3.8, card_height,
-                 'Transactions', 2,
-                 transaction_fields,
-                 colors['accent2'], '4')
 
-# Bottom summary bar with two lines of text
-summary_rect = FancyBboxPatch((0.5, 0.2), 18.8, 1.2,
-                              boxstyle="round,pad=0.02",
-                              facecolor='#F8F9FA',
-                              edgecolor=colors['dark'],
-                              linewidth=1, linestyle='--', alpha=0.7)
-ax.add_patch(summary_rect)
+def render(output_dir=None, formats=SPEC['formats'], force=False, dry_run=False):
+    """Export through the render cache, skipping unchanged outputs.
 
-# Summary text - using check marks without special characters for SVG
-benefits_text = '• Automated Validation   • Cross-Referencing   • Compliance Checking   • Audit Trail'
-ax.text(10, 0.9, benefits_text, fontsize=11, ha='center', va='center',
-        color=colors['dark'], fontweight='bold')
+    With ``dry_run`` nothing is rendered; returns the paths that would be.
+    """
+    return render_card(SPEC, 'svg', output_dir, formats, force, dry_run)
 
-# Additional text at bottom
-ax.text(10, 0.4, 'Complete document capture ensures accurate expense substantiation',
-        fontsize=10, ha='center', va='center',
-        color=colors['text'], style='italic')
 
-plt.tight_layout()
+def main():
+    card_main(SPEC, 'svg', 'Render the SVG clean cards infographic.',
+              "SVG version saved as '{name}'")
 
-# Save as SVG
-plt.savefig('/Users/tod/Desktop/ssd_du_presentation/17_fields_clean_cards.svg',
-            format='svg', bbox_inches='tight', facecolor='white', pad_inches=0.1)
-plt.close()
 
-print("SVG version saved as '17_fields_clean_cards.svg'")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
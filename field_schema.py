@@ -0,0 +1,43 @@
+"""
+Loader for the 17 critical fields schema (``field_schema.json``).
+
+The schema is parsed once per process into compact named tuples.  Each
+renderer builds its spec from only the attributes it draws, so the render
+cache re-renders a variant only when the part of the schema it consumes
+changes (editing a long description, for example, only affects the SVG).
+"""
+
+import json
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+SCHEMA_PATH = Path(__file__).resolve().parent / 'field_schema.json'
+
+# ``label`` is the abbreviated name used where space is tight
+Field = namedtuple('Field', 'name label short description')
+Category = namedtuple('Category', 'key title heading ring_label note icon fields')
+
+
+@lru_cache(maxsize=None)
+def load_schema(path=SCHEMA_PATH):
+    """Parse the schema file into a tuple of ``Category`` records."""
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    categories = []
+    for category in data['categories']:
+        fields = tuple(
+            Field(field['name'], field.get('label', field['name']),
+                  field['short'], field['description'])
+            for field in category['fields']
+        )
+        if not fields:
+            raise ValueError(f"Category '{category['key']}' has no fields")
+        categories.append(Category(category['key'], category['title'],
+                                   category['heading'], category['ring_label'],
+                                   category.get('note'), category['icon'], fields))
+    return tuple(categories)
+
+
+def total_fields(categories):
+    """Number of fields across all categories."""
+    return sum(len(category.fields) for category in categories)
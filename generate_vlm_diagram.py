@@ -1,14 +1,26 @@
 #!/usr/bin/env python3
 """
-Generate Vision-Language Model Architecture Diagram using Mermaid CLI.
+Generate Vision-Language Model Architecture Diagram from Mermaid source.
 
 This script creates a Mermaid diagram showing the VLM processing pipeline
-with transparent data flow boxes and solid process boxes.
+with transparent data flow boxes and solid process boxes.  Diagrams are
+rendered with the Mermaid CLI; ``--renderer python`` or ``--renderer auto``
+draws flowcharts in process instead (see ``mermaid_flowchart``).
 """
 
+import argparse
+import os
 import subprocess
+import time
 from pathlib import Path
 
+from mermaid_render import (MERMAID_EXPORTS, MERMAID_FORMATS, RENDERERS, MermaidJob,
+                            RenderResult, jobs_for_directory, render_incremental,
+                            renderer_for)
+
+OUTPUT_DIR = Path(__file__).resolve().parent
+FORMATS = ("png",)
+
 
 def create_mermaid_diagram():
     """Create Mermaid diagram code with transparent data flow boxes."""
@@ -46,47 +58,123 @@ def create_mermaid_diagram():
     return mermaid_code
 
 
-def main():
-    """Generate VLM architecture diagram with transparent data flows."""
-    # Create Mermaid diagram content
-    diagram_content = create_mermaid_diagram()
+def _render_jobs(jobs):
+    """Render ``jobs`` one at a time, in process or through ``mmdc``.
+
+    Raises on the first failure.
+    """
+    results = []
+    for job in jobs:
+        if renderer_for(job) == "python":
+            from mermaid_flowchart import render_job
+
+            result = render_job(job)
+            if not result.ok:
+                raise RuntimeError(result.error)
+            results.append(result)
+            continue
+        start = time.perf_counter()
+        result = subprocess.run(job.mmdc_command(), capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+        results.append(RenderResult(job, True, time.perf_counter() - start, "mmdc"))
+    return results
+
+
+def render(output_dir=None, force=False, dry_run=False, formats=FORMATS):
+    """Write the .mmd source and convert it to ``formats``; returns the written paths.
+
+    ``formats`` may hold png, svg and pdf; Mermaid has no dpi option, so
+    ``png@<dpi>`` is rejected with ``ValueError``.  An output is only
+    regenerated when the diagram source or its render options changed since
+    the last run (tracked in the directory's Mermaid manifest), or when
+    ``force`` is set.  With ``dry_run`` nothing is written and the paths
+    that would be regenerated are returned.  Raises ``FileNotFoundError``
+    when the Mermaid CLI is needed but missing and ``RuntimeError`` when the
+    conversion fails.
+    """
+    unsupported = [fmt for fmt in formats if fmt not in MERMAID_FORMATS]
+    if unsupported:
+        raise ValueError(f"vlm_diagram cannot render {', '.join(unsupported)}; "
+                         f"expected {', '.join(MERMAID_FORMATS)}")
+    output_dir = OUTPUT_DIR if output_dir is None else Path(output_dir)
+    mmd_file = output_dir / "vlm_architecture_transparent.mmd"
+    # Transparent background, 800x1000 viewport
+    jobs = [MermaidJob(mmd_file, output_dir / f"vlm_architecture_transparent.{fmt}",
+                       background="transparent", width=800, height=1000)
+            for fmt in formats]
+    outputs = [job.output for job in jobs]
+
+    if dry_run:
+        if force or not mmd_file.exists() or mmd_file.read_text() != create_mermaid_diagram():
+            return [mmd_file, *outputs]
+        results = render_incremental(jobs, force=force, dry_run=True)
+        return [result.job.output for result in results if result.method == "dry_run"]
 
     # Save to .mmd file
-    mmd_file = Path("vlm_architecture_transparent.mmd")
-    mmd_file.write_text(diagram_content)
-    print(f"✅ Created Mermaid file: {mmd_file}")
+    mmd_file.write_text(create_mermaid_diagram())
+
+    # Generate the images (in process, or with the Mermaid CLI)
+    render_incremental(jobs, force=force, render=_render_jobs)
+
+    return [mmd_file, *outputs]
 
-    # Generate PNG using Mermaid CLI
-    png_file = Path("vlm_architecture_transparent.png")
+
+def render_directory(directory, concurrency=4, force=False, timeout=120):
+    """Render the changed .mmd files in ``directory`` through one batch renderer."""
+    results = render_incremental(jobs_for_directory(directory), force=force,
+                                 concurrency=concurrency, job_timeout=timeout)
+    for result in results:
+        if result.method == "manifest":
+            print(f"⏭️  {result.job.output.name} (up to date)")
+            continue
+        status = "✅" if result.ok else "❌"
+        print(f"{status} {result.job.output.name} ({result.method}, {result.seconds:.2f}s)")
+        if not result.ok:
+            print(f"   {result.error}")
+    return results
+
+
+def main():
+    """Generate VLM architecture diagram with transparent data flows."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", nargs="?", const=MERMAID_EXPORTS, metavar="DIR",
+                        help="render every .mmd file in DIR (default: %(const)s) "
+                             "with one long-lived browser instead")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="diagrams rendered at once in batch mode (default: 4)")
+    parser.add_argument("--timeout", type=float, default=120,
+                        help="seconds before a fallback mmdc run is killed (default: 120)")
+    parser.add_argument("--force", action="store_true",
+                        help="re-render even when the manifest says outputs are up to date")
+    parser.add_argument("--renderer", choices=RENDERERS, default=None,
+                        help="render with the Mermaid CLI (mmdc, the default), draw flowcharts "
+                             "in process (python) or in process when supported (auto)")
+    args = parser.parse_args()
+    if args.renderer:
+        os.environ["MERMAID_RENDERER"] = args.renderer
+
+    if args.batch is not None:
+        results = render_directory(args.batch, args.concurrency, args.force, args.timeout)
+        raise SystemExit(0 if all(result.ok for result in results) else 1)
 
     try:
-        # Run mmdc command to convert Mermaid to PNG with transparent background
-        cmd = [
-            "mmdc",
-            "-i", str(mmd_file),
-            "-o", str(png_file),
-            "-b", "transparent",  # Transparent background
-            "-w", "800",    # Width
-            "-H", "1000"    # Height
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            print(f"✅ Generated PNG diagram: {png_file}")
-            print("📊 Diagram features:")
-            print("   - Fully transparent data flow boxes (no borders)")
-            print("   - Solid process boxes (Vision Encoder, LLM Decoder, etc.)")
-            print("   - Clear input/output boxes in green")
-            print("   - Transparent background")
-        else:
-            print(f"❌ Error generating PNG: {result.stderr}")
+        mmd_file, png_file = render(force=args.force)
+        print(f"✅ Created Mermaid file: {mmd_file.name}")
+        print(f"✅ Generated PNG diagram: {png_file.name}")
+        print("📊 Diagram features:")
+        print("   - Fully transparent data flow boxes (no borders)")
+        print("   - Solid process boxes (Vision Encoder, LLM Decoder, etc.)")
+        print("   - Clear input/output boxes in green")
+        print("   - Transparent background")
 
     except FileNotFoundError:
         print("❌ Mermaid CLI (mmdc) not found. Please install with: npm install -g @mermaid-js/mermaid-cli")
+    except RuntimeError as e:
+        print(f"❌ Error generating PNG: {e}")
     except Exception as e:
         print(f"❌ Error: {e}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
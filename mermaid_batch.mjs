@@ -0,0 +1,67 @@
+// Long-lived Mermaid renderer used by mermaid_render.py.
+//
+// Reads one JSON job per line on stdin ({id, source, output, format,
+// background, width, height}), renders every job in a single headless
+// browser with at most MERMAID_CONCURRENCY pages open at once, and writes one
+// JSON result per line ({id, ok, seconds, error}) to stdout.
+
+import { readFile, writeFile } from 'node:fs/promises';
+import { execSync } from 'node:child_process';
+import { createRequire } from 'node:module';
+import { join } from 'node:path';
+import { createInterface } from 'node:readline';
+import { pathToFileURL } from 'node:url';
+
+async function loadMermaidCli() {
+  try {
+    return { cli: await import('@mermaid-js/mermaid-cli'), root: null };
+  } catch {
+    // Globally installed CLI (npm install -g @mermaid-js/mermaid-cli)
+    const root = process.env.MERMAID_CLI_ROOT
+      || join(execSync('npm root -g').toString().trim(), '@mermaid-js', 'mermaid-cli');
+    return { cli: await import(pathToFileURL(join(root, 'src', 'index.js'))), root };
+  }
+}
+
+const { cli, root } = await loadMermaidCli();
+const require = createRequire(root ? join(root, 'package.json') : import.meta.url);
+const puppeteer = require('puppeteer');
+
+const concurrency = Math.max(1, Number(process.env.MERMAID_CONCURRENCY || 4));
+const browser = await puppeteer.launch({ headless: 'new' });
+
+const jobs = [];
+for await (const line of createInterface({ input: process.stdin })) {
+  if (line.trim()) jobs.push(JSON.parse(line));
+}
+
+async function render(job) {
+  const start = performance.now();
+  try {
+    const definition = await readFile(job.source, 'utf8');
+    const { data } = await cli.renderMermaid(browser, definition, job.format, {
+      backgroundColor: job.background,
+      viewport: { width: job.width, height: job.height, deviceScaleFactor: 1 },
+    });
+    await writeFile(job.output, data);
+    return { id: job.id, ok: true, seconds: (performance.now() - start) / 1000 };
+  } catch (error) {
+    return { id: job.id, ok: false, seconds: (performance.now() - start) / 1000,
+             error: String(error && error.stack || error) };
+  }
+}
+
+// Bounded work queue: `concurrency` workers pull jobs until none are left
+let next = 0;
+async function worker() {
+  while (next < jobs.length) {
+    const result = await render(jobs[next++]);
+    process.stdout.write(JSON.stringify(result) + '\n');
+  }
+}
+
+try {
+  await Promise.all(Array.from({ length: concurrency }, worker));
+} finally {
+  await browser.close();
+}
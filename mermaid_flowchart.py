@@ -0,0 +1,882 @@
+"""
+In-process renderer for the Mermaid flowchart subset the presentation uses.
+
+``mmdc`` needs Node and launches a headless browser for every diagram.  The
+diagrams in ``presentation_diagrams/mermaid_exports`` and the VLM
+architecture diagram are plain flowcharts, so ``render_job`` can draw them
+directly with matplotlib (and write them through ``card_engine.export_figure``)
+when ``MERMAID_RENDERER`` opts in (see ``mermaid_render``):
+
+* ``parse`` reads ``graph``/``flowchart`` sources with nodes (``[]``, ``()``,
+  ``([])``, ``[[]]``, ``(())``, ``{}``, ``{{}}``, quoted labels and
+  ``<br/>`` line breaks), chained and ``&``-joined edges (``-->``, ``---``,
+  ``-.->``, ``-.-``, ``==>``, ``===`` with ``|label|`` or ``-- label -->``
+  labels), nested ``subgraph`` blocks with their own ``direction``, and
+  ``classDef`` / ``class`` / ``:::class`` / ``style`` styling.  Anything else
+  raises ``UnsupportedDiagram`` so callers can fall back to ``mmdc``.
+* ``layout`` is a layered (Sugiyama) layout: cycles are broken by reversing
+  DFS back edges, nodes are ranked by longest path, long edges get dummy
+  nodes, barycenter sweeps reduce crossings and positions within a rank are
+  the least-squares fit to the neighbours' positions that keeps the order
+  (pool adjacent violators).  Each subgraph is laid out on its own and then
+  placed as one block in its parent.
+
+Layout units are points; node sizes come from the measured label text.
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+FONT_SIZE = 12
+TITLE_SIZE = 12
+PAD_X, PAD_Y = 14, 9       # label padding inside a node
+NODE_SEP = 24              # gap between neighbours in a rank
+RANK_SEP = 44              # gap between ranks
+CLUSTER_PAD = 14           # subgraph border around its contents
+EDGE_SEP = 8               # between edges joining the same two nodes
+MARGIN = 8                 # around the whole diagram, in points
+PNG_DPI = 144              # two pixels per point, like a HiDPI browser
+
+# Mermaid's default theme
+NODE_STYLE = {'fill': '#ECECFF', 'stroke': '#9370DB', 'stroke-width': '1px', 'color': '#333333'}
+CLUSTER_STYLE = {'fill': '#ffffde', 'stroke': '#aaaa33', 'stroke-width': '1px', 'color': '#333333'}
+EDGE_COLOR = '#333333'
+EDGE_LABEL_BACKGROUND = '#e8e8e8'
+
+HEADER = re.compile(r'^(?:flowchart|graph)(?:\s+(TB|TD|BT|LR|RL))?\s*;?$')
+
+# Shape openers, longest first, with their closers
+SHAPES = (
+    ('([', '])', 'stadium'),
+    ('((', '))', 'circle'),
+    ('[[', ']]', 'subroutine'),
+    ('{{', '}}', 'hexagon'),
+    ('[', ']', 'rect'),
+    ('(', ')', 'round'),
+    ('{', '}', 'diamond'),
+)
+
+NODE_ID = re.compile(r'[^\W]\w*')
+
+# Edge operators: optional inline label (-- text -->), then optional |label|
+EDGE = re.compile(r'''
+    \s*(?:
+        (?P<op>-\.+->|-\.+-|={2,}>|={3,}|-{2,}>|-{3,})
+      | (?P<open>--|==|-\.)\s+(?P<text>[^|]+?)\s+(?P<close>-{2,}>|-{3,}|={2,}>|={3,}|\.+->|\.+-)
+    )
+    (?:\s*\|(?P<label>[^|]*)\|)?\s*''', re.VERBOSE)
+
+BREAK = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+
+class UnsupportedDiagram(ValueError):
+    """The source uses syntax outside the supported flowchart subset."""
+
+
+@dataclass
+class Node:
+    id: str
+    label: str
+    shape: str = 'rect'
+    classes: list = field(default_factory=list)
+    style: dict = field(default_factory=dict)
+
+
+@dataclass
+class Edge:
+    source: str
+    target: str
+    line: str = 'solid'     # 'solid', 'dotted' or 'thick'
+    arrow: bool = True
+    label: str = ''
+
+
+@dataclass
+class Subgraph:
+    id: str
+    title: str
+    direction: str = None
+    members: list = field(default_factory=list)
+    style: dict = field(default_factory=dict)
+
+
+@dataclass
+class Flowchart:
+    direction: str = 'TB'
+    nodes: dict = field(default_factory=dict)
+    edges: list = field(default_factory=list)
+    subgraphs: dict = field(default_factory=dict)
+    class_defs: dict = field(default_factory=dict)
+    root: list = field(default_factory=list)
+
+
+def is_flowchart(text):
+    """Whether ``text`` declares a flowchart (the header line only)."""
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith('%%'):
+            return bool(HEADER.match(line))
+    return False
+
+
+def _label(text):
+    """Mermaid label text to display text."""
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    return BREAK.sub('\n', text).replace('#quot;', '"').strip()
+
+
+def _style(declarations):
+    """``fill:#fff,stroke:#333`` to a dict."""
+    style = {}
+    for declaration in declarations.split(','):
+        name, _, value = declaration.partition(':')
+        if name.strip() and value.strip():
+            style[name.strip()] = value.strip().rstrip(';')
+    return style
+
+
+def _node_ref(text, pos):
+    """Parse ``id[label]:::class`` at ``pos``; returns ``(id, shape, label, classes, end)``."""
+    match = NODE_ID.match(text, pos)
+    if not match:
+        raise UnsupportedDiagram(f'expected a node id: {text[pos:]!r}')
+    node_id, pos = match.group(), match.end()
+    shape = label = None
+    for opener, closer, name in SHAPES:
+        if text.startswith(opener, pos):
+            start = pos + len(opener)
+            if text.startswith('"', start):
+                quote = text.index('"', start + 1)
+                end = text.index(closer, quote + 1)
+            else:
+                end = text.find(closer, start)
+            if end < 0:
+                raise UnsupportedDiagram(f'unclosed node shape: {text[pos:]!r}')
+            shape, label, pos = name, _label(text[start:end]), end + len(closer)
+            break
+    classes = []
+    while text.startswith(':::', pos):
+        match = NODE_ID.match(text, pos + 3)
+        if not match:
+            raise UnsupportedDiagram(f'bad class reference: {text[pos:]!r}')
+        classes.append(match.group())
+        pos = match.end()
+    return node_id, shape, label, classes, pos
+
+
+def _edge_kind(operator):
+    line = 'dotted' if '.' in operator else 'thick' if '=' in operator else 'solid'
+    return line, operator.endswith('>')
+
+
+def parse(text):
+    """Parse a flowchart source into a ``Flowchart``."""
+    chart = Flowchart()
+    stack = []              # open subgraphs, innermost last
+    placed = set()          # nodes claimed by a subgraph
+    seen_header = False
+    anonymous = 0
+
+    def mention(node_id, shape=None, label=None, classes=()):
+        node = chart.nodes.get(node_id)
+        if node is None:
+            node = chart.nodes[node_id] = Node(node_id, node_id)
+            if not stack:
+                chart.root.append(node_id)
+        if shape is not None:
+            node.shape, node.label = shape, label
+        node.classes.extend(classes)
+        if stack and node_id not in placed:
+            # A node belongs to the first subgraph that mentions it
+            placed.add(node_id)
+            if node_id in chart.root:
+                chart.root.remove(node_id)
+            stack[-1].members.append(node_id)
+
+    for raw in text.splitlines():
+        line = raw.strip().rstrip(';').strip()
+        if not line or line.startswith('%%'):
+            continue
+        if not seen_header:
+            match = HEADER.match(line)
+            if not match:
+                raise UnsupportedDiagram(f'not a flowchart: {line!r}')
+            chart.direction = {'TD': 'TB'}.get(match.group(1), match.group(1) or 'TB')
+            seen_header = True
+            continue
+
+        keyword, _, rest = line.partition(' ')
+        rest = rest.strip()
+        if keyword == 'subgraph':
+            match = re.match(r'^(\w+)\s*\[(.*)\]$', rest)
+            if match:
+                sub_id, title = match.group(1), _label(match.group(2))
+            elif rest.startswith('"'):
+                anonymous += 1
+                sub_id, title = f'subGraph{anonymous}', _label(rest)
+            else:
+                sub_id = title = rest
+            placeholder = chart.nodes.pop(sub_id, None)
+            if placeholder is not None:
+                # An edge named the subgraph before its block
+                if placeholder.label != sub_id:
+                    raise UnsupportedDiagram(f'{sub_id} is both a node and a subgraph')
+                for members in (chart.root, *(s.members for s in chart.subgraphs.values())):
+                    if sub_id in members:
+                        members.remove(sub_id)
+                placed.discard(sub_id)
+            subgraph = Subgraph(sub_id, title)
+            chart.subgraphs[sub_id] = subgraph
+            (stack[-1].members if stack else chart.root).append(sub_id)
+            stack.append(subgraph)
+        elif keyword == 'end' and not rest:
+            if not stack:
+                raise UnsupportedDiagram('"end" without a subgraph')
+            stack.pop()
+        elif keyword == 'direction':
+            if rest not in ('TB', 'TD', 'BT', 'LR', 'RL'):
+                raise UnsupportedDiagram(f'unknown direction: {rest!r}')
+            if stack:
+                stack[-1].direction = {'TD': 'TB'}.get(rest, rest)
+            else:
+                chart.direction = {'TD': 'TB'}.get(rest, rest)
+        elif keyword == 'classDef':
+            names, _, declarations = rest.partition(' ')
+            for name in names.split(','):
+                chart.class_defs[name.strip()] = _style(declarations)
+        elif keyword == 'class':
+            ids, _, name = rest.rpartition(' ')
+            for node_id in ids.split(','):
+                if node_id.strip() in chart.nodes:
+                    chart.nodes[node_id.strip()].classes.append(name.strip())
+        elif keyword == 'style':
+            node_id, _, declarations = rest.partition(' ')
+            target = chart.nodes.get(node_id) or chart.subgraphs.get(node_id)
+            if target is not None:
+                target.style.update(_style(declarations))
+        elif keyword in ('linkStyle', 'click', 'callback', 'accTitle', 'accDescr'):
+            raise UnsupportedDiagram(f'unsupported statement: {keyword}')
+        else:
+            _parse_chain(line, chart, mention)
+
+    if not seen_header:
+        raise UnsupportedDiagram('empty diagram')
+    if stack:
+        raise UnsupportedDiagram(f'unclosed subgraph: {stack[-1].id}')
+    return chart
+
+
+def _parse_chain(line, chart, mention):
+    """Parse ``A --> B & C -.->|x| D`` style statements."""
+    pos = 0
+    previous = None
+    pending = None
+    while True:
+        group = []
+        while True:
+            node_id, shape, label, classes, pos = _node_ref(line, pos)
+            if node_id not in chart.subgraphs:
+                mention(node_id, shape, label, classes)
+            group.append(node_id)
+            match = re.compile(r'\s*&\s*').match(line, pos)
+            if not match:
+                break
+            pos = match.end()
+        if pending is not None:
+            line_kind, arrow, text = pending
+            for source in previous:
+                for target in group:
+                    chart.edges.append(Edge(source, target, line_kind, arrow, text))
+        previous = group
+        match = EDGE.match(line, pos)
+        if pos >= len(line.rstrip()):
+            return
+        if not match or not match.group().strip():
+            raise UnsupportedDiagram(f'cannot parse: {line[pos:]!r}')
+        operator = match.group('op') or match.group('open') + match.group('close')
+        text = match.group('label') if match.group('label') is not None else match.group('text')
+        pending = (*_edge_kind(operator), _label(text or ''))
+        pos = match.end()
+
+
+@dataclass
+class Layout:
+    """Positions in points; boxes are ``(x, y, width, height)`` from the top left."""
+
+    width: float
+    height: float
+    nodes: dict = field(default_factory=dict)
+    clusters: dict = field(default_factory=dict)
+    waypoints: dict = field(default_factory=dict)   # edge index -> [(x, y), ...]
+    labels: dict = field(default_factory=dict)      # edge index -> (x, y)
+    exits: set = field(default_factory=set)         # edge indices leaving the block
+
+    def merge(self, other, dx, dy):
+        """Add ``other``'s contents shifted by ``(dx, dy)``.
+
+        Edges crossing ``other``'s border keep the bends on both sides of it.
+        """
+        for target, source in ((self.nodes, other.nodes), (self.clusters, other.clusters)):
+            for key, (x, y, w, h) in source.items():
+                target[key] = (x + dx, y + dy, w, h)
+        for key, points in other.waypoints.items():
+            points = [(x + dx, y + dy) for x, y in points]
+            outside = self.waypoints.get(key, [])
+            self.waypoints[key] = points + outside if key in other.exits else outside + points
+        for key, (x, y) in other.labels.items():
+            self.labels[key] = (x + dx, y + dy)
+
+
+def node_size(node, measure):
+    """Outer ``(width, height)`` of a node around its measured label."""
+    width, height = measure(node.label or ' ', FONT_SIZE)
+    width, height = width + 2 * PAD_X, height + 2 * PAD_Y
+    if node.shape == 'diamond':
+        # Smallest diamond of this aspect containing the label box
+        return width + height, (width + height) / 2
+    if node.shape == 'circle':
+        diameter = (width ** 2 + height ** 2) ** 0.5
+        return diameter, diameter
+    if node.shape == 'hexagon':
+        return width + height / 2, height
+    if node.shape == 'stadium':
+        return width + height / 2, height
+    return width, height
+
+
+def fit_in_order(desired, gaps):
+    """Positions closest to ``desired`` (least squares) with ``x[i+1] - x[i] >= gaps[i]``.
+
+    Subtracting the cumulative gaps turns this into isotonic regression,
+    solved by pooling adjacent violators.
+    """
+    offsets = [0.0]
+    for gap in gaps:
+        offsets.append(offsets[-1] + gap)
+    blocks = []     # [mean, count]
+    for value, offset in zip(desired, offsets):
+        blocks.append([value - offset, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            mean, count = blocks.pop()
+            blocks[-1] = [(blocks[-1][0] * blocks[-1][1] + mean * count) / (blocks[-1][1] + count),
+                          blocks[-1][1] + count]
+    fitted = [mean for mean, count in blocks for _ in range(count)]
+    return [value + offset for value, offset in zip(fitted, offsets)]
+
+
+def _break_cycles(items, links):
+    """Keys of the links to reverse so the graph has no cycle (DFS back edges)."""
+    successors = {item: [] for item in items}
+    for key, u, v in links:
+        successors[u].append((key, v))
+    state = {}
+    back = set()
+    for root in items:
+        if root in state:
+            continue
+        state[root] = 'open'
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for key, child in children:
+                if state.get(child) == 'open':
+                    back.add(key)
+                elif child not in state:
+                    state[child] = 'open'
+                    stack.append((child, iter(successors[child])))
+                    break
+            else:
+                state[node] = 'done'
+                stack.pop()
+    return back
+
+
+def _crossings(layers, successors):
+    """Edge crossings between consecutive layers."""
+    total = 0
+    for upper, lower in zip(layers, layers[1:]):
+        position = {node: index for index, node in enumerate(lower)}
+        ends = [(a, position[b]) for a, node in enumerate(upper) for b in successors[node]]
+        total += sum(1 for i, (a1, b1) in enumerate(ends) for a2, b2 in ends[i + 1:]
+                     if (a1 - a2) * (b1 - b2) < 0)
+    return total
+
+
+def rank_layout(items, links, sizes, direction, label_sizes=None, first=(), last=()):
+    """Layered layout of ``items`` connected by ``links``.
+
+    ``links`` are ``(key, source, target)`` tuples between items, ``sizes``
+    maps items to ``(width, height)`` and ``label_sizes`` maps link keys to
+    the size of their label.  Items in ``first`` and ``last`` get a rank of
+    their own before or after all others.  Returns ``(centres, waypoints, labels, size)``:
+    item centres, the bend points of each link from source to target, label
+    centres and the overall ``(width, height)``.
+    """
+    label_sizes = label_sizes or {}
+    horizontal = direction in ('LR', 'RL')
+    along = 0 if horizontal else 1          # size index on the rank axis
+    across = 1 - along
+    if not items:
+        return {}, {}, {}, (0.0, 0.0)
+
+    links = [link for link in links if link[1] != link[2]]
+    back = _break_cycles(items, links)
+    dag = [(key, v, u) if key in back else (key, u, v) for key, u, v in links]
+
+    # Longest-path ranks; labelled graphs leave a rank between nodes for labels
+    minlen = 2 if label_sizes else 1
+    predecessors = {item: [] for item in items}
+    successors = {item: [] for item in items}
+    for _, u, v in dag:
+        predecessors[v].append(u)
+        successors[u].append(v)
+    remaining = {item: len(predecessors[item]) for item in items}
+    order = [item for item in items if not remaining[item]]
+    for node in order:
+        for child in successors[node]:
+            remaining[child] -= 1
+            if not remaining[child]:
+                order.append(child)
+    rank = {}
+    for node in order:
+        rank[node] = max((rank[parent] + minlen for parent in predecessors[node]), default=0)
+    # Sources sit just before their first successor rather than in rank 0
+    for node in reversed(order):
+        if not predecessors[node] and successors[node]:
+            rank[node] = min(rank[child] for child in successors[node]) - minlen
+    if first:
+        rank = {node: 0 if node in first else value + minlen for node, value in rank.items()}
+    if last:
+        end = max(value for node, value in rank.items() if node not in last) + minlen
+        rank.update((node, end) for node in last)
+
+    # Long links become chains of dummy nodes, one per rank they cross
+    size = dict(sizes)
+    layer_successors = {item: [] for item in items}
+    layer_predecessors = {item: [] for item in items}
+    chains = {}
+    for key, u, v in dag:
+        chain = [u]
+        middle = rank[u] + (rank[v] - rank[u]) // 2
+        for r in range(rank[u] + 1, rank[v]):
+            dummy = ('dummy', key, r)
+            rank[dummy] = r
+            size[dummy] = label_sizes[key] if key in label_sizes and r == middle else (0.0, 0.0)
+            layer_successors[dummy], layer_predecessors[dummy] = [], []
+            chain.append(dummy)
+        chain.append(v)
+        for a, b in zip(chain, chain[1:]):
+            layer_successors[a].append(b)
+            layer_predecessors[b].append(a)
+        chains[key] = chain
+
+    layers = [[] for _ in range(max(rank.values()) + 1)]
+    for node in [*items, *(n for n in rank if n not in sizes)]:
+        layers[rank[node]].append(node)
+
+    # Barycenter sweeps, keeping the ordering with the fewest crossings
+    def reorder(layer, neighbours, reference):
+        position = {node: index for index, node in enumerate(reference)}
+        def barycenter(item):
+            index, node = item
+            near = [position[other] for other in neighbours[node]]
+            return sum(near) / len(near) if near else index
+        layer[:] = [node for _, node in sorted(enumerate(layer), key=barycenter)]
+
+    best = [list(layer) for layer in layers]
+    fewest = _crossings(layers, layer_successors)
+    for _ in range(8):
+        if not fewest:
+            break
+        for i in range(1, len(layers)):
+            reorder(layers[i], layer_predecessors, layers[i - 1])
+        for i in range(len(layers) - 2, -1, -1):
+            reorder(layers[i], layer_successors, layers[i + 1])
+        crossings = _crossings(layers, layer_successors)
+        if crossings < fewest:
+            best, fewest = [list(layer) for layer in layers], crossings
+    layers = best
+
+    # Rank axis: each rank as thick as its largest member
+    rank_sep = RANK_SEP / minlen
+    centre_of_rank, thickness_of_rank = [], []
+    extent = 0.0
+    for layer in layers:
+        thickness = max(size[node][along] for node in layer) if layer else 0.0
+        centre_of_rank.append(extent + thickness / 2)
+        thickness_of_rank.append(thickness)
+        extent += thickness + rank_sep
+    length = extent - rank_sep
+
+    # Within ranks: fit every node to the mean of its neighbours, keeping the order
+    def gap(a, b):
+        sep = NODE_SEP if a in sizes and b in sizes else NODE_SEP / 2
+        return (size[a][across] + size[b][across]) / 2 + sep
+
+    coordinate = {}
+    for layer in layers:
+        position = 0.0
+        for index, node in enumerate(layer):
+            if index:
+                position += gap(layer[index - 1], node)
+            coordinate[node] = position
+    for _ in range(8):
+        for sweep in (layers, layers[::-1]):
+            for layer in sweep:
+                desired = []
+                for node in layer:
+                    near = layer_predecessors[node] + layer_successors[node]
+                    desired.append(sum(coordinate[other] for other in near) / len(near)
+                                   if near else coordinate[node])
+                gaps = [gap(a, b) for a, b in zip(layer, layer[1:])]
+                coordinate.update(zip(layer, fit_in_order(desired, gaps)))
+    low = min(coordinate[node] - size[node][across] / 2 for node in coordinate)
+    breadth = max(coordinate[node] + size[node][across] / 2 for node in coordinate) - low
+
+    def point(node, shift=0.0):
+        a = centre_of_rank[rank[node]] + shift
+        if direction in ('BT', 'RL'):
+            a = length - a
+        c = coordinate[node] - low
+        return (a, c) if horizontal else (c, a)
+
+    def through(node):
+        """Bends of a link across ``node``'s rank, running beside the nodes in it."""
+        half = thickness_of_rank[rank[node]] / 2
+        return [point(node, -half), point(node, half)] if half else [point(node)]
+
+    centres = {item: point(item) for item in items}
+    waypoints, labels = {}, {}
+    for key, u, v in dag:
+        chain = chains[key]
+        points = [bend for node in chain[1:-1] for bend in through(node)]
+        waypoints[key] = points[::-1] if key in back else points
+        for node in chain[1:-1]:
+            if size[node] != (0.0, 0.0):
+                labels[key] = point(node)
+    return centres, waypoints, labels, ((length, breadth) if horizontal else (breadth, length))
+
+
+def layout(chart, measure):
+    """Lay out ``chart``; ``measure(text, size)`` returns a label's ``(width, height)``.
+
+    Each subgraph is laid out in its own direction and placed in its parent
+    as a single block; edges are routed at the innermost level containing
+    both ends.  An edge crossing a subgraph's border is also laid out inside
+    it, from a port on the subgraph's first rank (or to one on its last), so
+    it bends around the nodes it passes instead of crossing them.
+    """
+    parent = {member: sub.id for sub in chart.subgraphs.values() for member in sub.members}
+
+    def block(members, direction):
+        member_set = set(members)
+
+        def item_of(name):
+            while name is not None and name not in member_set:
+                name = parent.get(name)
+            return name
+
+        sizes, inner = {}, {}
+        for member in members:
+            if member in chart.subgraphs:
+                sub = chart.subgraphs[member]
+                content = block(sub.members, sub.direction or chart.direction)
+                title_width, title_height = (measure(sub.title, TITLE_SIZE) if sub.title
+                                             else (0.0, 0.0))
+                header = title_height + CLUSTER_PAD / 2 if sub.title else 0.0
+                sizes[member] = (max(content.width, title_width) + 2 * CLUSTER_PAD,
+                                 content.height + header + 2 * CLUSTER_PAD)
+                inner[member] = (content, header)
+            else:
+                sizes[member] = node_size(chart.nodes[member], measure)
+
+        links, label_sizes, entries, exits = [], {}, {}, {}
+        for index, edge in enumerate(chart.edges):
+            u, v = item_of(edge.source), item_of(edge.target)
+            if u == v:
+                continue
+            if u is None:
+                u = entries[index] = ('port', index)
+            elif v is None:
+                v = exits[index] = ('port', index)
+            elif edge.label:
+                width, height = measure(edge.label, FONT_SIZE)
+                label_sizes[index] = (width + 8, height + 4)
+            links.append((index, u, v))
+        ports = {**entries, **exits}
+        sizes.update((port, (0.0, 0.0)) for port in ports.values())
+
+        centres, waypoints, labels, (width, height) = rank_layout(
+            [*members, *ports.values()], links, sizes, direction, label_sizes,
+            first=set(entries.values()), last=set(exits.values()))
+        for index, port in entries.items():
+            waypoints[index] = [centres[port], *waypoints[index]]
+        for index, port in exits.items():
+            waypoints[index] = [*waypoints[index], centres[port]]
+        result = Layout(width, height, waypoints=waypoints, labels=labels, exits=set(exits))
+        for member in members:
+            (cx, cy), (w, h) = centres[member], sizes[member]
+            x, y = cx - w / 2, cy - h / 2
+            if member in inner:
+                content, header = inner[member]
+                result.clusters[member] = (x, y, w, h)
+                result.merge(content, x + (w - content.width) / 2, y + CLUSTER_PAD + header)
+            else:
+                result.nodes[member] = (x, y, w, h)
+        return result
+
+    return block(chart.root, chart.direction)
+
+
+def _clip(box, shape, toward):
+    """Point where the line from ``box``'s centre to ``toward`` leaves the shape."""
+    x, y, w, h = box
+    cx, cy = x + w / 2, y + h / 2
+    dx, dy = toward[0] - cx, toward[1] - cy
+    if not dx and not dy:
+        return cx, cy
+    if shape == 'diamond':
+        t = 1 / (abs(dx) / (w / 2) + abs(dy) / (h / 2))
+    elif shape == 'circle':
+        t = (w / 2) / (dx * dx + dy * dy) ** 0.5
+    else:
+        t = min(w / 2 / abs(dx) if dx else float('inf'), h / 2 / abs(dy) if dy else float('inf'))
+    t = min(t, 1.0)
+    return cx + t * dx, cy + t * dy
+
+
+def route(chart, placed):
+    """``(edge, points, label_position)`` for every drawable edge of a laid out chart."""
+    def box_and_shape(name):
+        if name in placed.nodes:
+            return placed.nodes[name], chart.nodes[name].shape
+        return placed.clusters[name], 'rect'
+
+    def centre(name):
+        x, y, w, h = box_and_shape(name)[0]
+        return x + w / 2, y + h / 2
+
+    # Edges joining the same two nodes, either way round, are drawn side by side
+    pairs = {}
+    for index, edge in enumerate(chart.edges):
+        if edge.source != edge.target:
+            pairs.setdefault(frozenset((edge.source, edge.target)), []).append(index)
+
+    routes = []
+    for index, edge in enumerate(chart.edges):
+        if edge.source == edge.target:
+            continue
+        (source, source_shape), (target, target_shape) = map(box_and_shape,
+                                                             (edge.source, edge.target))
+        bends = placed.waypoints.get(index, [])
+        start = _clip(source, source_shape, bends[0] if bends else centre(edge.target))
+        end = _clip(target, target_shape, bends[-1] if bends else centre(edge.source))
+        points = [start, *bends, end]
+        pair = pairs[frozenset((edge.source, edge.target))]
+        if len(pair) > 1:
+            # Offsets are measured across one direction, so reversed edges part too
+            (ax, ay), (bx, by) = map(centre, sorted((edge.source, edge.target)))
+            length = ((bx - ax) ** 2 + (by - ay) ** 2) ** 0.5 or 1.0
+            offset = (pair.index(index) - (len(pair) - 1) / 2) * EDGE_SEP
+            nx, ny = (ay - by) / length * offset, (bx - ax) / length * offset
+            points = [(x + nx, y + ny) for x, y in points]
+        label = placed.labels.get(index)
+        if edge.label and label is None:
+            label = _midpoint(points)
+        routes.append((edge, points, label))
+    return routes
+
+
+def _midpoint(points):
+    """Point halfway along a polyline."""
+    lengths = [((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5
+               for (x1, y1), (x2, y2) in zip(points, points[1:])]
+    remaining = sum(lengths) / 2
+    for (x1, y1), (x2, y2), length in zip(points, points[1:], lengths):
+        if remaining <= length and length:
+            t = remaining / length
+            return x1 + t * (x2 - x1), y1 + t * (y2 - y1)
+        remaining -= length
+    return points[-1]
+
+
+def _color(value):
+    """CSS colour to a matplotlib colour."""
+    value = value.strip()
+    if value in ('transparent', 'none'):
+        return 'none'
+    match = re.fullmatch(r'rgba?\(([^)]*)\)', value)
+    if match:
+        parts = [float(part) for part in match.group(1).split(',')]
+        return (*(part / 255 for part in parts[:3]), *parts[3:4])
+    return value
+
+
+def _length(value):
+    """CSS length (``2px``) in points."""
+    return float(re.sub(r'[a-z]+$', '', value.strip()) or 0) * 0.75
+
+
+def node_style(chart, node):
+    """Effective style of ``node``: theme, ``default`` class, its classes, ``style``."""
+    style = dict(NODE_STYLE)
+    for name in ('default', *node.classes):
+        style.update(chart.class_defs.get(name, {}))
+    style.update(node.style)
+    return style
+
+
+def _escape(text):
+    """Keep ``$`` from switching matplotlib into mathtext."""
+    return text.replace('$', r'\$')
+
+
+def _shape_patch(shape, box, **kwargs):
+    from matplotlib.patches import Circle, FancyBboxPatch, Polygon, Rectangle
+
+    x, y, w, h = box
+    cx, cy = x + w / 2, y + h / 2
+    if shape == 'diamond':
+        return Polygon([(cx, y), (x + w, cy), (cx, y + h), (x, cy)], closed=True, **kwargs)
+    if shape == 'hexagon':
+        inset = h / 4
+        return Polygon([(x + inset, y), (x + w - inset, y), (x + w, cy), (x + w - inset, y + h),
+                        (x + inset, y + h), (x, cy)], closed=True, **kwargs)
+    if shape == 'circle':
+        return Circle((cx, cy), w / 2, **kwargs)
+    if shape in ('round', 'stadium'):
+        radius = h / 2 if shape == 'stadium' else min(5.0, h / 2)
+        return FancyBboxPatch((x, y), w, h, boxstyle=f'round,pad=0,rounding_size={radius}',
+                              **kwargs)
+    return Rectangle((x, y), w, h, **kwargs)
+
+
+def _edge_path(points):
+    """Polyline through ``points`` with its bends smoothed by quadratic curves."""
+    from matplotlib.path import Path as MplPath
+
+    vertices, codes = [points[0]], [MplPath.MOVETO]
+    for previous, corner, following in zip(points, points[1:], points[2:]):
+        vertices += [((previous[0] + corner[0]) / 2, (previous[1] + corner[1]) / 2), corner,
+                     ((corner[0] + following[0]) / 2, (corner[1] + following[1]) / 2)]
+        codes += [MplPath.LINETO, MplPath.CURVE3, MplPath.CURVE3]
+    vertices.append(points[-1])
+    codes.append(MplPath.LINETO)
+    return MplPath(vertices, codes)
+
+
+def build_figure(chart, background='white'):
+    """Lay out and draw ``chart``; returns the matplotlib figure."""
+    from card_engine import pyplot
+    from matplotlib.patches import FancyArrowPatch
+    from matplotlib.text import Text
+
+    plt = pyplot()
+    fig = plt.figure(dpi=72)
+    renderer = fig.canvas.get_renderer()
+
+    def measure(text, size):
+        artist = Text(0, 0, _escape(text), fontsize=size, multialignment='center')
+        artist.set_figure(fig)
+        extent = artist.get_window_extent(renderer)
+        return extent.width * 72 / fig.dpi, extent.height * 72 / fig.dpi
+
+    placed = layout(chart, measure)
+    # The margin keeps strokes on the outer edge from being clipped by the axes
+    fig.set_size_inches((placed.width + 2 * MARGIN) / 72, (placed.height + 2 * MARGIN) / 72)
+    if background != 'transparent':
+        fig.patch.set_facecolor(_color(background))
+    ax = fig.add_axes((0, 0, 1, 1))
+    ax.set_xlim(-MARGIN, placed.width + MARGIN)
+    ax.set_ylim(placed.height + MARGIN, -MARGIN)
+    ax.set_axis_off()
+    ax.patch.set_visible(False)
+
+    # Parents are listed before their children, so outer subgraphs are drawn first
+    for depth, (name, box) in enumerate(placed.clusters.items()):
+        sub = chart.subgraphs[name]
+        style = {**CLUSTER_STYLE, **sub.style}
+        ax.add_patch(_shape_patch('rect', box, facecolor=_color(style['fill']),
+                                  edgecolor=_color(style['stroke']),
+                                  linewidth=_length(style['stroke-width']), zorder=1 + depth / 1000))
+        if sub.title:
+            x, y, w, _ = box
+            ax.text(x + w / 2, y + CLUSTER_PAD / 2, _escape(sub.title), fontsize=TITLE_SIZE,
+                    color=_color(style['color']), ha='center', va='top',
+                    multialignment='center', zorder=2)
+
+    for edge, points, label in route(chart, placed):
+        width = {'thick': 2.6}.get(edge.line, 1.5)
+        arrow = FancyArrowPatch(
+            path=_edge_path(points),
+            arrowstyle='-|>,head_length=0.55,head_width=0.3' if edge.arrow else '-',
+            mutation_scale=12, shrinkA=0, shrinkB=0, color=EDGE_COLOR, linewidth=width,
+            linestyle=(0, (3, 2)) if edge.line == 'dotted' else '-', zorder=3)
+        ax.add_patch(arrow)
+        if edge.label:
+            ax.text(*label, _escape(edge.label), fontsize=FONT_SIZE, color=EDGE_COLOR,
+                    ha='center', va='center', multialignment='center', zorder=5,
+                    bbox={'boxstyle': 'square,pad=0.15', 'facecolor': EDGE_LABEL_BACKGROUND,
+                          'edgecolor': 'none', 'alpha': 0.8})
+
+    for name, box in placed.nodes.items():
+        node = chart.nodes[name]
+        style = node_style(chart, node)
+        patch = _shape_patch(node.shape, box, facecolor=_color(style.get('fill', 'none')),
+                             edgecolor=_color(style.get('stroke', 'none')),
+                             linewidth=_length(style.get('stroke-width', '1px')), zorder=4)
+        if 'stroke-dasharray' in style:
+            patch.set_linestyle((0, tuple(_length(part) / max(patch.get_linewidth(), 0.1)
+                                          for part in style['stroke-dasharray'].split())))
+        ax.add_patch(patch)
+        if node.shape == 'subroutine':
+            x, y, w, h = box
+            for edge_x in (x + 6, x + w - 6):
+                ax.plot([edge_x, edge_x], [y, y + h], color=patch.get_edgecolor(),
+                        linewidth=patch.get_linewidth(), zorder=4)
+        x, y, w, h = box
+        ax.text(x + w / 2, y + h / 2, _escape(node.label), fontsize=FONT_SIZE,
+                color=_color(style.get('color', NODE_STYLE['color'])),
+                fontweight='bold' if style.get('font-weight') == 'bold' else 'normal',
+                ha='center', va='center', multialignment='center', zorder=6)
+    return fig
+
+
+def render_file(source, output, background='white'):
+    """Render the flowchart in ``source`` to ``output`` (PNG, SVG or PDF)."""
+    from card_engine import export_figure, pyplot
+
+    output = Path(output)
+    chart = parse(Path(source).read_text(encoding='utf-8'))
+    fig = build_figure(chart, background)
+    savefig_kwargs = {'transparent': True} if background == 'transparent' else {
+        'facecolor': _color(background)}
+    try:
+        path, = export_figure(fig, output.stem, (output.suffix.lstrip('.'),), output.parent,
+                              dpi=PNG_DPI, pad_inches=MARGIN / 72, **savefig_kwargs)
+    finally:
+        pyplot().close(fig)
+    return path
+
+
+def render_job(job):
+    """Render one ``mermaid_render.MermaidJob`` in process; returns a ``RenderResult``.
+
+    Any failure is reported in the result, so callers can fall back to
+    ``mmdc`` for this diagram alone.
+    """
+    from mermaid_render import RenderResult
+
+    start = time.perf_counter()
+    try:
+        render_file(job.source, job.output, job.background)
+    except (UnsupportedDiagram, OSError) as e:
+        return RenderResult(job, False, time.perf_counter() - start, 'python', str(e))
+    except Exception as e:
+        return RenderResult(job, False, time.perf_counter() - start, 'python',
+                            f'{type(e).__name__}: {e}'.strip())
+    return RenderResult(job, True, time.perf_counter() - start, 'python')
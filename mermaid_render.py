@@ -0,0 +1,308 @@
+"""
+Mermaid rendering helpers shared by the diagram exporters.
+
+Diagrams are rendered by ``mmdc`` unless ``MERMAID_RENDERER`` opts into the
+in-process flowchart renderer ``mermaid_flowchart`` (no Node, no browser):
+``python`` draws every diagram in process and ``auto`` draws flowcharts in
+process and sends anything it cannot draw through ``mmdc`` (see
+``renderer_for``).  The committed outputs are ``mmdc`` renders.
+
+``render_batch`` sends every other job to one long-lived Node process
+(``mermaid_batch.mjs``) that keeps a single headless browser open and renders
+diagrams on a bounded number of pages.  Jobs the batch renderer could not
+complete (Node or the CLI package missing, browser crash, per-diagram error)
+fall back to ``render_concurrent``, one ``mmdc`` subprocess per job.
+
+``render_incremental`` records a hash of every source and its render options
+in a manifest next to the outputs and only re-renders jobs whose hash changed
+or whose output is missing.
+
+``render_concurrent`` runs ``mmdc`` subprocesses under asyncio, a bounded
+number at a time, streaming their stderr as it arrives.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+BATCH_SCRIPT = Path(__file__).resolve().parent / 'mermaid_batch.mjs'
+MERMAID_EXPORTS = Path(__file__).resolve().parent / 'presentation_diagrams' / 'mermaid_exports'
+MANIFEST_NAME = '.mermaid_manifest.json'
+
+RENDERERS = ('mmdc', 'auto', 'python')
+# Output formats both mmdc and the in-process renderer write
+MERMAID_FORMATS = ('png', 'svg', 'pdf')
+
+
+@dataclass(frozen=True)
+class MermaidJob:
+    """One .mmd source rendered to one output file."""
+
+    source: Path
+    output: Path
+    background: str = 'white'
+    width: int = 800
+    height: int = 600
+
+    @property
+    def format(self):
+        return self.output.suffix.lstrip('.')
+
+    def mmdc_command(self):
+        """Equivalent ``mmdc`` invocation."""
+        return [
+            'mmdc',
+            '-i', str(self.source),
+            '-o', str(self.output),
+            '-b', self.background,
+            '-w', str(self.width),
+            '-H', str(self.height),
+        ]
+
+    def digest(self):
+        """Hash of the source text and every option that affects the output."""
+        payload = json.dumps({
+            'source': hashlib.sha256(self.source.read_bytes()).hexdigest(),
+            'format': self.format,
+            'background': self.background,
+            'width': self.width,
+            'height': self.height,
+            'renderer': renderer_for(self),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def renderer_for(job):
+    """Renderer ``MERMAID_RENDERER`` selects for ``job``: ``'python'`` or ``'mmdc'``.
+
+    Without the variable every job goes through ``mmdc``.
+    """
+    choice = os.environ.get('MERMAID_RENDERER') or 'mmdc'
+    if choice != 'auto':
+        return choice
+    from mermaid_flowchart import is_flowchart
+
+    try:
+        return 'python' if is_flowchart(job.source.read_text(encoding='utf-8')) else 'mmdc'
+    except OSError:
+        return 'mmdc'
+
+
+@dataclass
+class RenderResult:
+    """Outcome of one job; ``method`` is 'python', 'batch', 'mmdc' or 'manifest' (up to date)."""
+
+    job: MermaidJob
+    ok: bool
+    seconds: float
+    method: str
+    error: str = ''
+
+
+def jobs_for_directory(directory=MERMAID_EXPORTS, formats=('png',), **options):
+    """One job per .mmd file and format, written next to the source."""
+    return [MermaidJob(source, source.with_suffix(f'.{fmt}'), **options)
+            for source in sorted(Path(directory).glob('*.mmd'))
+            for fmt in formats]
+
+
+def render_with_mmdc(job, timeout=None):
+    """Render one job with its own ``mmdc`` subprocess."""
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(job.mmdc_command(), capture_output=True, text=True,
+                                timeout=timeout)
+    except FileNotFoundError:
+        return RenderResult(job, False, time.perf_counter() - start, 'mmdc',
+                            'Mermaid CLI (mmdc) not found')
+    except subprocess.TimeoutExpired:
+        return RenderResult(job, False, time.perf_counter() - start, 'mmdc',
+                            f'timed out after {timeout}s')
+    return RenderResult(job, result.returncode == 0, time.perf_counter() - start,
+                        'mmdc', result.stderr.strip())
+
+
+def _print_stderr(job, line):
+    print(f'[{job.source.name}] {line}', file=sys.stderr)
+
+
+async def _render_with_mmdc_async(job, semaphore, timeout, on_stderr):
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *job.mmdc_command(),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+                start_new_session=True)
+        except FileNotFoundError:
+            return RenderResult(job, False, time.perf_counter() - start, 'mmdc',
+                                'Mermaid CLI (mmdc) not found')
+
+        lines = []
+
+        async def read_stderr():
+            async for raw in proc.stderr:
+                line = raw.decode(errors='replace').rstrip()
+                lines.append(line)
+                if on_stderr is not None:
+                    on_stderr(job, line)
+
+        try:
+            await asyncio.wait_for(asyncio.gather(read_stderr(), proc.wait()), timeout)
+        except asyncio.TimeoutError:
+            # mmdc spawns a browser that would keep stderr open; kill the whole group
+            os.killpg(proc.pid, signal.SIGKILL)
+            await proc.wait()
+            return RenderResult(job, False, time.perf_counter() - start, 'mmdc',
+                                f'timed out after {timeout}s')
+        return RenderResult(job, proc.returncode == 0, time.perf_counter() - start,
+                            'mmdc', '\n'.join(lines).strip())
+
+
+async def render_concurrent_async(jobs, concurrency=4, timeout=120, on_stderr=_print_stderr):
+    """Coroutine form of ``render_concurrent`` for callers already in an event loop."""
+    semaphore = asyncio.Semaphore(concurrency)
+    return list(await asyncio.gather(*(
+        _render_with_mmdc_async(job, semaphore, timeout, on_stderr) for job in jobs)))
+
+
+def render_concurrent(jobs, concurrency=4, timeout=120, on_stderr=_print_stderr):
+    """Run one ``mmdc`` per job, at most ``concurrency`` at a time.
+
+    Each job is killed after ``timeout`` seconds.  ``on_stderr(job, line)`` is
+    called for every stderr line as it arrives (``None`` to stay quiet).
+    Returns one ``RenderResult`` per job, in job order.
+    """
+    return asyncio.run(render_concurrent_async(list(jobs), concurrency, timeout, on_stderr))
+
+
+def _run_batch(jobs, concurrency, timeout):
+    """Render through ``mermaid_batch.mjs``; returns results by job index."""
+    lines = ''.join(
+        json.dumps({'id': index, 'source': str(job.source), 'output': str(job.output),
+                    'format': job.format, 'background': job.background,
+                    'width': job.width, 'height': job.height}) + '\n'
+        for index, job in enumerate(jobs)
+    )
+    proc = subprocess.run(['node', str(BATCH_SCRIPT)], input=lines,
+                          capture_output=True, text=True, timeout=timeout,
+                          env={**os.environ, 'MERMAID_CONCURRENCY': str(concurrency)})
+    results = {}
+    for line in proc.stdout.splitlines():
+        try:
+            item = json.loads(line)
+        except ValueError:
+            continue
+        results[item['id']] = RenderResult(jobs[item['id']], item['ok'], item['seconds'],
+                                           'batch', item.get('error', ''))
+    return results
+
+
+def render_batch(jobs, concurrency=4, timeout=600, fallback=True, job_timeout=120):
+    """Render ``jobs`` through one browser, falling back to concurrent ``mmdc`` runs.
+
+    Jobs ``renderer_for`` assigns to the in-process renderer skip the browser;
+    in ``auto`` mode the ones it cannot draw still go through it.
+    ``timeout`` bounds the whole batch process and ``job_timeout`` each
+    fallback ``mmdc`` run.  Returns one ``RenderResult`` per job, in job order.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    results = {}
+    in_process = [index for index, job in enumerate(jobs) if renderer_for(job) == 'python']
+    if in_process:
+        from mermaid_flowchart import render_job
+
+        for index in in_process:
+            results[index] = render_job(jobs[index])
+    strict = os.environ.get('MERMAID_RENDERER') == 'python'
+    pending = [index for index in range(len(jobs))
+               if index not in results or (not results[index].ok and not strict)]
+    if not pending:
+        return [results[index] for index in range(len(jobs))]
+
+    browser_jobs = [jobs[index] for index in pending]
+    try:
+        batch = _run_batch(browser_jobs, concurrency, timeout)
+    except (OSError, subprocess.SubprocessError):
+        batch = {}
+
+    retry = [index for index in range(len(browser_jobs))
+             if fallback and (index not in batch or not batch[index].ok)]
+    if retry:
+        fallback_results = render_concurrent([browser_jobs[index] for index in retry],
+                                             concurrency, job_timeout)
+        batch.update(zip(retry, fallback_results, strict=True))
+    for position, index in enumerate(pending):
+        if position in batch:
+            results[index] = batch[position]
+    return [results.get(index) or RenderResult(job, False, 0.0, 'batch', 'batch renderer failed')
+            for index, job in enumerate(jobs)]
+
+
+def load_manifest(path):
+    """Output name -> digest mapping; empty when missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(path, manifest):
+    """Replace the manifest atomically so an interrupted run never truncates it."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(manifest, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def render_incremental(jobs, manifest_path=None, force=False, render=render_batch,
+                       dry_run=False, **kwargs):
+    """Render only the jobs whose source or options changed since the last run.
+
+    ``manifest_path`` defaults to ``MANIFEST_NAME`` next to the first output.
+    Up-to-date jobs are reported with ``method='manifest'``; the manifest is
+    updated for every job that rendered successfully.  ``render`` takes a list
+    of jobs and returns their results in order.  With ``dry_run`` nothing is
+    rendered or written and stale jobs are reported with ``method='dry_run'``.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    if manifest_path is None:
+        manifest_path = jobs[0].output.parent / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+
+    digests = [job.digest() for job in jobs]
+    stale = [index for index, (job, digest) in enumerate(zip(jobs, digests))
+             if force or not job.output.exists() or manifest.get(job.output.name) != digest]
+
+    results = [RenderResult(job, True, 0.0, 'manifest') for job in jobs]
+    if dry_run:
+        for index in stale:
+            results[index] = RenderResult(jobs[index], True, 0.0, 'dry_run')
+    elif stale:
+        for index, result in zip(stale, render([jobs[index] for index in stale], **kwargs),
+                                 strict=True):
+            results[index] = result
+            if result.ok:
+                manifest[jobs[index].output.name] = digests[index]
+            else:
+                manifest.pop(jobs[index].output.name, None)
+        write_manifest(manifest_path, manifest)
+    return results
@@ -0,0 +1,390 @@
+"""
+Streaming PDF writer for multi-page documents.
+
+Objects are written to the file as soon as they are complete; only their
+offsets and the page references are kept, so memory does not grow with the
+page count.  Pages are drawn with raw content-stream operators and may use
+the standard Helvetica fonts, RGB(A) images and Form XObjects imported from
+the first page of an existing PDF (``import_page``), which keeps a vector
+figure vector instead of re-rasterising it.
+
+``import_page`` reads PDFs with a classic cross-reference table, as written
+by matplotlib; other files raise ``UnsupportedPDF`` so callers can fall back
+to a raster copy.
+"""
+
+import re
+import zlib
+from pathlib import Path
+
+# Standard fonts and the AFM files (shipped with matplotlib) holding their widths
+FONTS = {'Helvetica': 'phvr8a.afm', 'Helvetica-Bold': 'phvb8a.afm'}
+
+# Width (1/1000 em) of characters the AFM files do not cover
+DEFAULT_WIDTH = 556
+
+_WHITESPACE = b' \t\r\n\x00\x0c'
+_DELIMITERS = b'()<>[]{}/%'
+_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+_REFERENCE = re.compile(rb'\s+(\d+)\s+R(?=[\s/<>\[\]()%]|$)')
+_OBJECT = re.compile(rb'(\d+)\s+(\d+)\s+obj')
+
+
+class UnsupportedPDF(ValueError):
+    """A PDF that ``import_page`` cannot read."""
+
+
+class Name(str):
+    """A PDF name, stored without its leading slash."""
+
+
+class Ref(tuple):
+    """An indirect reference ``(number, generation)``."""
+
+
+class Raw(bytes):
+    """A token serialised as is (strings and hex strings)."""
+
+
+class Stream:
+    """A stream object: its dictionary and its (still encoded) data."""
+
+    def __init__(self, dictionary, data):
+        self.dictionary = dictionary
+        self.data = data
+
+
+def serialize(value):
+    """PDF syntax for a parsed or constructed value."""
+    if isinstance(value, Name):
+        return b'/' + value.encode('latin-1')
+    if isinstance(value, Ref):
+        return b'%d %d R' % value
+    if isinstance(value, Raw):
+        return bytes(value)
+    if isinstance(value, bool):
+        return b'true' if value else b'false'
+    if value is None:
+        return b'null'
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, float):
+        return (b'%.4f' % value).rstrip(b'0').rstrip(b'.')
+    if isinstance(value, dict):
+        return (b'<<' + b' '.join(serialize(Name(key)) + b' ' + serialize(item)
+                                  for key, item in value.items()) + b'>>')
+    if isinstance(value, (list, tuple)):
+        return b'[' + b' '.join(serialize(item) for item in value) + b']'
+    raise TypeError(f'cannot serialise {type(value).__name__} as PDF')
+
+
+def _skip(data, pos):
+    """Skip whitespace and comments."""
+    while pos < len(data):
+        if data[pos] in _WHITESPACE:
+            pos += 1
+        elif data[pos] == ord('%'):
+            while pos < len(data) and data[pos] not in b'\r\n':
+                pos += 1
+        else:
+            break
+    return pos
+
+
+def _token_end(data, pos):
+    while pos < len(data) and data[pos] not in _WHITESPACE and data[pos] not in _DELIMITERS:
+        pos += 1
+    return pos
+
+
+def parse(data, pos=0):
+    """Parse one PDF value at ``pos``; returns ``(value, end position)``."""
+    pos = _skip(data, pos)
+    if data.startswith(b'<<', pos):
+        result = {}
+        pos = _skip(data, pos + 2)
+        while not data.startswith(b'>>', pos):
+            key, pos = parse(data, pos)
+            result[key], pos = parse(data, pos)
+            pos = _skip(data, pos)
+        return result, pos + 2
+    char = data[pos:pos + 1]
+    if char == b'[':
+        items = []
+        pos = _skip(data, pos + 1)
+        while data[pos:pos + 1] != b']':
+            item, pos = parse(data, pos)
+            items.append(item)
+            pos = _skip(data, pos)
+        return items, pos + 1
+    if char == b'/':
+        end = _token_end(data, pos + 1)
+        return Name(data[pos + 1:end].decode('latin-1')), end
+    if char == b'<':
+        end = data.index(b'>', pos) + 1
+        return Raw(data[pos:end]), end
+    if char == b'(':
+        depth, end = 0, pos
+        while True:
+            if data[end] == ord('\\'):
+                end += 2
+                continue
+            depth += {ord('('): 1, ord(')'): -1}.get(data[end], 0)
+            end += 1
+            if depth == 0:
+                return Raw(data[pos:end]), end
+    number = _NUMBER.match(data, pos)
+    if number:
+        text = number.group()
+        if b'.' in text:
+            return float(text), number.end()
+        reference = _REFERENCE.match(data, number.end())
+        if reference:
+            return Ref((int(text), int(reference.group(1)))), reference.end()
+        return int(text), number.end()
+    end = _token_end(data, pos)
+    keyword = data[pos:end]
+    if keyword in (b'true', b'false'):
+        return keyword == b'true', end
+    if keyword == b'null':
+        return None, end
+    raise UnsupportedPDF(f'unexpected token {keyword[:20]!r} at byte {pos}')
+
+
+class PDFReader:
+    """Random access to the objects of a PDF with a classic xref table."""
+
+    def __init__(self, path):
+        self.data = Path(path).read_bytes()
+        start = self.data.rfind(b'startxref')
+        if start < 0:
+            raise UnsupportedPDF(f'{path}: no startxref')
+        offset, _ = parse(self.data, start + len(b'startxref'))
+        if not self.data.startswith(b'xref', offset):
+            raise UnsupportedPDF(f'{path}: cross-reference streams are not supported')
+        self.offsets = {}
+        self.trailer = None
+        while offset is not None:
+            pos = offset + len(b'xref')
+            while True:
+                pos = _skip(self.data, pos)
+                if self.data.startswith(b'trailer', pos):
+                    break
+                first, pos = parse(self.data, pos)
+                count, pos = parse(self.data, pos)
+                pos = _skip(self.data, pos)
+                for number in range(first, first + count):
+                    entry = self.data[pos:pos + 20]
+                    if entry[17:18] == b'n':
+                        self.offsets.setdefault(number, int(entry[:10]))
+                    pos += 20
+            trailer, _ = parse(self.data, pos + len(b'trailer'))
+            self.trailer = self.trailer or trailer
+            offset = trailer.get('Prev')
+
+    def resolve(self, value):
+        """``value``, or the object it references."""
+        return self.object(value[0]) if isinstance(value, Ref) else value
+
+    def object(self, number):
+        """Parse object ``number``; streams come back as ``Stream``."""
+        match = _OBJECT.match(self.data, self.offsets[number])
+        if not match:
+            raise UnsupportedPDF(f'object {number} not found at its xref offset')
+        value, pos = parse(self.data, match.end())
+        pos = _skip(self.data, pos)
+        if not self.data.startswith(b'stream', pos):
+            return value
+        pos += len(b'stream')
+        pos += 2 if self.data.startswith(b'\r\n', pos) else 1
+        length = self.resolve(value['Length'])
+        return Stream(value, self.data[pos:pos + length])
+
+    def first_page(self):
+        """The first page dictionary, with inherited attributes filled in."""
+        node = self.resolve(self.resolve(self.trailer['Root'])['Pages'])
+        inherited = {}
+        while node.get('Type') != 'Page':
+            for key in ('Resources', 'MediaBox'):
+                if key in node:
+                    inherited[key] = node[key]
+            node = self.resolve(node['Kids'][0])
+        return {**inherited, **node}
+
+
+def _font_widths(afm):
+    """Character widths from an AFM file: ``{code: width}``."""
+    import matplotlib
+
+    widths = {}
+    path = Path(matplotlib.get_data_path()) / 'fonts' / 'afm' / afm
+    for line in path.read_text(encoding='latin-1').splitlines():
+        if line.startswith('C '):
+            fields = dict(part.strip().split(' ', 1) for part in line.split(';') if part.strip())
+            if int(fields['C']) >= 0:
+                widths[int(fields['C'])] = int(fields['WX'])
+    return widths
+
+
+def encode_text(text):
+    """``text`` as WinAnsi bytes; characters outside it become '?'."""
+    return text.encode('cp1252', errors='replace')
+
+
+def literal(data):
+    """A PDF literal string for the bytes ``data``."""
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class PDFStreamWriter:
+    """Write a PDF page by page::
+
+        with open(path, 'wb') as fileobj:
+            pdf = PDFStreamWriter(fileobj)
+            image = pdf.add_image(rgba)
+            pdf.add_page(595, 842, b'q 200 0 0 100 50 600 cm /Im0 Do Q',
+                         xobjects={'Im0': image})
+            pdf.close()
+    """
+
+    def __init__(self, fileobj, level=6):
+        self.fileobj = fileobj
+        self.level = level
+        self.offsets = [None]
+        self.pages = []
+        self.widths = {}
+        self._fonts = {}
+        self._pages_ref = self._reserve()
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.fileobj.write(data)
+
+    def _reserve(self):
+        self.offsets.append(None)
+        return Ref((len(self.offsets) - 1, 0))
+
+    def write_object(self, value, ref=None):
+        """Write ``value`` (a ``Stream`` or any PDF value); returns its reference."""
+        ref = ref or self._reserve()
+        self.offsets[ref[0]] = self.fileobj.tell()
+        self._write(b'%d 0 obj\n' % ref[0])
+        if isinstance(value, Stream):
+            dictionary = {**value.dictionary, 'Length': len(value.data)}
+            self._write(serialize(dictionary) + b'\nstream\n' + value.data + b'\nendstream')
+        else:
+            self._write(serialize(value))
+        self._write(b'\nendobj\n')
+        return ref
+
+    def font(self, base_font):
+        """Resource for one of ``FONTS``, written on first use."""
+        if base_font not in self._fonts:
+            self.widths[base_font] = _font_widths(FONTS[base_font])
+            self._fonts[base_font] = self.write_object({
+                'Type': Name('Font'), 'Subtype': Name('Type1'),
+                'BaseFont': Name(base_font), 'Encoding': Name('WinAnsiEncoding')})
+        return self._fonts[base_font]
+
+    def text_width(self, text, base_font, size):
+        """Width of ``text`` in points when set in ``base_font`` at ``size``."""
+        self.font(base_font)
+        widths = self.widths[base_font]
+        return sum(widths.get(code, DEFAULT_WIDTH) for code in encode_text(text)) * size / 1000
+
+    def add_image(self, pixels):
+        """Write an RGB or RGBA uint8 array as an image XObject; returns its reference."""
+        height, width, channels = pixels.shape
+        image = {'Type': Name('XObject'), 'Subtype': Name('Image'), 'Width': width,
+                 'Height': height, 'ColorSpace': Name('DeviceRGB'), 'BitsPerComponent': 8,
+                 'Filter': Name('FlateDecode')}
+        if channels == 4:
+            alpha = pixels[..., 3]
+            if alpha.min() < 255:
+                image['SMask'] = self.write_object(Stream(
+                    {'Type': Name('XObject'), 'Subtype': Name('Image'), 'Width': width,
+                     'Height': height, 'ColorSpace': Name('DeviceGray'),
+                     'BitsPerComponent': 8, 'Filter': Name('FlateDecode')},
+                    zlib.compress(alpha.tobytes(), self.level)))
+            pixels = pixels[..., :3]
+        return self.write_object(Stream(image, zlib.compress(pixels.tobytes(), self.level)))
+
+    def import_page(self, path):
+        """Copy the first page of the PDF at ``path`` as a Form XObject.
+
+        Returns ``(reference, media box)``.  Only the objects the page uses
+        are copied, each once.
+        """
+        reader = PDFReader(path)
+        page = reader.first_page()
+        copied = {}
+
+        def copy(value):
+            if isinstance(value, Ref):
+                if value[0] not in copied:
+                    copied[value[0]] = self._reserve()
+                    self.write_object(copy(reader.object(value[0])), copied[value[0]])
+                return copied[value[0]]
+            if isinstance(value, Stream):
+                return Stream(copy({key: item for key, item in value.dictionary.items()
+                                    if key != 'Length'}), value.data)
+            if isinstance(value, dict):
+                return {key: copy(item) for key, item in value.items() if key != 'Parent'}
+            if isinstance(value, list):
+                return [copy(item) for item in value]
+            return value
+
+        contents = reader.resolve(page['Contents'])
+        streams = [reader.resolve(item) for item in contents] if isinstance(contents, list) \
+            else [contents]
+        filters = {str(reader.resolve(stream.dictionary.get('Filter'))) for stream in streams}
+        if len(streams) == 1:
+            data = streams[0].data
+            extra = {key: streams[0].dictionary[key] for key in ('Filter', 'DecodeParms')
+                     if key in streams[0].dictionary}
+        elif filters <= {'FlateDecode', 'None'}:
+            data = zlib.compress(b'\n'.join(
+                zlib.decompress(stream.data) if 'Filter' in stream.dictionary else stream.data
+                for stream in streams), self.level)
+            extra = {'Filter': Name('FlateDecode')}
+        else:
+            raise UnsupportedPDF(f'{path}: content streams use {", ".join(sorted(filters))}')
+        media_box = [float(value) for value in reader.resolve(page['MediaBox'])]
+        form = Stream({'Type': Name('XObject'), 'Subtype': Name('Form'), 'BBox': media_box,
+                       'Resources': copy(reader.resolve(page.get('Resources', {}))),
+                       **copy(extra)}, data)
+        return self.write_object(form), media_box
+
+    def add_page(self, width, height, content, xobjects=None, fonts=()):
+        """Write one page drawn by the operators in ``content``.
+
+        ``xobjects`` maps resource names to image or form references;
+        ``fonts`` lists the ``FONTS`` the content selects (as ``/<font name>``
+        with any ``-`` removed, e.g. ``/HelveticaBold``).
+        """
+        resources = {}
+        if fonts:
+            resources['Font'] = {name.replace('-', ''): self.font(name) for name in fonts}
+        if xobjects:
+            resources['XObject'] = dict(xobjects)
+        contents = self.write_object(Stream({'Filter': Name('FlateDecode')},
+                                            zlib.compress(content, self.level)))
+        self.pages.append(self.write_object({
+            'Type': Name('Page'), 'Parent': self._pages_ref, 'MediaBox': [0, 0, width, height],
+            'Resources': resources, 'Contents': contents}))
+
+    def close(self, info=None):
+        """Write the page tree, catalog, cross-reference table and trailer."""
+        self.write_object({'Type': Name('Pages'), 'Kids': self.pages,
+                           'Count': len(self.pages)}, self._pages_ref)
+        root = self.write_object({'Type': Name('Catalog'), 'Pages': self._pages_ref})
+        trailer = {'Root': root}
+        if info:
+            trailer['Info'] = self.write_object({key: Raw(literal(encode_text(value)))
+                                                 for key, value in info.items()})
+        trailer['Size'] = len(self.offsets)
+        start = self.fileobj.tell()
+        self._write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self.offsets))
+        for offset in self.offsets[1:]:
+            self._write(b'%010d 00000 n \n' % offset)
+        self._write(b'trailer\n' + serialize(trailer) + b'\nstartxref\n%d\n%%%%EOF\n' % start)
@@ -0,0 +1,293 @@
+"""
+Streaming PNG encoder for RGBA images.
+
+Rows are filtered and deflated as they arrive, so an image can be written
+strip by strip without ever holding the full canvas in memory.
+
+The encoder is tunable: zlib ``level``, the scanline ``filter`` (one of
+``FILTERS``; ``adaptive`` picks the best filter per row and is the default
+for RGBA images, as in libpng), an indexed-colour ``palette`` and ``jobs``
+threads that deflate independent pieces of the stream in parallel (pigz
+style, each piece primed with the last 32 KiB of the previous one).
+
+NumPy is imported where it is used, so the command line scripts can list
+``FILTERS`` without loading it.
+"""
+
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# PNG filter types, in the order of their type byte; 'adaptive' picks per row
+FILTERS = ('none', 'sub', 'up', 'average', 'paeth', 'adaptive')
+
+# Largest palette an indexed PNG can hold
+MAX_PALETTE = 256
+
+# Rows filtered at once, to bound the temporary arrays
+FILTER_BLOCK_ROWS = 256
+
+# Uncompressed bytes per piece when deflating in parallel
+PARALLEL_PIECE_BYTES = 1 << 20
+
+# Deflate window, used as the preset dictionary of each parallel piece
+WINDOW_BYTES = 1 << 15
+
+
+def _chunk(tag, data):
+    """Serialise one PNG chunk (length, tag, data, CRC)."""
+    return (struct.pack('>I', len(data)) + tag + data
+            + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+
+def _zlib_header(level):
+    """Two-byte zlib stream header advertising ``level``."""
+    flags = 0x01 if level < 2 else 0x5e if level < 6 else 0x9c if level == 6 else 0xda
+    return bytes((0x78, flags))
+
+
+def filter_scanlines(rows, previous, method, bpp):
+    """Filter a block of scanlines; returns them prefixed with their filter type.
+
+    ``rows`` is a (n, stride) uint8 array, ``previous`` the unfiltered row
+    above the block (zeros for the first row of the image) and ``bpp`` the
+    bytes per pixel.
+    """
+    import numpy as np
+
+    n, stride = rows.shape
+    up = np.empty_like(rows)
+    up[0] = previous
+    up[1:] = rows[:-1]
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+
+    # uint8 arithmetic wraps modulo 256, exactly as PNG residuals do
+    def average():
+        return ((left.astype(np.uint16) + up) >> 1).astype(np.uint8)
+
+    def paeth():
+        a, b = left.astype(np.int16), up.astype(np.int16)
+        c = np.zeros_like(a)
+        c[:, bpp:] = b[:, :-bpp]
+        pa, pb, pc = np.abs(b - c), np.abs(a - c), np.abs(a + b - 2 * c)
+        return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c)).astype(np.uint8)
+
+    predictors = {
+        'none': lambda: np.uint8(0),
+        'sub': lambda: left,
+        'up': lambda: up,
+        'average': average,
+        'paeth': paeth,
+    }
+    out = np.empty((n, 1 + stride), dtype=np.uint8)
+    if method != 'adaptive':
+        out[:, 0] = FILTERS.index(method)
+        np.subtract(rows, predictors[method](), out=out[:, 1:])
+        return out
+
+    # libpng's heuristic: minimise the sum of the residuals read as signed bytes
+    best = None
+    for filter_type, predict in enumerate(predictors.values()):
+        residual = rows - predict()
+        cost = np.abs(residual.view(np.int8).astype(np.int32)).sum(axis=1)
+        if best is None:
+            best = cost
+            out[:, 0] = filter_type
+            out[:, 1:] = residual
+            continue
+        better = cost < best
+        best = np.where(better, cost, best)
+        out[better, 0] = filter_type
+        out[better, 1:] = residual[better]
+    return out
+
+
+def quantize(rgba, colors=256):
+    """Map an RGBA image onto at most ``colors`` colours.
+
+    Returns ``(indices, palette)``: a (rows, width) uint8 index image and an
+    (n, 4) uint8 RGBA palette.  Images with fewer distinct colours keep
+    them exactly; otherwise anti-aliased edges are approximated (fast
+    octree, no dithering).  Raises ``ValueError`` unless ``colors`` is in
+    1..``MAX_PALETTE``.
+    """
+    import numpy as np
+    from PIL import Image
+
+    if not 1 <= colors <= MAX_PALETTE:
+        raise ValueError(f'Palette size must be between 1 and {MAX_PALETTE}, got {colors}')
+
+    image = Image.fromarray(np.ascontiguousarray(rgba), 'RGBA')
+    exact = image.getcolors(colors)
+    if exact is not None:
+        palette = np.array([colour for _, colour in exact], dtype=np.uint8)
+        keys = palette.view('>u4').ravel()
+        order = np.argsort(keys)
+        pixels = np.ascontiguousarray(rgba).view('>u4')[..., 0]
+        indices = order[np.searchsorted(keys[order], pixels)].astype(np.uint8)
+        return indices, palette
+    indexed = image.quantize(colors, method=Image.Quantize.FASTOCTREE,
+                             dither=Image.Dither.NONE)
+    count = max(index for _, index in indexed.getcolors(colors)) + 1
+    palette = np.array(indexed.getpalette('RGBA')[:count * 4], dtype=np.uint8).reshape(-1, 4)
+    return np.asarray(indexed), palette
+
+
+class PNGStreamWriter:
+    """Write an 8-bit RGBA (or indexed) PNG incrementally.
+
+    Usage::
+
+        with PNGStreamWriter(fileobj, width, height, dpi=600) as png:
+            for strip in strips:
+                png.write_rows(strip)   # uint8 array, shape (rows, width, 4)
+
+    With a ``palette`` ((n, 4) uint8 RGBA array, n <= 256) the image is
+    written as indexed colour and ``write_rows`` takes (rows, width) index
+    arrays instead (see ``quantize``).  Without a ``filter`` RGBA rows are
+    filtered adaptively and palette indices are left unfiltered, which
+    compresses them best.
+    """
+
+    def __init__(self, fileobj, width, height, dpi=None, level=6, filter=None,
+                 palette=None, jobs=1):
+        import numpy as np
+
+        if filter is None:
+            filter = 'none' if palette is not None else 'adaptive'
+        if filter not in FILTERS:
+            raise ValueError(f"Unknown PNG filter {filter!r}; expected one of {', '.join(FILTERS)}")
+        self.fileobj = fileobj
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.level = level
+        self.filter = filter
+        self.channels = 1 if palette is not None else 4
+        self._previous = np.zeros(width * self.channels, dtype=np.uint8)
+        if jobs > 1:
+            self._pool = ThreadPoolExecutor(jobs)
+            self._adler = zlib.adler32(b'')
+            self._window = b''
+            self._compressor = None
+        else:
+            self._pool = None
+            self._compressor = zlib.compressobj(level)
+
+        # 8-bit depth, colour type 6 (RGBA) or 3 (indexed), default compression/filter
+        colour_type = 3 if palette is not None else 6
+        header = struct.pack('>IIBBBBB', width, height, 8, colour_type, 0, 0, 0)
+        fileobj.write(PNG_SIGNATURE)
+        fileobj.write(_chunk(b'IHDR', header))
+        if dpi:
+            pixels_per_metre = int(round(dpi / 0.0254))
+            fileobj.write(_chunk(b'pHYs', struct.pack('>IIB', pixels_per_metre,
+                                                      pixels_per_metre, 1)))
+        if palette is not None:
+            palette = np.asarray(palette, dtype=np.uint8)
+            if not 1 <= len(palette) <= MAX_PALETTE:
+                raise ValueError(f'A PNG palette holds 1 to {MAX_PALETTE} colours, '
+                                 f'got {len(palette)}')
+            fileobj.write(_chunk(b'PLTE', palette[:, :3].tobytes()))
+            alpha = palette[:, 3]
+            translucent = np.flatnonzero(alpha != 255)
+            if translucent.size:
+                # Entries after the last translucent one default to opaque
+                fileobj.write(_chunk(b'tRNS', alpha[:translucent[-1] + 1].tobytes()))
+        if self._pool is not None:
+            fileobj.write(_chunk(b'IDAT', _zlib_header(level)))
+
+    def write_rows(self, rows):
+        """Append a block of rows.
+
+        ``rows`` has shape (rows, width, 4), or (rows, width) for a palette image.
+        """
+        import numpy as np
+
+        rows = np.asarray(rows, dtype=np.uint8)
+        expected = (self.width, 4) if self.channels == 4 else (self.width,)
+        if rows.shape[1:] != expected:
+            raise ValueError(f'Expected rows of shape (n, {", ".join(map(str, expected))}), '
+                             f'got {rows.shape}')
+        count = rows.shape[0]
+        if self.rows_written + count > self.height:
+            raise ValueError('More rows written than declared in the PNG header')
+
+        rows = rows.reshape(count, -1)
+        if self.filter == 'none':
+            # Filter type 0 (None) prefixes every scanline
+            scanlines = np.zeros((count, 1 + rows.shape[1]), dtype=np.uint8)
+            scanlines[:, 1:] = rows
+        else:
+            scanlines = np.concatenate([
+                filter_scanlines(rows[start:start + FILTER_BLOCK_ROWS],
+                                 rows[start - 1] if start else self._previous,
+                                 self.filter, self.channels)
+                for start in range(0, count, FILTER_BLOCK_ROWS)])
+        if count:
+            self._previous = rows[-1].copy()
+
+        if self._pool is None:
+            data = self._compressor.compress(scanlines)
+            if data:
+                self.fileobj.write(_chunk(b'IDAT', data))
+        else:
+            self._deflate_parallel(scanlines.tobytes())
+        self.rows_written += count
+
+    def _deflate_parallel(self, raw):
+        """Deflate ``raw`` in independent pieces on the thread pool."""
+        def deflate(start):
+            window = raw[max(0, start - WINDOW_BYTES):start] or self._window
+            compressor = (zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=window)
+                          if window else zlib.compressobj(self.level, zlib.DEFLATED, -15))
+            piece = raw[start:start + PARALLEL_PIECE_BYTES]
+            return compressor.compress(piece) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        # zlib releases the GIL while compressing, so threads run in parallel
+        for data in self._pool.map(deflate, range(0, len(raw), PARALLEL_PIECE_BYTES)):
+            self.fileobj.write(_chunk(b'IDAT', data))
+        self._adler = zlib.adler32(raw, self._adler)
+        self._window = (self._window + raw)[-WINDOW_BYTES:]
+
+    def close(self):
+        """Flush the compressor and write the trailing chunks."""
+        if self.rows_written != self.height:
+            raise ValueError(f'Wrote {self.rows_written} of {self.height} rows')
+        if self._pool is None:
+            self.fileobj.write(_chunk(b'IDAT', self._compressor.flush()))
+        else:
+            self._pool.shutdown()
+            # An empty final block, then the checksum of the whole stream
+            final = zlib.compressobj(self.level, zlib.DEFLATED, -15).flush()
+            self.fileobj.write(_chunk(b'IDAT', final + struct.pack('>I', self._adler)))
+        self.fileobj.write(_chunk(b'IEND', b''))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._pool is not None:
+            self._pool.shutdown()
+
+
+def write_png(path, rgba, dpi=None, palette=None, **options):
+    """Encode a whole RGBA image to ``path``.
+
+    ``palette`` is the maximum number of colours for an indexed image (see
+    ``quantize``); the other ``options`` go to ``PNGStreamWriter``.
+    """
+    rows, width, _ = rgba.shape
+    if palette is not None:
+        rgba, colours = quantize(rgba, palette)
+    else:
+        colours = None
+    with open(path, 'wb') as fileobj, \
+            PNGStreamWriter(fileobj, width, rows, dpi, palette=colours, **options) as png:
+        png.write_rows(rgba)
+    return path
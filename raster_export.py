@@ -0,0 +1,269 @@
+"""
+Memory-bounded PNG rasterisation.
+
+``export_png_tiled`` renders a figure in horizontal strips (one Agg buffer
+of ``tile_rows`` rows at a time) and streams each strip straight into
+``PNGStreamWriter``.  Peak memory is bounded by the strip size instead of the
+full 600-dpi canvas, at the cost of one draw per strip.
+
+``export_png_pyramid`` rasterises once at the highest requested dpi and
+derives the lower resolutions by area-averaging each strip.
+
+``save_png_measured`` is the single-canvas equivalent of
+``savefig(bbox_inches='tight')`` without savefig's full-size measuring pass.
+
+Every writer takes ``png`` encoder options (``level``, ``filter``, ``jobs``
+and, for whole-canvas writers, ``palette``; see ``png_writer``).  Without
+them ``save_png_measured`` keeps savefig's own encoder.
+
+``BufferSink``, ``without_layout_engine`` and ``PIXEL_EPS`` are shared with
+the compositing exporters (``card_tiles``, ``static_layers``), which draw
+layers with ``hide`` and ``render_region`` and place them with
+``window_extent``.
+"""
+
+import math
+from contextlib import ExitStack, contextmanager
+
+import matplotlib as mpl
+import numpy as np
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.collections import Collection
+from matplotlib.layout_engine import PlaceHolderLayoutEngine
+from matplotlib.transforms import Bbox
+
+from png_writer import PNGStreamWriter, write_png
+
+# Added to pixel sizes so int() truncation in the Agg canvas never drops a row
+PIXEL_EPS = 1e-3
+
+
+def measure_bbox(fig, pad_inches=0.1, measure_dpi=72):
+    """Padded tight bounding box (inches) as ``bbox_inches='tight'`` computes it.
+
+    Text extents only depend on the renderer's dpi, so a 1x1 pixel renderer
+    is enough; savefig's own tight pass allocates a full-size canvas instead.
+    """
+    renderer = RendererAgg(1, 1, measure_dpi)
+    saved_dpi = fig.dpi
+    fig.dpi = measure_dpi
+    try:
+        bbox = fig.get_tightbbox(renderer)
+    finally:
+        fig.dpi = saved_dpi
+    return bbox.padded(pad_inches)
+
+
+def pixel_bbox(bbox, dpi, multiple=1):
+    """Grow ``bbox`` to whole pixels at ``dpi``; returns (bbox, width, height).
+
+    Width and height are rounded up to a multiple of ``multiple`` pixels.
+    """
+    width = math.ceil(bbox.width * dpi / multiple) * multiple
+    height = math.ceil(bbox.height * dpi / multiple) * multiple
+    snapped = Bbox.from_bounds(bbox.x0, bbox.y0,
+                               (width + PIXEL_EPS) / dpi, (height + PIXEL_EPS) / dpi)
+    return snapped, width, height
+
+
+class BufferSink:
+    """File-like target for ``format='rgba'`` that keeps the Agg buffer.
+
+    The Agg backend hands ``write`` a memoryview of its own pixel buffer, so
+    keeping a reference avoids copying each strip.
+    """
+
+    data = None
+
+    def write(self, data):
+        self.data = data
+
+    def seek(self, offset, whence=0):
+        # Only present so matplotlib accepts this object as a file handle
+        raise OSError('BufferSink is not seekable')
+
+
+def iter_strips(fig, bbox, width, height, dpi, tile_rows, **savefig_kwargs):
+    """Yield the pixel-aligned ``bbox`` as RGBA strips, top to bottom."""
+    for top in range(0, height, tile_rows):
+        rows = min(tile_rows, height - top)
+        # Strip origins are whole pixels apart, so snapping and text placement
+        # match a single full-canvas render of ``bbox``
+        strip = Bbox.from_bounds(bbox.x0, bbox.y0 + (height - top - rows) / dpi,
+                                 bbox.width, (rows + PIXEL_EPS) / dpi)
+        sink = BufferSink()
+        fig.savefig(sink, format='rgba', dpi=dpi, bbox_inches=strip, **savefig_kwargs)
+        yield np.frombuffer(sink.data, dtype=np.uint8).reshape(rows, width, 4)
+
+
+def area_downsample(rgba, factor):
+    """Shrink an RGBA array by an integer ``factor`` using area averaging.
+
+    Colours are averaged with premultiplied alpha so transparent pixels do
+    not darken anti-aliased edges.  Both dimensions must be divisible by
+    ``factor``.
+    """
+    if factor == 1:
+        return rgba
+    rows, width, _ = rgba.shape
+    pixels = rgba.astype(np.float32)
+    pixels[..., :3] *= pixels[..., 3:] / 255
+    blocks = pixels.reshape(rows // factor, factor, width // factor, factor, 4).mean(axis=(1, 3))
+    alpha = blocks[..., 3:]
+    np.divide(blocks[..., :3] * 255, alpha, out=blocks[..., :3], where=alpha > 0)
+    return np.rint(blocks).clip(0, 255).astype(np.uint8)
+
+
+def alpha_over(dst, src, top, left):
+    """Composite RGBA ``src`` over ``dst`` in place, with its corner at (top, left).
+
+    Pixels covered by only one of the layers are copied unchanged, so layers
+    that do not overlap give exactly the pixels of a single-canvas render.
+    """
+    rows, cols, _ = src.shape
+    region = dst[top:top + rows, left:left + cols]
+    src_alpha = src[..., 3]
+    covered = src_alpha > 0
+    blend = covered & (region[..., 3] > 0) & (src_alpha < 255)
+    region[covered & ~blend] = src[covered & ~blend]
+    if not blend.any():
+        return dst
+
+    # Straight-alpha "over" for the overlapping, partially transparent pixels
+    fg = src[blend].astype(np.float32) / 255
+    bg = region[blend].astype(np.float32) / 255
+    fg_alpha, bg_alpha = fg[:, 3:], bg[:, 3:] * (1 - fg[:, 3:])
+    alpha = fg_alpha + bg_alpha
+    colour = (fg[:, :3] * fg_alpha + bg[:, :3] * bg_alpha) / alpha
+    region[blend] = np.rint(np.concatenate([colour, alpha], axis=1) * 255).astype(np.uint8)
+    return dst
+
+
+@contextmanager
+def without_layout_engine(fig):
+    """Detach the figure's layout engine for the duration of an export.
+
+    plt.tight_layout() leaves a layout engine attached, which makes every
+    savefig allocate a full-size renderer for a layout pass; the layout is
+    already final, so it is switched off while strips are drawn.
+    """
+    layout_engine = fig.get_layout_engine()
+    fig.set_layout_engine(None)
+    try:
+        yield
+    finally:
+        fig.set_layout_engine(layout_engine)
+
+
+def hide(artists):
+    """Make every artist in ``artists`` invisible; callers restore visibility."""
+    for artist in artists:
+        artist.set_visible(False)
+
+
+def render_region(fig, canvas, dpi, left, bottom, width, height, **savefig_kwargs):
+    """Render ``width`` x ``height`` pixels of ``canvas`` starting at (left, bottom).
+
+    ``canvas`` is ``(x0, y0, width, height)``: its origin in inches and its
+    size in pixels at ``dpi``.  Returns an RGBA array of its own.
+    """
+    x0, y0 = canvas[:2]
+    bbox = Bbox.from_bounds(x0 + left / dpi, y0 + bottom / dpi,
+                            (width + PIXEL_EPS) / dpi, (height + PIXEL_EPS) / dpi)
+    sink = BufferSink()
+    with without_layout_engine(fig):
+        fig.savefig(sink, format='rgba', dpi=dpi, bbox_inches=bbox, **savefig_kwargs)
+    # Copy out of the Agg buffer, which is reused by the next draw
+    return np.frombuffer(sink.data, dtype=np.uint8).reshape(height, width, 4).copy()
+
+
+def window_extent(artist, renderer, dpi):
+    """Display extent of ``artist``, including half of any stroke width."""
+    if isinstance(artist, Collection):
+        # Collection.get_window_extent is empty until the collection is drawn
+        trans = artist.axes.transData
+        extent = trans.transform_bbox(artist.get_datalim(trans))
+    else:
+        extent = artist.get_window_extent(renderer)
+    if not hasattr(artist, 'get_linewidth'):
+        return extent
+    return extent.padded(float(np.max(artist.get_linewidth(), initial=0)) * dpi / 72 / 2)
+
+
+def layout_is_final(fig):
+    """True when no layout engine would still move artists at draw time."""
+    return isinstance(fig.get_layout_engine(), (type(None), PlaceHolderLayoutEngine))
+
+
+def save_png_measured(fig, path, png=None, **savefig_kwargs):
+    """Save a tightly cropped PNG in a single draw.
+
+    ``savefig(bbox_inches='tight')`` first prints the figure with drawing
+    disabled on a canvas the size of the whole figure, just to find its
+    extent.  Measuring with ``measure_bbox`` and passing the box explicitly
+    gives the same pixels without that canvas or the layout-engine pass.
+    """
+    savefig_kwargs.pop('bbox_inches', None)
+    savefig_kwargs.pop('format', None)
+    dpi = savefig_kwargs.pop('dpi', None)
+    dpi = fig.dpi if dpi in (None, 'figure') else dpi
+    pad_inches = savefig_kwargs.pop('pad_inches', None)
+    if pad_inches in (None, 'layout'):
+        pad_inches = mpl.rcParams['savefig.pad_inches']
+
+    bbox = measure_bbox(fig, pad_inches, dpi)
+    with without_layout_engine(fig):
+        if not png:
+            fig.savefig(path, format='png', dpi=dpi, bbox_inches=bbox, **savefig_kwargs)
+            return path
+        sink = BufferSink()
+        fig.savefig(sink, format='rgba', dpi=dpi, bbox_inches=bbox, **savefig_kwargs)
+    # The buffer is shaped (rows, width, 4) like the PNG savefig would write
+    return write_png(path, np.asarray(sink.data), dpi, **png)
+
+
+def export_png_tiled(fig, path, dpi, tile_rows=512, pad_inches=0.1, png=None,
+                     **savefig_kwargs):
+    """Write ``fig`` as a PNG rendered ``tile_rows`` rows at a time."""
+    return export_png_pyramid(fig, [(path, dpi)], tile_rows, pad_inches, png,
+                              **savefig_kwargs)[0]
+
+
+def export_png_pyramid(fig, targets, tile_rows=512, pad_inches=0.1, png=None,
+                       **savefig_kwargs):
+    """Write ``fig`` at several resolutions from a single rasterisation.
+
+    ``targets`` is a list of ``(path, dpi)`` pairs.  The figure is drawn once
+    at the highest dpi, strip by strip; every level whose dpi divides it is
+    produced by area-averaging those strips.  Other levels fall back to their
+    own tiled render.  A ``palette`` in the ``png`` options is ignored: it
+    needs the whole image before the first row is written.  Returns the
+    paths in ``targets`` order.
+    """
+    png = dict(png or {})
+    png.pop('palette', None)
+    savefig_kwargs.pop('bbox_inches', None)
+    savefig_kwargs.pop('format', None)
+    top_dpi = max(dpi for _, dpi in targets)
+    shared = [(path, dpi) for path, dpi in targets if top_dpi % dpi == 0]
+    separate = [(path, dpi) for path, dpi in targets if top_dpi % dpi != 0]
+
+    factors = [int(top_dpi // dpi) for _, dpi in shared]
+    multiple = math.lcm(*factors)
+    bbox, width, height = pixel_bbox(measure_bbox(fig, pad_inches), top_dpi, multiple)
+    tile_rows = max(multiple, tile_rows // multiple * multiple)
+
+    with without_layout_engine(fig), ExitStack() as stack:
+        writers = []
+        for (path, dpi), factor in zip(shared, factors):
+            fileobj = stack.enter_context(open(path, 'wb'))
+            writers.append((stack.enter_context(
+                PNGStreamWriter(fileobj, width // factor, height // factor, dpi, **png)), factor))
+        for strip in iter_strips(fig, bbox, width, height, top_dpi, tile_rows,
+                                 **savefig_kwargs):
+            for writer, factor in writers:
+                writer.write_rows(area_downsample(strip, factor))
+
+    for path, dpi in separate:
+        export_png_tiled(fig, path, dpi, tile_rows, pad_inches, png, **savefig_kwargs)
+    return [path for path, _ in targets]
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Render every presentation asset in parallel.
+
+Each variant module exposes ``render(output_dir, force)``; this script fans the
+variants out over a process pool whose workers import matplotlib (Agg
+backend) and load the font cache once, then reports per-asset timings.
+"""
+
+import argparse
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from card_engine import add_export_arguments, apply_export_arguments, init_worker
+
+# Variant name -> module exposing render(output_dir, force)
+VARIANTS = {
+    'clean_cards': 'create_17_fields_clean_cards',
+    'svg': 'create_17_fields_svg',
+    'graphic': 'create_17_fields_graphic',
+    'modern': 'create_17_fields_modern',
+    'circular': 'create_17_fields_circular',
+    'vlm_diagram': 'generate_vlm_diagram',
+}
+
+
+def render_variant(name, output_dir=None, force=False, formats=None, dry_run=False):
+    """Render one variant; returns a result dict instead of raising.
+
+    ``formats`` overrides the variant's default output formats.  With
+    ``dry_run`` the paths are those that would be rendered.
+    """
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(VARIANTS[name])
+        kwargs = {'formats': tuple(formats)} if formats else {}
+        if dry_run:
+            kwargs['dry_run'] = True
+        paths = [str(path) for path in module.render(output_dir, force=force, **kwargs)]
+        error = None
+    except Exception as e:
+        paths = []
+        error = f'{type(e).__name__}: {e}'.strip()
+    return {
+        'name': name,
+        'seconds': time.perf_counter() - start,
+        'paths': paths,
+        'error': error,
+    }
+
+
+def render_all(names, output_dir=None, jobs=None, force=False):
+    """Render ``names`` across a process pool; yields results as they finish."""
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(jobs, len(names)),
+                             initializer=init_worker) as pool:
+        futures = [pool.submit(render_variant, name, output_dir, force) for name in names]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render all presentation assets in parallel.')
+    parser.add_argument('variants', nargs='*', metavar='VARIANT',
+                        help=f"variants to render (default: all of {', '.join(VARIANTS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='worker processes (default: one per core)')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='directory for rendered files (default: repository root)')
+    parser.add_argument('--force', action='store_true',
+                        help='ignore the render cache and re-render everything')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='list the outputs that would be rendered without loading matplotlib')
+    add_export_arguments(parser)
+    args = parser.parse_args()
+    apply_export_arguments(args)
+
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"unknown variant(s): {', '.join(sorted(unknown))}")
+
+    names = args.variants or list(VARIANTS)
+    if args.dry_run:
+        for name in names:
+            result = render_variant(name, args.output_dir, args.force, dry_run=True)
+            outputs = ', '.join(os.path.basename(path) for path in result['paths'])
+            print(f"{name:<12} {result['error'] or outputs or 'up to date'}")
+        return
+
+    if args.output_dir:
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    failures = 0
+    for result in render_all(names, args.output_dir, args.jobs, args.force):
+        if result['error']:
+            failures += 1
+            print(f"❌ {result['name']:<12} {result['seconds']:7.2f}s  {result['error']}")
+        else:
+            outputs = ', '.join(os.path.basename(path) for path in result['paths'])
+            print(f"✅ {result['name']:<12} {result['seconds']:7.2f}s  {outputs}")
+
+    print(f"Rendered {len(names) - failures}/{len(names)} variants in "
+          f"{time.perf_counter() - start:.2f}s")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
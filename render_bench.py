@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Benchmark the infographic variants and catch rendering regressions.
+
+Every (variant, format, dpi) case runs in a fresh process so peak RSS is
+attributable to that case alone.  Figure construction, an Agg ``draw`` at the
+case resolution and the full ``export_figure`` call are timed separately
+(best of ``--repeat`` runs), and the output size is recorded.
+
+Results can be saved as a JSON baseline; later runs compare against it and
+exit non-zero when a case got slower, heavier or larger than the threshold.
+
+``--startup-budget [SECONDS]`` instead times ``--help`` for every command line
+script and fails when one exceeds the budget (``STARTUP_BUDGET`` by default)
+or imports matplotlib or NumPy; ``check_startup.py`` runs the same check
+without arguments.
+
+``--png-encoders`` rasterises each variant once at the highest ``--dpi`` and
+compares the PNG encoder settings in ``PNG_ENCODERS`` (time, size and whether
+the decoded pixels are unchanged) against savefig's own encoder; it fails
+when the default settings write a larger file than savefig.
+
+``--pyramid DPIS`` exports each variant as ``png@<dpi>`` for every dpi in one
+``export_figure`` call, so levels that divide the highest dpi share its
+rasterisation and the others are rendered separately, and fails when an
+output's pixel size differs from savefig's at that dpi.
+
+``--mermaid`` times the in-process flowchart renderer (``mermaid_flowchart``)
+against ``mmdc`` on every flowchart in ``presentation_diagrams/mermaid_exports``
+and the VLM architecture diagram; ``mmdc`` is skipped when it is not installed.
+"""
+
+import argparse
+import importlib
+import importlib.metadata
+import json
+import multiprocessing
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+from card_engine import add_export_arguments, apply_export_arguments, parse_formats
+from render_all import VARIANTS, init_worker
+
+OUTPUT_DIR = Path(__file__).resolve().parent
+BASELINE = OUTPUT_DIR / 'render_bench_baseline.json'
+
+# Variants drawn with matplotlib (the Mermaid diagram has nothing to time here)
+BENCH_VARIANTS = ('clean_cards', 'svg', 'graphic', 'modern', 'circular')
+
+TIME_METRICS = ('build', 'draw', 'savefig')
+
+# Scripts whose --help must stay fast and free of heavy imports
+CLI_SCRIPTS = (
+    *(f'{module}.py' for module in VARIANTS.values()),
+    'build_deck.py', 'build_handout.py', 'render_all.py', 'render_bench.py', 'render_daemon.py',
+    'render_watch.py', 'check_startup.py',
+)
+STARTUP_BUDGET = 0.5
+HEAVY_MODULES = ('matplotlib', 'numpy')
+
+# Runs a script's --help in-process and reports which heavy modules it loaded
+_STARTUP_PROBE = """
+import runpy, sys
+sys.argv = [sys.argv[1], '--help']
+sys.stdout = open(__import__('os').devnull, 'w')
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit:
+    pass
+sys.stderr.write(' '.join(name for name in {heavy!r} if name in sys.modules))
+"""
+# PNG encoder settings compared by --png-encoders; None is savefig's encoder
+PNG_ENCODERS = (
+    ('savefig', None),
+    ('default', {}),
+    ('level 1', {'level': 1}),
+    ('level 9', {'level': 9}),
+    ('filter none', {'filter': 'none'}),
+    ('filter up', {'filter': 'up'}),
+    ('filter paeth', {'filter': 'paeth'}),
+    ('filter up, 4 jobs', {'filter': 'up', 'jobs': 4}),
+    ('palette 256', {'palette': 256}),
+)
+
+# Absolute slack below which a difference is treated as noise
+RSS_SLACK_MB = 8
+
+
+def variant_parts(module):
+    """(stem, build callable, savefig kwargs, style) for a variant module."""
+    if hasattr(module, 'SPEC'):
+        from card_engine import build_figure
+
+        spec = module.SPEC
+        return spec['name'], lambda: build_figure(spec), spec['savefig'], None
+    return module.NAME, module.build_figure, module.SAVEFIG, getattr(module, 'STYLE', None)
+
+
+def case_key(variant, fmt, dpi):
+    return f'{variant}:{fmt}@{dpi}' if dpi else f'{variant}:{fmt}'
+
+
+def run_case(variant, fmt, dpi, repeat):
+    """Time one case in the current (fresh) process; returns a result dict."""
+    import matplotlib.pyplot as plt
+
+    from card_engine import export_figure
+
+    stem, build, savefig, style = variant_parts(importlib.import_module(VARIANTS[variant]))
+    savefig = dict(savefig, **({'dpi': dpi} if dpi else {}))
+    timings = {metric: [] for metric in TIME_METRICS}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(repeat):
+            with plt.style.context(style) if style else nullcontext():
+                start = time.perf_counter()
+                fig = build()
+                built = time.perf_counter()
+
+                # Raster cases draw at their output dpi, vector ones at the figure's own
+                saved_dpi = fig.dpi
+                fig.dpi = dpi or saved_dpi
+                fig.canvas.draw()
+                fig.dpi = saved_dpi
+                drawn = time.perf_counter()
+
+                path, = export_figure(fig, stem, (fmt,), tmp, **savefig)
+                exported = time.perf_counter()
+            plt.close(fig)
+
+            timings['build'].append(built - start)
+            timings['draw'].append(drawn - built)
+            timings['savefig'].append(exported - drawn)
+        size = path.stat().st_size
+
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return {
+        'key': case_key(variant, fmt, dpi),
+        **{metric: min(values) for metric, values in timings.items()},
+        'peak_rss_mb': round(rss_mb, 1),
+        'bytes': size,
+    }
+
+
+def cases(variants, formats, dpis):
+    """Expand the benchmark matrix; only raster formats vary by dpi."""
+    for variant in variants:
+        for fmt in formats:
+            for dpi in (dpis if fmt == 'png' else (None,)):
+                yield variant, fmt, dpi
+
+
+def run_benchmarks(variants, formats, dpis, repeat=3):
+    """Run every case sequentially, each in its own process; yields results."""
+    context = multiprocessing.get_context('spawn')
+    for case in cases(variants, formats, dpis):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context,
+                                 initializer=init_worker) as pool:
+            yield pool.submit(run_case, *case, repeat).result()
+
+
+def run_png_encoders(variant, dpi, repeat=3):
+    """Time every ``PNG_ENCODERS`` entry on one rasterised canvas; yields results."""
+    import matplotlib.image
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from PIL import Image
+
+    from png_writer import write_png
+    from raster_export import BufferSink, measure_bbox, without_layout_engine
+
+    stem, build, savefig, style = variant_parts(importlib.import_module(VARIANTS[variant]))
+    savefig = {key: value for key, value in savefig.items() if key not in ('dpi', 'pad_inches')}
+    with plt.style.context(style) if style else nullcontext():
+        fig = build()
+        sink = BufferSink()
+        with without_layout_engine(fig):
+            fig.savefig(sink, format='rgba', dpi=dpi, bbox_inches=measure_bbox(fig, 0.1, dpi),
+                        **savefig)
+        rgba = np.array(sink.data)
+    plt.close(fig)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f'{stem}.png'
+        for label, options in PNG_ENCODERS:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                if options is None:
+                    matplotlib.image.imsave(path, rgba, format='png', dpi=dpi)
+                else:
+                    write_png(path, rgba, dpi, **options)
+                best = min(best, time.perf_counter() - start)
+            decoded = np.asarray(Image.open(path).convert('RGBA'))
+            yield {
+                'key': f'{case_key(variant, "png", dpi)}:{label}',
+                'encode': best,
+                'bytes': path.stat().st_size,
+                'lossless': bool(np.array_equal(decoded, rgba)),
+            }
+
+
+def run_pyramid(variant, dpis):
+    """Export ``png@<dpi>`` for every dpi at once and check each size; yields results."""
+    import io
+
+    import matplotlib.pyplot as plt
+    from PIL import Image
+
+    from card_engine import export_figure
+
+    stem, build, savefig, style = variant_parts(importlib.import_module(VARIANTS[variant]))
+    with plt.style.context(style) if style else nullcontext():
+        fig = build()
+        with tempfile.TemporaryDirectory() as tmp:
+            formats = tuple(f'png@{dpi}' for dpi in dpis)
+            paths = export_figure(fig, stem, formats, tmp, **savefig)
+            for dpi, path in zip(dpis, paths):
+                buffer = io.BytesIO()
+                fig.savefig(buffer, format='png', **{'bbox_inches': 'tight', **savefig,
+                                                     'dpi': dpi})
+                expected = Image.open(buffer).size
+                size = Image.open(path).size
+                yield {
+                    'key': case_key(variant, 'png', dpi),
+                    'shared': max(dpis) % dpi == 0,
+                    'size': size,
+                    'expected': expected,
+                    # Pixel snapping may round the tight bbox differently
+                    'ok': all(abs(a - b) <= 1 for a, b in zip(size, expected)),
+                }
+    plt.close(fig)
+
+
+def run_mermaid(repeat=3):
+    """Time the in-process renderer and ``mmdc`` on every flowchart source; yields results.
+
+    A renderer's time is None when it is not installed and its error is
+    recorded under ``<name>_error`` when any run fails.
+    """
+    from mermaid_flowchart import is_flowchart, render_job
+    from mermaid_render import MERMAID_EXPORTS, MermaidJob, render_with_mmdc
+
+    sources = [*sorted(MERMAID_EXPORTS.glob('*.mmd')),
+               OUTPUT_DIR / 'vlm_architecture_transparent.mmd']
+    has_mmdc = shutil.which('mmdc') is not None
+    with tempfile.TemporaryDirectory() as tmp:
+        for source in sources:
+            if not is_flowchart(source.read_text(encoding='utf-8')):
+                continue
+            job = MermaidJob(source, Path(tmp) / f'{source.stem}.png')
+            result = {'key': source.stem}
+            for name, render in (('python', render_job), ('mmdc', render_with_mmdc)):
+                if name == 'mmdc' and not has_mmdc:
+                    result[name] = None
+                    continue
+                best = float('inf')
+                for _ in range(repeat):
+                    outcome = render(job)
+                    if not outcome.ok:
+                        result[f'{name}_error'] = outcome.error or 'failed'
+                        break
+                    best = min(best, outcome.seconds)
+                result[name] = None if f'{name}_error' in result else best
+            yield result
+
+
+def measure_startup(script, repeat=3):
+    """Best wall time of ``python script --help`` and the heavy modules it loads."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, '--help'], cwd=OUTPUT_DIR,
+                       capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    probe = subprocess.run([sys.executable, '-c', _STARTUP_PROBE.format(heavy=HEAVY_MODULES),
+                            script], cwd=OUTPUT_DIR, capture_output=True, text=True, check=True)
+    return best, probe.stderr.split()
+
+
+def check_startup(budget, repeat=3):
+    """Print the --help startup of every script; returns the number of failures."""
+    failures = 0
+    for script in CLI_SCRIPTS:
+        seconds, heavy = measure_startup(script, repeat)
+        ok = seconds <= budget and not heavy
+        failures += not ok
+        loaded = f"  loads {', '.join(heavy)}" if heavy else ''
+        print(f"{'✅' if ok else '❌'} {script:<34} {seconds:6.3f}s{loaded}")
+    return failures
+
+
+def compare(result, baseline, threshold, min_delta):
+    """Describe every metric of ``result`` that regressed against ``baseline``."""
+    slack = {'peak_rss_mb': RSS_SLACK_MB, 'bytes': 0,
+             **{metric: min_delta for metric in TIME_METRICS}}
+    problems = []
+    for metric, allowed in slack.items():
+        old, new = baseline.get(metric), result[metric]
+        if old is not None and new > old * (1 + threshold) and new - old > allowed:
+            # A zero baseline (e.g. a timing rounded away) has no relative change
+            change = f'+{(new / old - 1) * 100:.0f}%' if old else 'was zero'
+            problems.append(f'{metric} {old:g} -> {new:g} ({change})')
+    return problems
+
+
+def load_baseline(path):
+    return json.loads(Path(path).read_text())['cases']
+
+
+def write_results(path, results):
+    payload = {
+        'python': platform.python_version(),
+        'matplotlib': importlib.metadata.version('matplotlib'),
+        'machine': platform.platform(),
+        'cases': {result['key']: {k: v for k, v in result.items() if k != 'key'}
+                  for result in results},
+    }
+    Path(path).write_text(json.dumps(payload, indent=2, sort_keys=True) + '\n')
+
+
+def parse_dpis(value):
+    dpis = tuple(int(dpi) for dpi in value.split(',') if dpi.strip())
+    if not dpis or min(dpis) <= 0:
+        raise ValueError(f'Invalid dpi list: {value}')
+    return dpis
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark infographic rendering.')
+    parser.add_argument('variants', nargs='*', metavar='VARIANT',
+                        help=f"variants to benchmark (default: all of {', '.join(BENCH_VARIANTS)})")
+    parser.add_argument('--formats', type=parse_formats, default=('png', 'svg', 'pdf'),
+                        help='comma separated formats (default: png,svg,pdf)')
+    parser.add_argument('--dpi', type=parse_dpis, default=(150, 300, 600),
+                        help='comma separated PNG resolutions (default: 150,300,600)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case; the fastest is reported (default: 3)')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help=f'baseline JSON file (default: {BASELINE.name})')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='write the results as the new baseline instead of comparing')
+    parser.add_argument('--json', metavar='PATH',
+                        help='also write the results to PATH')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed relative regression per metric (default: 0.2)')
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help='timing differences below this many seconds are noise (default: 0.05)')
+    parser.add_argument('--png-encoders', action='store_true',
+                        help='compare PNG encoder settings at the highest --dpi instead')
+    parser.add_argument('--pyramid', type=parse_dpis, metavar='DPIS',
+                        help='only check that png@<dpi> exports for these comma separated '
+                             'resolutions, shared or separate, have savefig\'s pixel size')
+    parser.add_argument('--mermaid', action='store_true',
+                        help='compare the in-process flowchart renderer with mmdc instead')
+    parser.add_argument('--startup-budget', type=float, nargs='?', const=STARTUP_BUDGET,
+                        metavar='SECONDS',
+                        help='only check that every script answers --help within SECONDS '
+                             f'(default: {STARTUP_BUDGET}) without importing matplotlib or NumPy')
+    add_export_arguments(parser)
+    args = parser.parse_args()
+    apply_export_arguments(args)
+
+    if args.startup_budget is not None:
+        failures = check_startup(args.startup_budget, args.repeat)
+        print(f'{failures} of {len(CLI_SCRIPTS)} scripts over the {args.startup_budget}s '
+              f'startup budget')
+        raise SystemExit(1 if failures else 0)
+
+    unknown = set(args.variants) - set(BENCH_VARIANTS)
+    if unknown:
+        parser.error(f"unknown variant(s): {', '.join(sorted(unknown))}")
+    if any('@' in fmt for fmt in args.formats):
+        parser.error('use --dpi for PNG resolutions')
+
+    if args.mermaid:
+        init_worker()
+        results = []
+        failures = 0
+        for result in run_mermaid(args.repeat):
+            results.append(result)
+            errors = [f"{name}: {result[f'{name}_error']}" for name in ('python', 'mmdc')
+                      if f'{name}_error' in result]
+            failures += bool(errors)
+            times = '  '.join(f"{name} {'n/a' if result[name] is None else f'{result[name]:6.3f}s'}"
+                              for name in ('python', 'mmdc'))
+            print(f"{'❌' if errors else '✅'} {result['key']:<48} {times}")
+            for error in errors:
+                print(f'   {error}')
+        if args.json:
+            write_results(args.json, results)
+        print(f'{failures} of {len(results)} diagrams failed to render')
+        raise SystemExit(1 if failures else 0)
+
+    if args.pyramid:
+        init_worker()
+        failures = 0
+        for variant in args.variants or ('clean_cards',):
+            for result in run_pyramid(variant, args.pyramid):
+                failures += not result['ok']
+                level = 'shared' if result['shared'] else 'separate'
+                print(f"{'✅' if result['ok'] else '❌'} {result['key']:<28} {level:<8} "
+                      f"{'x'.join(map(str, result['size'])):>11}  "
+                      f"savefig {'x'.join(map(str, result['expected']))}")
+        print(f'{failures} pyramid levels differ from savefig')
+        raise SystemExit(1 if failures else 0)
+
+    if args.png_encoders:
+        init_worker()
+        results = []
+        larger = 0
+        for variant in args.variants or ('clean_cards',):
+            sizes = {}
+            for result in run_png_encoders(variant, max(args.dpi), args.repeat):
+                results.append(result)
+                label = result['key'].rpartition(':')[2]
+                sizes[label] = result['bytes']
+                print(f"{'  ' if result['lossless'] else '≈ '}{result['key']:<44} "
+                      f"{result['encode']:6.3f}s  {result['bytes'] / 1024:8.1f}KB")
+            if sizes['default'] > sizes['savefig']:
+                larger += 1
+                print(f"❌ {variant}: default encoder writes {sizes['default']} bytes, "
+                      f"savefig {sizes['savefig']}")
+        if args.json:
+            write_results(args.json, results)
+        raise SystemExit(1 if larger else 0)
+
+    baseline = {}
+    if not args.save_baseline and Path(args.baseline).exists():
+        baseline = load_baseline(args.baseline)
+
+    results = []
+    regressions = 0
+    for result in run_benchmarks(args.variants or BENCH_VARIANTS, args.formats,
+                                 args.dpi, args.repeat):
+        results.append(result)
+        problems = compare(result, baseline.get(result['key'], {}),
+                           args.threshold, args.min_delta)
+        regressions += bool(problems)
+        print(f"{'❌' if problems else '✅'} {result['key']:<22} build {result['build']:6.3f}s  "
+              f"draw {result['draw']:6.3f}s  savefig {result['savefig']:6.3f}s  "
+              f"rss {result['peak_rss_mb']:6.1f}MB  {result['bytes'] / 1024:8.1f}KB")
+        for problem in problems:
+            print(f'   {problem}')
+
+    if args.json:
+        write_results(args.json, results)
+    if args.save_baseline:
+        write_results(args.baseline, results)
+        print(f'Baseline written to {args.baseline}')
+    elif not baseline:
+        print(f'No baseline at {args.baseline}; run with --save-baseline to create one')
+    else:
+        print(f'{regressions} of {len(results)} cases regressed beyond {args.threshold:.0%}')
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
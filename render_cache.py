@@ -0,0 +1,203 @@
+"""
+Content-hash cache for rendered figures.
+
+Each output is keyed on a SHA-256 of the figure specification (field lists,
+colours, figsize, savefig options, ...), the output format, the matplotlib
+version and the source of the drawing code: the card engine and every
+repository module it imports, found by reading their import statements.
+When every requested format is already cached the figure is not built at
+all; outputs are copied from ``.render_cache/``.  The cache directory is
+size-capped and pruned in least-recently-used order.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import shutil
+from importlib.metadata import version
+from pathlib import Path
+
+OUTPUT_DIR = Path(__file__).resolve().parent
+CACHE_DIR = OUTPUT_DIR / '.render_cache'
+
+# Module whose import graph holds the drawing and export code shared by every variant
+ENGINE_MODULE = 'card_engine'
+
+# Size cap for the cache directory; override with RENDER_CACHE_MAX_MB
+MAX_CACHE_BYTES = int(os.environ.get('RENDER_CACHE_MAX_MB', '256')) * 1024 * 1024
+
+# True while cached_render runs a forced render
+_forced = False
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+_imports = {}
+
+
+def local_imports(path, deferred=True):
+    """Repository modules imported anywhere in the module at ``path``.
+
+    Imports inside functions count too, since most heavy imports are
+    deferred; with ``deferred=False`` only module-level imports do.
+    """
+    path = Path(path)
+    stamp = (path, path.stat().st_mtime_ns, deferred)
+    if stamp not in _imports:
+        tree = ast.parse(path.read_text(encoding='utf-8'), str(path))
+        names = set()
+        for node in ast.walk(tree) if deferred else tree.body:
+            if isinstance(node, ast.Import):
+                names.update(alias.name.partition('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.add(node.module.partition('.')[0])
+        _imports[stamp] = {name for name in names if (OUTPUT_DIR / f'{name}.py').exists()}
+    return _imports[stamp]
+
+
+def module_sources(module):
+    """Source files of ``module`` and of the repository modules it imports, recursively."""
+    seen, pending = set(), [module]
+    while pending:
+        name = pending.pop()
+        if name not in seen:
+            seen.add(name)
+            pending.extend(local_imports(OUTPUT_DIR / f'{name}.py'))
+    return tuple(sorted(OUTPUT_DIR / f'{name}.py' for name in seen))
+
+
+def import_order(modules):
+    """Repository modules reachable from ``modules``, dependencies first.
+
+    Each module comes after the ones it imports at module level, so reloading
+    them in this order leaves no module holding names from a stale one.
+    """
+    reachable = {path.stem for module in modules for path in module_sources(module)}
+    order = []
+
+    def visit(name, stack):
+        if name in order or name in stack:
+            return
+        for dependency in sorted(local_imports(OUTPUT_DIR / f'{name}.py', deferred=False)
+                                 & reachable):
+            visit(dependency, (*stack, name))
+        order.append(name)
+
+    for name in sorted(reachable):
+        visit(name, ())
+    return tuple(order)
+
+
+def engine_sources():
+    """Every source file on the shared export path (see ``ENGINE_MODULE``)."""
+    return module_sources(ENGINE_MODULE)
+
+
+def spec_key(spec, fmt, sources=()):
+    """Cache key for one output format of ``spec``.
+
+    ``sources`` lists extra files containing drawing code (``engine_sources``
+    are always included), so edits to layout or export logic invalidate the
+    cache as well as edits to the spec itself.
+    """
+    from card_engine import export_options
+
+    payload = {
+        'spec': spec,
+        'format': fmt,
+        'export': export_options(),
+        'matplotlib': version('matplotlib'),
+        'sources': [file_digest(path) for path in (*engine_sources(), *sources)],
+    }
+    blob = json.dumps(payload, sort_keys=True, default=repr).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()
+
+
+def lookup(key, fmt, cache_dir=CACHE_DIR):
+    """Return the cached file for ``key`` (marking it recently used) or None."""
+    path = Path(cache_dir) / f"{key}.{fmt.partition('@')[0]}"
+    if not path.exists():
+        return None
+    os.utime(path)
+    return path
+
+
+def forced():
+    """Whether a forced render is running.
+
+    Caches of intermediate results (card tiles, static layers) are written
+    but not read during one, so ``--force`` rebuilds them as well.
+    """
+    return _forced
+
+
+def store(key, path, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Copy a freshly rendered file into the cache and enforce the size cap."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cached = cache_dir / f'{key}{Path(path).suffix}'
+    tmp = cached.with_suffix(cached.suffix + '.tmp')
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, cached)
+    prune(cache_dir, max_bytes)
+    return cached
+
+
+def prune(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits ``max_bytes``."""
+    entries = [(entry.stat(), entry) for entry in Path(cache_dir).iterdir()
+               if entry.is_file() and not entry.name.endswith('.tmp')]
+    total = sum(stat.st_size for stat, _ in entries)
+    for stat, entry in sorted(entries, key=lambda item: item[0].st_mtime):
+        if total <= max_bytes:
+            break
+        entry.unlink()
+        total -= stat.st_size
+
+
+def cached_render(spec, stem, formats, render, output_dir, force=False, sources=(),
+                  dry_run=False):
+    """Render ``formats`` of ``stem`` through the cache.
+
+    ``render(formats, output_dir)`` is only called for formats whose key is
+    not cached (or for all of them when ``force`` is set, see ``forced``) and
+    must return the written paths in the order of its ``formats`` argument,
+    as this function does for ``formats``.
+    With ``dry_run`` nothing is rendered or copied and only the paths that
+    would be rendered are returned.
+    """
+    from card_engine import output_path
+
+    keys = {fmt: spec_key(spec, fmt, sources) for fmt in formats}
+
+    paths = {}
+    missing = []
+    for fmt in formats:
+        cached = None if force else lookup(keys[fmt], fmt)
+        if cached is None:
+            missing.append(fmt)
+            continue
+        if dry_run:
+            continue
+        path = output_path(stem, fmt, output_dir)
+        shutil.copyfile(cached, path)
+        paths[fmt] = path
+
+    if dry_run:
+        return [output_path(stem, fmt, output_dir) for fmt in missing]
+    if missing:
+        global _forced
+        _forced = force
+        try:
+            rendered = render(tuple(missing), output_dir)
+        finally:
+            _forced = False
+        for fmt, path in zip(missing, rendered, strict=True):
+            store(keys[fmt], path)
+            paths[fmt] = path
+
+    return [paths[fmt] for fmt in formats]
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Long-running render server with matplotlib, fonts and styles kept warm.
+
+``serve`` imports pyplot (Agg), the font cache and every variant once, then
+answers render requests over a Unix socket (or stdin/stdout with
+``--stdin``).  The protocol is one JSON object per line in each direction::
+
+    {"variant": "clean_cards", "formats": ["png", "svg"], "force": false,
+     "output_dir": null, "id": 1}
+    {"id": 1, "name": "clean_cards", "seconds": 0.41, "paths": [...], "error": null}
+
+``{"op": "ping"}`` and ``{"op": "shutdown"}`` are also understood.  Before
+each request the server reloads any repository module (or the field schema)
+whose file changed on disk, so edits are picked up without a restart.
+
+``render`` is the matching client: it sends one request per variant to a
+running server and prints the results.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from card_engine import add_export_arguments, apply_export_arguments, parse_formats
+from render_all import VARIANTS, init_worker, render_variant
+from render_cache import import_order
+
+SOCKET_PATH = Path(os.environ.get('RENDER_DAEMON_SOCKET')
+                   or Path(tempfile.gettempdir()) / f'render_daemon_{os.getuid()}.sock')
+
+
+def local_modules():
+    """Repository modules the variants use, in import order; reloaded together."""
+    return import_order(VARIANTS.values())
+
+
+class ModuleReloader:
+    """Reload the repository modules when their sources or the schema change."""
+
+    def __init__(self):
+        self.mtimes = self.snapshot()
+
+    def watched(self):
+        import field_schema
+
+        files = [Path(sys.modules[name].__file__)
+                 for name in local_modules() if name in sys.modules]
+        return files + [field_schema.SCHEMA_PATH]
+
+    def snapshot(self):
+        return {path: path.stat().st_mtime_ns for path in self.watched() if path.exists()}
+
+    def refresh(self):
+        """Reload everything if anything changed; returns True when it did."""
+        current = self.snapshot()
+        if current == self.mtimes:
+            return False
+        for name in local_modules():
+            if name in sys.modules:
+                module = importlib.reload(sys.modules[name])
+                if name == 'field_schema':
+                    module.load_schema.cache_clear()
+        self.mtimes = self.snapshot()
+        return True
+
+
+def warm_up():
+    """Load pyplot, fonts, styles and every variant module once."""
+    init_worker()
+    from matplotlib import font_manager
+
+    font_manager.findfont(font_manager.FontProperties(family='DejaVu Sans', weight='bold'))
+    for module in VARIANTS.values():
+        importlib.import_module(module)
+    return ModuleReloader()
+
+
+def handle(request, reloader):
+    """Answer one decoded request; returns the response dict."""
+    if not isinstance(request, dict):
+        return {'error': 'request must be a JSON object'}
+    op = request.get('op', 'render')
+    if op == 'ping':
+        return {'id': request.get('id'), 'ok': True}
+    if op == 'shutdown':
+        return {'id': request.get('id'), 'ok': True, 'shutdown': True}
+    if op != 'render':
+        return {'id': request.get('id'), 'error': f'unknown op: {op}'}
+
+    name = request.get('variant')
+    if name not in VARIANTS:
+        return {'id': request.get('id'), 'name': name, 'error': f'unknown variant: {name}'}
+    try:
+        formats = parse_formats(','.join(request['formats'])) if request.get('formats') else None
+    except ValueError as e:
+        return {'id': request.get('id'), 'name': name, 'error': str(e)}
+
+    reloaded = reloader.refresh()
+    result = render_variant(name, request.get('output_dir'), request.get('force', False),
+                            formats)
+    return {'id': request.get('id'), 'reloaded': reloaded, **result}
+
+
+def serve_lines(lines, write, reloader):
+    """Process JSON request lines until EOF or a shutdown request.
+
+    A request that fails gets an error reply; the loop keeps serving.
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            response = handle(json.loads(line), reloader)
+        except json.JSONDecodeError as e:
+            response = {'error': f'invalid request: {e}'}
+        except Exception as e:
+            response = {'error': f'{type(e).__name__}: {e}'.strip()}
+        write(json.dumps(response) + '\n')
+        if response.get('shutdown'):
+            return True
+    return False
+
+
+class RenderServer(socketserver.UnixStreamServer):
+    """Serves one connection at a time; matplotlib is not thread-safe."""
+
+    def __init__(self, path, reloader):
+        self.reloader = reloader
+        super().__init__(str(path), RenderHandler)
+
+
+class RenderHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        lines = (raw.decode() for raw in self.rfile)
+
+        def write(text):
+            self.wfile.write(text.encode())
+            self.wfile.flush()
+
+        if serve_lines(lines, write, self.server.reloader):
+            # shutdown() waits for serve_forever to return, so call it off-thread
+            threading.Thread(target=self.server.shutdown).start()
+
+
+def serve(path=SOCKET_PATH):
+    """Run the socket server until a shutdown request arrives."""
+    reloader = warm_up()
+    path = Path(path)
+    if path.exists():
+        path.unlink()
+    with RenderServer(path, reloader) as server:
+        print(f'Render daemon listening on {path}', file=sys.stderr)
+        try:
+            server.serve_forever()
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def request(payloads, path=SOCKET_PATH):
+    """Send request dicts to a running server; yields the response dicts."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        with sock.makefile('rw') as stream:
+            for payload in payloads:
+                stream.write(json.dumps(payload) + '\n')
+                stream.flush()
+                yield json.loads(stream.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Warm render server and client.')
+    parser.add_argument('--socket', default=SOCKET_PATH,
+                        help=f'Unix socket path (default: {SOCKET_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='run the render server')
+    serve_parser.add_argument('--stdin', action='store_true',
+                              help='read requests from stdin and answer on stdout')
+    add_export_arguments(serve_parser)
+
+    render_parser = commands.add_parser('render', help='ask a running server to render')
+    render_parser.add_argument('variants', nargs='*', metavar='VARIANT',
+                               help=f"variants to render (default: all of {', '.join(VARIANTS)})")
+    render_parser.add_argument('--formats', type=parse_formats, default=None,
+                               help='comma separated output formats')
+    render_parser.add_argument('-o', '--output-dir', default=None,
+                               help='directory for rendered files (default: repository root)')
+    render_parser.add_argument('--force', action='store_true',
+                               help='ignore the render cache')
+    render_parser.add_argument('--stop', action='store_true',
+                               help='shut the server down after rendering')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        apply_export_arguments(args)
+        if args.stdin:
+            def write(text):
+                sys.stdout.write(text)
+                sys.stdout.flush()
+            serve_lines(sys.stdin, write, warm_up())
+        else:
+            serve(args.socket)
+        return
+
+    unknown = set(args.variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"unknown variant(s): {', '.join(sorted(unknown))}")
+    output_dir = str(Path(args.output_dir).resolve()) if args.output_dir else None
+    payloads = [{'id': index, 'variant': name, 'formats': args.formats,
+                 'output_dir': output_dir, 'force': args.force}
+                for index, name in enumerate(args.variants or VARIANTS)]
+    if args.stop:
+        payloads.append({'op': 'shutdown'})
+
+    start = time.perf_counter()
+    failures = 0
+    try:
+        for response in request(payloads, args.socket):
+            if 'name' not in response:
+                continue
+            if response['error']:
+                failures += 1
+                print(f"❌ {response['name']:<12} {response.get('seconds', 0):7.3f}s  "
+                      f"{response['error']}")
+            else:
+                outputs = ', '.join(os.path.basename(path) for path in response['paths'])
+                print(f"✅ {response['name']:<12} {response['seconds']:7.3f}s  {outputs}")
+    except (FileNotFoundError, ConnectionRefusedError):
+        parser.exit(1, f'No render daemon at {args.socket}; start one with '
+                       f'`{parser.prog} serve`\n')
+    print(f'Round trip {time.perf_counter() - start:.3f}s')
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
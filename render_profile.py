@@ -0,0 +1,175 @@
+"""
+Opt-in per-phase profiling for the infographic renderers.
+
+Set ``RENDER_PROFILE`` to a directory (or pass ``--profile DIR`` to any
+render script) and every export writes ``<DIR>/<name>.json`` with:
+
+* ``phases`` - wall time of the phases the renderers mark with ``phase()``
+  (figure construction and one entry per exported format);
+* ``hooks`` - inclusive time and call count of the matplotlib hot spots
+  (text layout, text/patch/collection/image drawing, the tight-bbox pass,
+  PNG encoding), gathered by temporarily wrapping those methods;
+* ``artists`` - artist counts by type.
+
+``RENDER_PROFILE_CPROFILE=1`` (``--cprofile``) additionally dumps a cProfile
+``<DIR>/<name>.prof``.  Profiling is off unless requested, and a render cache
+hit does no work to profile, so combine it with ``--force``.
+"""
+
+import cProfile
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+_active = None
+
+
+def profile_dir():
+    """Report directory from ``RENDER_PROFILE``, or ``None`` when disabled."""
+    value = os.environ.get('RENDER_PROFILE')
+    return Path(value) if value else None
+
+
+def _hook_targets():
+    """(label, owner, attribute) for every method timed while profiling."""
+    import matplotlib.image
+    from matplotlib.collections import Collection
+    from matplotlib.figure import Figure
+    from matplotlib.image import _ImageBase
+    from matplotlib.patches import Patch
+    from matplotlib.text import Text
+
+    import png_writer
+    from png_writer import PNGStreamWriter
+
+    return [
+        ('text_layout', Text, '_get_layout'),
+        ('text_draw', Text, 'draw'),
+        ('patch_draw', Patch, 'draw'),
+        ('collection_draw', Collection, 'draw'),
+        ('image_draw', _ImageBase, 'draw'),
+        ('figure_draw', Figure, 'draw'),
+        ('tight_bbox', Figure, 'get_tightbbox'),
+        ('png_encode', matplotlib.image, 'imsave'),
+        ('png_encode', PNGStreamWriter, 'write_rows'),
+        ('png_encode', png_writer, 'quantize'),
+    ]
+
+
+class RenderProfile:
+    """Timings collected for one render; see the module docstring."""
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = defaultdict(float)
+        self.hooks = defaultdict(lambda: {'seconds': 0.0, 'calls': 0})
+        self.artists = Counter()
+
+    @contextmanager
+    def phase(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[label] += time.perf_counter() - start
+
+    def count_artists(self, fig):
+        self.artists.update(type(artist).__name__ for artist in fig.findobj())
+
+    def _timed(self, label, method):
+        hook = self.hooks[label]
+        depth = [0]
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            # Only the outermost call counts towards the time of re-entrant methods
+            depth[0] += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+                hook['calls'] += 1
+                if not depth[0]:
+                    hook['seconds'] += time.perf_counter() - start
+        return wrapper
+
+    @contextmanager
+    def hooked(self):
+        """Wrap the hot matplotlib methods for the duration of the block."""
+        originals = []
+        try:
+            for label, owner, attr in _hook_targets():
+                # Inherited methods are shadowed on ``owner`` and removed again afterwards
+                own = owner.__dict__.get(attr)
+                originals.append((owner, attr, own))
+                setattr(owner, attr, self._timed(label, getattr(owner, attr)))
+            yield
+        finally:
+            for owner, attr, own in reversed(originals):
+                if own is None:
+                    delattr(owner, attr)
+                else:
+                    setattr(owner, attr, own)
+
+    def report(self, seconds):
+        return {
+            'name': self.name,
+            'seconds': seconds,
+            'phases': dict(self.phases),
+            'hooks': dict(sorted(self.hooks.items())),
+            'artists': dict(self.artists.most_common()),
+            'total_artists': sum(self.artists.values()),
+        }
+
+
+class _NullProfile:
+    """Stand-in used when profiling is disabled."""
+
+    @contextmanager
+    def phase(self, label):
+        yield
+
+    def count_artists(self, fig):
+        pass
+
+
+@contextmanager
+def profile_render(name):
+    """Profile one render when ``RENDER_PROFILE`` is set; yields the profile."""
+    global _active
+    directory = profile_dir()
+    if directory is None or _active is not None:
+        yield _active or _NullProfile()
+        return
+
+    directory.mkdir(parents=True, exist_ok=True)
+    profile = RenderProfile(name)
+    profiler = cProfile.Profile() if os.environ.get('RENDER_PROFILE_CPROFILE') else None
+    _active = profile
+    start = time.perf_counter()
+    try:
+        with profile.hooked():
+            if profiler:
+                profiler.enable()
+            try:
+                yield profile
+            finally:
+                if profiler:
+                    profiler.disable()
+    finally:
+        _active = None
+
+    report = profile.report(time.perf_counter() - start)
+    (directory / f'{name}.json').write_text(json.dumps(report, indent=2) + '\n')
+    if profiler:
+        profiler.dump_stats(directory / f'{name}.prof')
+
+
+def phase(label):
+    """Time a block against the active profile, if any."""
+    return (_active or _NullProfile()).phase(label)
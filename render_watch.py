@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Watch the sources and re-render only the assets a save affects.
+
+Each variant's dependencies are read from the import statements of its
+module and of the repository modules it pulls in (including the imports
+made inside functions), so editing ``raster_export.py`` rebuilds every
+matplotlib variant, editing ``create_17_fields_modern.py`` rebuilds only
+``modern`` and editing ``field_schema.json`` rebuilds the variants that draw
+the schema.  ``.mmd`` files in ``presentation_diagrams/mermaid_exports`` map
+to the ``mermaid_exports`` batch, which re-renders only the changed diagrams.
+
+Changes arrive through Linux inotify (called through ctypes, so no extra
+package is needed) or, elsewhere, by polling modification times.  A burst
+of events, such as an editor writing a backup and then the file, is
+gathered until ``--debounce`` seconds pass quietly; saves that leave a file's
+contents unchanged are ignored.  Rebuilds run on a pool of workers that keep
+matplotlib, the fonts and every module loaded and reload the modules whose
+files changed, and each rebuild reports its latency from the first save.
+"""
+
+import argparse
+import importlib
+import os
+import select
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from card_engine import add_export_arguments, apply_export_arguments, parse_formats
+from field_schema import SCHEMA_PATH
+from mermaid_render import MERMAID_EXPORTS
+from render_all import VARIANTS, render_variant
+from render_cache import engine_sources, file_digest, module_sources
+
+REPO_DIR = Path(__file__).resolve().parent
+
+# Target that re-renders the changed .mmd files in MERMAID_EXPORTS
+MERMAID_TARGET = 'mermaid_exports'
+TARGETS = (*VARIANTS, MERMAID_TARGET)
+TARGET_MODULES = {**VARIANTS, MERMAID_TARGET: 'generate_vlm_diagram'}
+
+
+DEBOUNCE_SECONDS = 0.2
+POLL_SECONDS = 0.25
+
+# inotify(7) event bits
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def cache_keyed():
+    """Sources already part of a variant's render-cache key.
+
+    Other changes force a re-render.
+    """
+    return frozenset((*engine_sources(), SCHEMA_PATH, REPO_DIR / 'field_schema.py'))
+
+
+def dependency_map(targets=TARGETS):
+    """Map each source file to the targets whose output depends on it."""
+    dependents = {}
+    for target in targets:
+        sources = list(module_sources(TARGET_MODULES[target]))
+        if REPO_DIR / 'field_schema.py' in sources:
+            sources.append(SCHEMA_PATH)
+        if target == MERMAID_TARGET:
+            sources.extend(sorted(MERMAID_EXPORTS.glob('*.mmd')))
+        for source in sources:
+            dependents.setdefault(source, set()).add(target)
+    return dependents
+
+
+def affected_targets(paths, dependents, targets=TARGETS):
+    """Group changed ``paths`` by the target they affect: {target: {path, ...}}."""
+    affected = {}
+    for path in paths:
+        names = set(dependents.get(path, ()))
+        if path.suffix == '.mmd' and path.parent == MERMAID_EXPORTS and MERMAID_TARGET in targets:
+            names.add(MERMAID_TARGET)
+        for name in names:
+            affected.setdefault(name, set()).add(path)
+    return affected
+
+
+class InotifyWatcher:
+    """Report files written or moved into a set of directories (Linux only)."""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO
+
+    def __init__(self, directories):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}
+        for directory in directories:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f'cannot watch {directory}')
+            self.directories[wd] = Path(directory)
+
+    def changes(self, timeout=None):
+        """Paths changed within ``timeout`` seconds (``None`` waits for one)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 1 << 16)
+        paths = set()
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if name and wd in self.directories:
+                paths.add(self.directories[wd] / os.fsdecode(name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Report files whose modification time changed, by rescanning directories."""
+
+    def __init__(self, directories, interval=POLL_SECONDS):
+        self.directories = [Path(directory) for directory in directories]
+        self.interval = interval
+        self.mtimes = self.snapshot()
+
+    def snapshot(self):
+        return {path: path.stat().st_mtime_ns for directory in self.directories
+                for path in directory.iterdir() if path.is_file()}
+
+    def changes(self, timeout=None):
+        """Paths changed within ``timeout`` seconds (``None`` waits for one)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self.snapshot()
+            changed = {path for path, mtime in current.items() if self.mtimes.get(path) != mtime}
+            self.mtimes = current
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if changed or (remaining is not None and remaining <= 0):
+                return changed
+            time.sleep(self.interval if remaining is None else min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def open_watcher(directories, poll=False):
+    """An inotify watcher where available, otherwise a polling one."""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(directories)
+
+
+def next_burst(watcher, debounce=DEBOUNCE_SECONDS):
+    """Wait for a change and gather the burst it starts.
+
+    Returns the changed paths and the ``perf_counter`` time of the first event.
+    """
+    paths = set()
+    while not paths:
+        paths = watcher.changes()
+    first = time.perf_counter()
+    while True:
+        more = watcher.changes(debounce)
+        if not more:
+            return paths, first
+        paths |= more
+
+
+_reloader = None
+
+
+def init_watch_worker():
+    """Warm a worker and load every repository module so edits can be reloaded."""
+    global _reloader
+    from render_daemon import ModuleReloader, local_modules, warm_up
+
+    warm_up()
+    for name in local_modules():
+        importlib.import_module(name)
+    _reloader = ModuleReloader()
+
+
+def rebuild(target, output_dir=None, force=False, formats=None):
+    """Render one target after reloading changed modules; returns a result dict."""
+    _reloader.refresh()
+    if target != MERMAID_TARGET:
+        return render_variant(target, output_dir, force, formats)
+
+    start = time.perf_counter()
+    try:
+        import generate_vlm_diagram
+
+        results = generate_vlm_diagram.render_directory(MERMAID_EXPORTS, force=force)
+        failed = [result for result in results if not result.ok]
+        error = f'{failed[0].job.source.name}: {failed[0].error}' if failed else None
+        paths = [str(result.job.output) for result in results if result.method != 'manifest']
+    except Exception as e:
+        paths = []
+        error = f'{type(e).__name__}: {e}'.strip()
+    return {
+        'name': target,
+        'seconds': time.perf_counter() - start,
+        'paths': paths,
+        'error': error,
+    }
+
+
+def watch(targets=TARGETS, output_dir=None, formats=None, jobs=None,
+          debounce=DEBOUNCE_SECONDS, poll=False):
+    """Re-render the affected targets after every burst of saves, until interrupted."""
+    jobs = jobs or os.cpu_count() or 1
+    dependents = dependency_map(targets)
+    digests = {path: file_digest(path) for path in dependents if path.exists()}
+    watcher = open_watcher(sorted({path.parent for path in dependents} | {MERMAID_EXPORTS}),
+                           poll)
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=init_watch_worker)
+    try:
+        # Start every worker now so the first rebuild does not pay for warm-up
+        for future in [pool.submit(time.sleep, 0.1) for _ in range(jobs)]:
+            future.result()
+        print(f'Watching {len(dependents)} sources for {len(targets)} targets '
+              f'({type(watcher).__name__}, {jobs} warm workers); Ctrl-C to stop')
+
+        builds = 0
+        while True:
+            paths, first = next_burst(watcher, debounce)
+            changed = set()
+            for path in paths:
+                digest = file_digest(path) if path.is_file() else None
+                if digest != digests.get(path):
+                    digests[path] = digest
+                    changed.add(path)
+            if not changed:
+                continue
+            if any(path.suffix == '.py' for path in changed):
+                # Imports may have changed too
+                dependents = dependency_map(targets)
+            affected = affected_targets(changed, dependents, targets)
+            if not affected:
+                continue
+
+            builds += 1
+            names = ', '.join(sorted(path.name for path in changed))
+            print(f'[{builds}] {names} changed -> {", ".join(sorted(affected))}')
+            futures = []
+            keyed = cache_keyed()
+            for target, sources in sorted(affected.items()):
+                own = REPO_DIR / f'{TARGET_MODULES[target]}.py'
+                force = any(path not in keyed and path != own and path.suffix != '.mmd'
+                            for path in sources)
+                futures.append(pool.submit(rebuild, target, output_dir, force, formats))
+            failures = 0
+            for future in as_completed(futures):
+                result = future.result()
+                if result['error']:
+                    failures += 1
+                    print(f"❌ {result['name']:<15} {result['seconds']:7.3f}s  {result['error']}")
+                else:
+                    outputs = ', '.join(os.path.basename(path) for path in result['paths'])
+                    print(f"✅ {result['name']:<15} {result['seconds']:7.3f}s  "
+                          f"{outputs or 'up to date'}")
+            print(f'[{builds}] Rebuilt {len(futures) - failures}/{len(futures)} targets '
+                  f'{time.perf_counter() - first:.3f}s after the first save')
+    finally:
+        watcher.close()
+        pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-render the assets affected by each save.')
+    parser.add_argument('targets', nargs='*', metavar='TARGET',
+                        help=f"targets to keep up to date (default: all of {', '.join(TARGETS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='warm worker processes (default: one per core)')
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help='directory for rendered files (default: repository root)')
+    parser.add_argument('--formats', type=parse_formats, default=None,
+                        help='comma separated output formats')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE_SECONDS,
+                        help='seconds without events that end a burst of saves '
+                             f'(default: {DEBOUNCE_SECONDS})')
+    parser.add_argument('--poll', action='store_true',
+                        help='poll modification times instead of using inotify')
+    add_export_arguments(parser)
+    args = parser.parse_args()
+    apply_export_arguments(args)
+
+    unknown = set(args.targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(sorted(unknown))}")
+    output_dir = str(Path(args.output_dir).resolve()) if args.output_dir else None
+
+    try:
+        watch(tuple(args.targets) or TARGETS, output_dir, args.formats, args.jobs,
+              args.debounce, args.poll)
+    except KeyboardInterrupt:
+        print('Stopped watching')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Static/dynamic layer split for PNG exports.
+
+Text is the dynamic layer: it is what changes when a field list is edited.
+The rest of a figure (the gradient image of the modern variant, card
+shadows and frames, title bars, summary boxes) is static, unless it
+overlaps text drawn beneath it, in which case it moves to the dynamic layer
+to keep the stacking order.
+
+``export_png_layered`` rasterises the static layer once per (content,
+canvas, dpi) and keeps it in the render cache as a ``.npy`` RGBA array,
+which later exports memory-map.  Each export then only draws the dynamic
+layer on a transparent canvas and alpha-composites it over a copy of the
+static one.  The static layer is keyed by a fingerprint of its artists
+(display geometry, colours, image data), so moving a card or changing a
+colour rebuilds it, while text edits reuse it.
+"""
+
+import hashlib
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from matplotlib.collections import Collection
+from matplotlib.image import AxesImage
+from matplotlib.patches import Patch
+from matplotlib.text import Text
+
+from png_writer import write_png
+from raster_export import alpha_over, hide, measure_bbox, render_region, window_extent
+from render_cache import forced, lookup, spec_key, store
+from render_profile import phase
+
+# Rows composited at a time; each band is cropped to the columns its text covers
+COMPOSITE_ROWS = 128
+
+
+def _bytes(array):
+    return np.ascontiguousarray(array).tobytes()
+
+
+def fingerprint(artist):
+    """Digest of everything that decides how ``artist`` draws.
+
+    Returns None for artists that cannot be described this way (text, axis
+    decorations, ...); those always belong to the dynamic layer.
+    """
+    if isinstance(artist, Text):
+        return None
+    transform = artist.get_transform()
+    parts = [type(artist).__name__, artist.get_zorder(), artist.get_alpha(),
+             artist.get_clip_on(), getattr(artist.get_clip_box(), 'bounds', None)]
+    if isinstance(artist, AxesImage):
+        x0, x1, y0, y1 = artist.get_extent()
+        parts += [_bytes(np.ma.getdata(artist.get_array())), artist.get_array().shape,
+                  _bytes(transform.transform([(x0, y0), (x1, y1)])), artist.get_cmap().name,
+                  artist.norm.vmin, artist.norm.vmax, artist.get_interpolation()]
+    elif isinstance(artist, Patch):
+        path = transform.transform_path(artist.get_path())
+        parts += [_bytes(path.vertices), None if path.codes is None else _bytes(path.codes),
+                  artist.get_facecolor(), artist.get_edgecolor(), artist.get_linewidth(),
+                  artist.get_linestyle(), artist.get_hatch()]
+    elif isinstance(artist, Collection):
+        parts += [_bytes(transform.transform_path(path).vertices) for path in artist.get_paths()]
+        parts += [_bytes(artist.get_offsets()), _bytes(artist.get_facecolor()),
+                  _bytes(artist.get_edgecolor()), _bytes(artist.get_linewidth()),
+                  artist.get_hatch()]
+    else:
+        return None
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _draw_order(fig):
+    """Drawn artists of ``fig`` in the order matplotlib draws them."""
+    top = sorted([*fig.patches, *fig.lines, *fig.images, *fig.texts, *fig.axes],
+                 key=lambda artist: artist.get_zorder())
+    ordered = []
+    for artist in top:
+        if artist not in fig.axes:
+            ordered.append(artist)
+            continue
+        # The axes patch is drawn first and made transparent for the text pass
+        children = [child for child in artist.get_children() if child is not artist.patch]
+        if not artist.axison:
+            children = [child for child in children
+                        if child not in (*artist.spines.values(), artist.xaxis, artist.yaxis)]
+        ordered.extend(sorted(children, key=lambda child: child.get_zorder()))
+    return [artist for artist in ordered if artist.get_visible()
+            and not (isinstance(artist, Text) and not artist.get_text())]
+
+
+def split_layers(fig):
+    """Split the drawn artists into ``(static, dynamic)`` lists.
+
+    An artist is static when it has a fingerprint and no dynamic artist drawn
+    before it overlaps it on the canvas.
+    """
+    ordered = _draw_order(fig)
+    dynamic = {artist for artist in ordered if fingerprint(artist) is None}
+    renderer = fig.canvas.get_renderer()
+    extents = {artist: window_extent(artist, renderer, fig.dpi) for artist in ordered}
+    changed = True
+    while changed:
+        changed = False
+        for index, artist in enumerate(ordered):
+            if artist in dynamic:
+                continue
+            if any(below in dynamic and extents[below].overlaps(extents[artist])
+                   for below in ordered[:index]):
+                dynamic.add(artist)
+                changed = True
+    return ([artist for artist in ordered if artist not in dynamic],
+            [artist for artist in ordered if artist in dynamic])
+
+
+def static_key(static, canvas, dpi, savefig_kwargs):
+    """Cache key of the static layer drawn from ``static`` on ``canvas``."""
+    spec = {
+        'artists': [fingerprint(artist) for artist in static],
+        'canvas': canvas,
+        'savefig': savefig_kwargs,
+    }
+    return spec_key(spec, f'npy@{dpi}', sources=(__file__,))
+
+
+def composite_text(image, text, band=COMPOSITE_ROWS):
+    """Alpha-composite the ``text`` layer over ``image`` in place.
+
+    Text covers a small part of the canvas, so only the covered columns of
+    each band of rows are blended.
+    """
+    for top in range(0, text.shape[0], band):
+        columns = np.flatnonzero(text[top:top + band, :, 3].any(axis=0))
+        if columns.size:
+            left = columns[0]
+            alpha_over(image, text[top:top + band, left:columns[-1] + 1], top, left)
+    return image
+
+
+def _store_layer(key, rgba):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'layer.npy'
+        np.save(path, rgba)
+        store(key, path)
+
+
+def export_png_layered(fig, path, dpi, pad_inches=0.1, png=None, **savefig_kwargs):
+    """Write ``fig`` as a PNG composited from its cached static layer and its text.
+
+    ``png`` holds ``png_writer`` encoder options for the final image.
+    """
+    savefig_kwargs.pop('bbox_inches', None)
+    savefig_kwargs.pop('format', None)
+    savefig_kwargs.pop('dpi', None)
+
+    bbox = measure_bbox(fig, pad_inches, dpi)
+    canvas = (bbox.x0, bbox.y0, int(bbox.width * dpi), int(bbox.height * dpi))
+    static, dynamic = split_layers(fig)
+    key = static_key(static, canvas, dpi, savefig_kwargs)
+    cached = None if forced() else lookup(key, f'npy@{dpi}')
+    try:
+        if cached is None:
+            with phase('static_layers:static'):
+                hide(dynamic)
+                image = render_region(fig, canvas, dpi, 0, 0, canvas[2], canvas[3],
+                                       **savefig_kwargs)
+                _store_layer(key, image)
+            for artist in dynamic:
+                artist.set_visible(True)
+        else:
+            with phase('static_layers:load'):
+                image = np.load(cached, mmap_mode='c')
+        with phase('static_layers:dynamic'):
+            hide(static)
+            text = render_region(fig, canvas, dpi, 0, 0, canvas[2], canvas[3],
+                                  transparent=True)
+    finally:
+        for artist in (*static, *dynamic):
+            artist.set_visible(True)
+
+    with phase('static_layers:composite'):
+        composite_text(image, text)
+        write_png(path, image, dpi, **(png or {}))
+    return path
@@ -0,0 +1,331 @@
+"""
+Size optimisation pass for matplotlib SVG output.
+
+``optimize_svg`` rewrites an SVG document written by savefig:
+
+* path data, positions and translations are rounded to ``precision``
+  decimals and written without the one-command-per-line layout;
+* paths that repeat up to a translation (collection bullets, badges) are
+  defined once in ``<defs>`` and placed with ``<use>``, the way matplotlib
+  already shares glyph outlines;
+* style declarations that restate an inherited, initial or stylesheet value
+  are dropped, as are rectangular clip paths that cannot clip anything;
+* comments and indentation are removed.
+
+Scale, rotation and matrix transforms keep six significant digits, so
+rounding error stays below ``0.5 * 10**-precision`` user units before any
+ancestor scaling.
+"""
+
+import io
+import re
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+NAMESPACES = {
+    '': SVG_NS,
+    'xlink': XLINK_NS,
+    'dc': 'http://purl.org/dc/elements/1.1/',
+    'cc': 'http://creativecommons.org/ns#',
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+}
+HREF = f'{{{XLINK_NS}}}href'
+
+DEFAULT_PRECISION = 2
+
+# Initial values of the presentation properties matplotlib writes
+INITIAL_STYLE = {
+    'fill': '#000000', 'fill-opacity': '1', 'stroke': 'none', 'stroke-width': '1',
+    'stroke-opacity': '1', 'stroke-linejoin': 'miter', 'stroke-linecap': 'butt',
+    'stroke-miterlimit': '4', 'stroke-dasharray': 'none', 'stroke-dashoffset': '0',
+    'opacity': '1',
+}
+INHERITED = frozenset(INITIAL_STYLE) - {'opacity'}
+
+# Repeated paths shorter than this are cheaper inline than as a <use>
+MIN_SHARED_PATH = 48
+
+_PATH_TOKEN = re.compile(r'[A-Za-z]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_TRANSFORM = re.compile(r'(\w+)\(([^)]*)\)')
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def _tag(element):
+    return element.tag.rpartition('}')[2]
+
+
+def format_number(value, precision):
+    """Shortest decimal form of ``value`` rounded to ``precision`` places."""
+    text = f'{round(value, precision):.{precision}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text in ('-0', ''):
+        return '0'
+    if text.startswith('0.'):
+        return text[1:]
+    if text.startswith('-0.'):
+        return '-' + text[2:]
+    return text
+
+
+def parse_path(d):
+    """Split path data into ``(command, [numbers])`` segments."""
+    segments = []
+    for token in _PATH_TOKEN.findall(d):
+        if token.isalpha():
+            segments.append((token, []))
+        else:
+            segments[-1][1].append(float(token))
+    return segments
+
+
+def format_path(segments, precision, offset=(0.0, 0.0)):
+    """Serialise absolute path ``segments``, shifted by ``-offset``."""
+    parts = []
+    for command, numbers in segments:
+        shifted = [value - offset[index % 2] for index, value in enumerate(numbers)]
+        parts.append(command + ' '.join(format_number(value, precision) for value in shifted))
+    return ''.join(parts)
+
+
+def _absolute_pairs(segments):
+    """True when every command takes absolute x, y pairs (matplotlib's M/L/Q/C/z)."""
+    return all(command in 'MLQCZz' and len(numbers) % 2 == 0 for command, numbers in segments)
+
+
+def _path_bounds(segments):
+    """Bounds of all points, which contain the curve (control points included)."""
+    xs = [value for _, numbers in segments for value in numbers[0::2]]
+    ys = [value for _, numbers in segments for value in numbers[1::2]]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def format_transform(transform, precision):
+    """Round translations to ``precision`` and other transforms to 6 digits."""
+    def replace(match):
+        name, args = match.groups()
+        values = [float(value) for value in _NUMBER.findall(args)]
+        if name == 'translate':
+            text = ' '.join(format_number(value, precision) for value in values)
+        else:
+            text = ' '.join(f'{value:.6g}' for value in values)
+        return f'{name}({text})'
+
+    return _TRANSFORM.sub(replace, transform)
+
+
+def parse_style(style):
+    declarations = {}
+    for declaration in style.split(';'):
+        name, _, value = declaration.partition(':')
+        if name.strip():
+            declarations[name.strip()] = value.strip()
+    return declarations
+
+
+def _format_style(declarations):
+    return '; '.join(f'{name}: {value}' for name, value in declarations.items())
+
+
+def _stylesheet_defaults(root):
+    """Declarations of matplotlib's ``*{...}`` rule, which apply to every element."""
+    defaults = {}
+    for style in root.iter(f'{{{SVG_NS}}}style'):
+        for body in re.findall(r'\*\s*\{([^}]*)\}', style.text or ''):
+            defaults.update(parse_style(body))
+    return defaults
+
+
+def _strip_styles(element, inherited, stylesheet):
+    """Drop declarations that do not change the computed style, recursively."""
+    # Content of <defs>, <clipPath> and the like is styled where it is used
+    if _tag(element) in ('defs', 'clipPath', 'mask', 'marker', 'pattern', 'metadata'):
+        return
+    computed = {name: value for name, value in inherited.items() if name in INHERITED}
+    style = element.get('style')
+    if style is not None:
+        kept = {}
+        for name, value in parse_style(style).items():
+            if name in stylesheet:
+                redundant = value == stylesheet[name]
+            elif name in INHERITED:
+                redundant = value == computed.get(name, INITIAL_STYLE[name])
+            else:
+                redundant = value == INITIAL_STYLE.get(name)
+            if not redundant:
+                kept[name] = value
+            computed[name] = value
+        if kept:
+            element.set('style', _format_style(kept))
+        else:
+            del element.attrib['style']
+    for child in element:
+        _strip_styles(child, computed, stylesheet)
+
+
+def _clip_rects(root):
+    """Map clipPath ids that hold a single untransformed rect to its bounds."""
+    rects = {}
+    for clip in root.iter(f'{{{SVG_NS}}}clipPath'):
+        children = list(clip)
+        if len(children) != 1 or _tag(children[0]) != 'rect' or 'transform' in children[0].attrib:
+            continue
+        rect = children[0]
+        x, y = float(rect.get('x', 0)), float(rect.get('y', 0))
+        rects[f"url(#{clip.get('id')})"] = (x, y, x + float(rect.get('width')),
+                                            y + float(rect.get('height')))
+    return rects
+
+
+def _stroke_margin(element):
+    """How far the painted stroke can extend beyond the path's points."""
+    style = parse_style(element.get('style', ''))
+    if style.get('stroke', 'none') == 'none':
+        return 0.0
+    width = float(style.get('stroke-width', 1))
+    if style.get('stroke-linejoin', 'round') == 'miter':
+        return width * float(style.get('stroke-miterlimit', 4)) / 2
+    return width / 2
+
+
+def optimize_tree(root, precision=DEFAULT_PRECISION):
+    """Optimise a parsed matplotlib SVG in place; see the module docstring."""
+    stylesheet = _stylesheet_defaults(root)
+    _strip_styles(root, {}, stylesheet)
+    clip_rects = _clip_rects(root)
+    parents = {child: parent for parent in root.iter() for child in parent}
+
+    shared = defaultdict(list)
+    for element in list(root.iter(f'{{{SVG_NS}}}path')):
+        d = element.get('d')
+        if d is None:
+            continue
+        segments = parse_path(d)
+        if not segments or not _absolute_pairs(segments):
+            element.set('d', format_path(segments, precision) if segments else '')
+            continue
+
+        clip = element.get('clip-path')
+        if clip in clip_rects:
+            left, top, right, bottom = _path_bounds(segments)
+            margin = _stroke_margin(element)
+            x0, y0, x1, y1 = clip_rects[clip]
+            if (left - margin >= x0 and top - margin >= y0
+                    and right + margin <= x1 and bottom + margin <= y1):
+                del element.attrib['clip-path']
+
+        inside_defs = any(_tag(ancestor) in ('defs', 'clipPath')
+                          for ancestor in _ancestors(element, parents))
+        if inside_defs or 'id' in element.attrib or 'clip-path' in element.attrib \
+                or not segments[0][1]:
+            element.set('d', format_path(segments, precision))
+            continue
+        # Rounding the origin first keeps every point within the precision
+        origin = tuple(float(format_number(value, precision)) for value in segments[0][1][:2])
+        # The stylesheet also matches the shared path, which would override
+        # those properties inherited from the <use>, so they stay on the path
+        own = tuple((name, value) for name, value in parse_style(element.get('style', '')).items()
+                    if name in stylesheet)
+        shared[format_path(segments, precision, origin), own].append((element, origin, segments))
+
+    defs = root.find(f'{{{SVG_NS}}}defs')
+    if defs is None:
+        defs = ET.Element(f'{{{SVG_NS}}}defs')
+        root.insert(0, defs)
+    shape_ids = 0
+    for (shape, own), uses in shared.items():
+        if len(uses) == 1 or len(shape) < MIN_SHARED_PATH:
+            for element, _, segments in uses:
+                element.set('d', format_path(segments, precision))
+            continue
+        shape_id = f'shape-{shape_ids}'
+        shape_ids += 1
+        definition = ET.SubElement(defs, f'{{{SVG_NS}}}path', {'id': shape_id, 'd': shape})
+        if own:
+            definition.set('style', _format_style(dict(own)))
+        for element, (x, y), _ in uses:
+            attributes = {key: value for key, value in element.attrib.items() if key != 'd'}
+            style = {name: value for name, value in parse_style(attributes.pop('style', '')).items()
+                     if name not in stylesheet}
+            if style:
+                attributes['style'] = _format_style(style)
+            element.clear()
+            element.tag = f'{{{SVG_NS}}}use'
+            element.attrib.update({HREF: f'#{shape_id}', **attributes})
+            if x:
+                element.set('x', format_number(x, precision))
+            if y:
+                element.set('y', format_number(y, precision))
+
+    for element in root.iter():
+        if _tag(element) == 'use':
+            _translate_to_position(element)
+        if 'transform' in element.attrib:
+            element.set('transform', format_transform(element.get('transform'), precision))
+        if _tag(element) in ('rect', 'use', 'image'):
+            for name in ('x', 'y', 'width', 'height'):
+                if name in element.attrib and _NUMBER.fullmatch(element.get(name)):
+                    element.set(name, format_number(float(element.get(name)), precision))
+    _strip_whitespace(root)
+    return root
+
+
+def _translate_to_position(use):
+    """Turn a lone ``translate()`` on a <use> into its x and y attributes.
+
+    Both place the referenced content identically, but the clip, mask and
+    filter of the <use> itself would not move with x and y, so those are
+    left alone.
+    """
+    match = re.fullmatch(r'\s*translate\(([^)]*)\)\s*', use.get('transform', ''))
+    if not match or {'clip-path', 'mask', 'filter', 'x', 'y'} & set(use.attrib):
+        return
+    values = [float(value) for value in _NUMBER.findall(match.group(1))]
+    x, y = (values + [0.0, 0.0])[:2]
+    del use.attrib['transform']
+    if x:
+        use.set('x', repr(x))
+    if y:
+        use.set('y', repr(y))
+
+
+def _ancestors(element, parents):
+    while element in parents:
+        element = parents[element]
+        yield element
+
+
+def _strip_whitespace(element):
+    """Remove indentation; text content of <text> elements is left alone."""
+    if _tag(element) in ('text', 'style'):
+        if element.tail is not None and not element.tail.strip():
+            element.tail = None
+        return
+    if element.text is not None and not element.text.strip():
+        element.text = None
+    if element.tail is not None and not element.tail.strip():
+        element.tail = None
+    for child in element:
+        _strip_whitespace(child)
+
+
+def optimize_svg(data, precision=DEFAULT_PRECISION):
+    """Optimise SVG ``data`` (bytes); returns the rewritten document as bytes."""
+    for prefix, uri in NAMESPACES.items():
+        ET.register_namespace(prefix, uri)
+    root = ET.fromstring(data)
+    optimize_tree(root, precision)
+    # Attribute values and text escape '>', so ' />' only ever closes a tag
+    body = ET.tostring(root, encoding='unicode').replace(' />', '/>')
+    return ('<?xml version="1.0" encoding="utf-8" standalone="no"?>\n' + body).encode('utf-8')
+
+
+def save_svg_optimized(fig, path, precision=DEFAULT_PRECISION, **savefig_kwargs):
+    """``savefig`` to SVG and write the optimised document to ``path``."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='svg', **savefig_kwargs)
+    with open(path, 'wb') as fileobj:
+        fileobj.write(optimize_svg(buffer.getvalue(), precision))
+    return path
@@ -0,0 +1,160 @@
+"""
+Persistent text-extent cache shared by every renderer process.
+
+matplotlib measures each string with FreeType (or the mathtext parser) the
+first time a process lays it out, and keeps the result only for the lifetime
+of one renderer.  The infographics lay out the same field names, titles and
+badges in every variant, at every dpi and in every pool worker, so
+``install`` wraps ``matplotlib.text._get_text_metrics_with_cache`` with a
+table stored in ``.render_cache/text_metrics.json``.
+
+Entries are keyed on (renderer class, dpi, string, font properties, math
+mode).  The whole table is tied to a fingerprint of the matplotlib version,
+the installed font files and the rcParams that affect glyph metrics, so it
+is discarded when the font set changes.  The table is capped at
+``RENDER_TEXT_CACHE_MAX_ENTRIES`` entries, dropping the least recently used
+first.  ``RENDER_TEXT_CACHE=0`` (``--no-text-cache``) disables it.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+from functools import wraps
+from pathlib import Path
+
+from render_cache import CACHE_DIR
+
+CACHE_PATH = CACHE_DIR / 'text_metrics.json'
+
+MAX_ENTRIES = int(os.environ.get('RENDER_TEXT_CACHE_MAX_ENTRIES', '50000'))
+
+# rcParams that change the measured size of a string
+METRIC_RCPARAMS = (
+    'text.hinting', 'text.hinting_factor', 'text.kerning_factor',
+    'mathtext.fontset', 'mathtext.default', 'mathtext.fallback',
+    'mathtext.rm', 'mathtext.it', 'mathtext.bf', 'mathtext.sf', 'mathtext.tt',
+    'mathtext.cal',
+)
+
+_entries = None
+_fingerprint = None
+_dirty = False
+stats = {'hits': 0, 'misses': 0}
+
+
+def enabled():
+    """Whether the cache is on (it is unless ``RENDER_TEXT_CACHE=0``)."""
+    return os.environ.get('RENDER_TEXT_CACHE', '1') != '0'
+
+
+def font_fingerprint():
+    """Digest of everything besides the entry key that affects text metrics."""
+    import matplotlib as mpl
+    from matplotlib import font_manager
+
+    manager = font_manager.fontManager
+    fonts = sorted(font.fname for font in (*manager.ttflist, *manager.afmlist))
+    payload = {
+        'matplotlib': mpl.__version__,
+        'fonts': fonts,
+        'rcParams': {name: repr(mpl.rcParams[name]) for name in METRIC_RCPARAMS},
+    }
+    blob = json.dumps(payload, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _read(path=CACHE_PATH):
+    """Entries stored at ``path`` for the current font fingerprint."""
+    try:
+        data = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+    if data.get('fingerprint') != _fingerprint:
+        return {}
+    return data.get('entries', {})
+
+
+def _load():
+    global _entries, _fingerprint
+    if _entries is None:
+        _fingerprint = font_fingerprint()
+        _entries = _read()
+    return _entries
+
+
+def entry_key(renderer, text, fontprop, ismath, dpi):
+    """String key for one measurement."""
+    font = (
+        fontprop.get_family(), fontprop.get_style(), fontprop.get_variant(),
+        fontprop.get_weight(), fontprop.get_stretch(), fontprop.get_size_in_points(),
+        fontprop.get_file(), fontprop.get_math_fontfamily(),
+    )
+    renderer_type = f'{type(renderer).__module__}.{type(renderer).__qualname__}'
+    return json.dumps([renderer_type, getattr(renderer, 'dpi', dpi), text, font, ismath],
+                      default=str)
+
+
+def _cached_metrics(function):
+    """Wrap matplotlib's per-renderer metrics function with the shared table."""
+
+    @wraps(function)
+    def metrics(renderer, text, fontprop, ismath, dpi):
+        global _dirty
+        # usetex extents come from external tools and are not cached here
+        if ismath == 'TeX':
+            return function(renderer, text, fontprop, ismath, dpi)
+        entries = _load()
+        key = entry_key(renderer, text, fontprop, ismath, dpi)
+        value = entries.pop(key, None)
+        if value is None:
+            stats['misses'] += 1
+            value = function(renderer, text, fontprop, ismath, dpi)
+            _dirty = True
+        else:
+            stats['hits'] += 1
+        # Re-inserting keeps the table in least-recently-used order
+        entries[key] = list(value)
+        return tuple(value)
+
+    return metrics
+
+
+def install():
+    """Route matplotlib's text measurement through the cache (idempotent)."""
+    import matplotlib.text
+
+    if not enabled():
+        return
+    current = matplotlib.text._get_text_metrics_with_cache
+    if getattr(current, '__globals__', None) is globals():
+        return
+    # A reloaded module re-wraps the original function, not the old wrapper
+    original = getattr(current, '__wrapped__', current)
+    matplotlib.text._get_text_metrics_with_cache = _cached_metrics(original)
+    atexit.unregister(flush)
+    atexit.register(flush)
+
+
+def flush(path=CACHE_PATH, max_entries=MAX_ENTRIES):
+    """Merge new measurements into the table on disk.
+
+    Other processes may have written since this one loaded, so their entries
+    are kept and this process's (more recent) entries are placed last before
+    the least recently used ones beyond ``max_entries`` are dropped.
+    """
+    global _dirty
+    if not _dirty:
+        return
+    path = Path(path)
+    merged = {key: value for key, value in _read(path).items() if key not in _entries}
+    merged.update(_entries)
+    entries = dict(list(merged.items())[-max_entries:])
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    with os.fdopen(fd, 'w') as fileobj:
+        json.dump({'fingerprint': _fingerprint, 'entries': entries}, fileobj)
+    os.replace(tmp, path)
+    _dirty = False